@@ -20,6 +20,10 @@ YAML example keys (all optional, defaults shown):
     number_of_sperm: 1
     deviation: 0.4
     repeat: 3
+    engine: loop         # loop | batch  (--engine で上書き可)
+    seed_number: null    # root seed (null なら自動で決めて DB に記録)
+    trajectory_store: memory        # memory | memmap | zlib | none
+    trajectory_path: null           # memmap / zlib の出力先 ("{run}" で run 番号)
 """
 
 import argparse
@@ -30,7 +34,8 @@ from pathlib import Path
 import yaml
 import numpy as np
 
-from core.simulation import SpermSimulation
+from core.simulation import SpermSimulation, ENGINES
+from core.storage import open_storage
 
 DEFAULT_CONFIG = {
     'shape': 'cube',
@@ -45,6 +50,10 @@ DEFAULT_CONFIG = {
     'number_of_sperm': 1,
     'deviation': 0.4,
     'repeat': 3,
+    'engine': 'loop',
+    'seed_number': None,
+    'trajectory_store': 'memory',
+    'trajectory_path': None,
 }
 
 def load_config(path: Path | None):
@@ -66,17 +75,26 @@ def to_constants(cfg: dict):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('config', nargs='?', type=str, help='YAML config path')
+    parser.add_argument('--engine', choices=ENGINES,
+                        help='loop: 1 精子ずつ / batch: 全精子を配列で一括更新')
+    parser.add_argument('--db', help='結果 DB（既定: results.db）。":memory:" なら保存しない')
     args = parser.parse_args()
 
     cfg = load_config(Path(args.config) if args.config else None)
+    if args.engine:
+        cfg['engine'] = args.engine
     repeat = cfg.pop('repeat', 1)
     constants = to_constants(cfg)
 
-    for r in range(repeat):
-        sim = SpermSimulation(constants)
-        sim.simulate()
-        first = sim.trajectory[0]
-        print(f'Run {r+1}: first 5 coords = {first[:5]}')
+    with open_storage(args.db) as writer:
+        for r in range(repeat):
+            sim = SpermSimulation(constants, run_index=r, writer=writer)
+            sim.simulate()
+            if sim.trajectory is not None:
+                first = sim.trajectory[0]
+                print(f'Run {r+1} (seed={constants["seed_number"]}): first 5 coords = {first[:5]}')
+            else:
+                print(f'Run {r+1} (seed={constants["seed_number"]}): final coords = {sim.pos[:5]}')
 
 if __name__ == '__main__':
     main()
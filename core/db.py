@@ -1,15 +1,26 @@
 """
-core.db  (ver.2)
-SQLite3 でシミュレーション結果を保存
+core.db  (ver.4)
+SQLite3 でシミュレーション結果を保存（core.simulation と spermsim.main の共通スキーマ）
 
-runs       … 入力パラメータ（1行 / run）
-summary    … run 全体の接触回数など集約値（1行 / run）
-contacts   … 接触イベント（複数行 / run）
-figures    … 生成したグラフ・動画のパス
+runs          … 入力パラメータ（1行 / run）。exp_id / version は spermsim.main の実験単位
+summary       … run 全体の接触回数など集約値（1行 / run）
+contacts      … 接触イベント（複数行 / run）
+figures       … 生成したグラフ・動画のパス
+group_stats   … パラメータ key ごとの n / Σx / Σx²（summary のトリガで維持）
+group_summary … group_stats から作る平均・SD（aggregate() が exp_id 単位で更新）
+
+大量 run を書くときは ResultWriter を使う（core.storage.open_storage からも同じもの）:
+
+    with ResultWriter() as w:
+        for c in ...:
+            run_id = w.add_run(c, contacts)
+
+接続 1 本・WAL・DDL 1 回で、commit_every run ごとに 1 トランザクション。
+save_xxx ヘルパは従来どおり 1 呼び出し = 1 トランザクション。
 """
 from __future__ import annotations
-import sqlite3, json, pathlib, datetime as dt
-from typing import Iterable, Sequence
+import sqlite3, json, math, pathlib, datetime as dt
+from typing import Dict, Iterable, Sequence, List, Optional
 
 # DB ファイルはプロジェクト直下 results.db に固定
 DB_PATH = pathlib.Path(__file__).resolve().parent.parent / "results.db"
@@ -51,50 +62,346 @@ CREATE TABLE IF NOT EXISTS figures(
 );"""
 }
 
-def _conn():
-    """DDL を保証したうえでコネクションを返す"""
-    conn = sqlite3.connect(DB_PATH)
-    for ddl in DDL.values(): conn.execute(ddl)
+# ---------- スキーマ移行 -----------------
+# PRAGMA user_version にスキーマ版を持ち、足りない版の移行だけを順に当てる。
+# runs の型付き列は params(JSON) から導出する VIRTUAL 生成列なので、
+# 既存行もそのまま GROUP BY / WHERE / INDEX の対象になる。
+_TYPED_V2 = {                # 列名 → SQLite 型（shape は runs の実列）
+    "volume":      "REAL",
+    "sperm_conc":  "INTEGER",
+    "step_length": "REAL",
+    "deviation":   "REAL",
+}
+_TYPED_V3 = {                # spermsim.main のパラメータ
+    "VSL":              "REAL",
+    "sim_min":          "REAL",
+    "stick_sec":        "INTEGER",
+    "spot_angle":       "INTEGER",
+    "sampl_rate_Hz":    "INTEGER",
+    "egg_localization": "TEXT",
+}
+TYPED_COLUMNS = {**_TYPED_V2, **_TYPED_V3}
+
+def _typed(cols: dict) -> list:
+    return [f"ALTER TABLE runs ADD COLUMN {col} {typ} GENERATED ALWAYS AS "
+            f"(CAST(json_extract(params,'$.{col}') AS {typ})) VIRTUAL"
+            for col, typ in cols.items()]
+
+# ---------- パラメータ key ごとの集計 -----------------
+# group_stats は key ごとに n / Σ / Σ² を持ち、summary の INSERT / UPDATE / DELETE
+# トリガで書き手と同じトランザクション内に更新される。aggregate() はそこから
+# 平均・母標準偏差を O(1) で出して group_summary を作り直す。
+GROUP_KEY = ("shape", "sperm_conc", "volume", "VSL", "deviation", "sim_min",
+             "stick_sec", "spot_angle", "sampl_rate_Hz", "egg_localization")
+_KEY = ", ".join(GROUP_KEY)
+
+def _metrics(r: str, count: str):
+    """runs 行 r と接触数 count の (N_sperm, 接触/時, 接触/精子) の SQL 式"""
+    ns = f"COALESCE(CAST({r}.sperm_conc * {r}.volume / 1000 AS INTEGER), 0)"
+    n = f"COALESCE({count}, 0)"
+    ratio = f"(CASE WHEN {r}.sim_min > 0 THEN {n} * 60.0 / {r}.sim_min ELSE 0.0 END)"
+    cps = f"(CASE WHEN {ns} != 0 THEN {n} * 1.0 / {ns} ELSE 0.0 END)"
+    return ns, ratio, cps
+
+def _stats_trigger(event: str, rows) -> str:
+    """summary の event で、rows（[(NEW|OLD, '+'|'-'), ...]）を group_stats に反映するトリガ"""
+    body = []
+    for row, sign in rows:
+        ns, ratio, cps = _metrics("r", f"{row}.contact_count")
+        match = " AND ".join(f"g.{k} IS r.{k}" for k in GROUP_KEY)
+        latest = "MAX(latest_run_id, m.run_id)" if sign == "+" else "latest_run_id"
+        body.append(f"""
+        INSERT INTO group_stats ({_KEY})
+            SELECT {", ".join(f"r.{k}" for k in GROUP_KEY)} FROM runs AS r
+             WHERE r.run_id = {row}.run_id
+               AND NOT EXISTS (SELECT 1 FROM group_stats AS g WHERE {match});
+        UPDATE group_stats SET
+               n           = n {sign} 1,
+               sum_ratio   = sum_ratio   {sign} m.ratio,
+               sumsq_ratio = sumsq_ratio {sign} m.ratio * m.ratio,
+               sum_cps     = sum_cps     {sign} m.cps,
+               sumsq_cps   = sumsq_cps   {sign} m.cps * m.cps,
+               sum_n_sperm = sum_n_sperm {sign} m.ns,
+               latest_run_id = {latest}
+          FROM (SELECT r.*, {ns} AS ns, {ratio} AS ratio, {cps} AS cps
+                  FROM runs AS r WHERE r.run_id = {row}.run_id) AS m
+         WHERE {" AND ".join(f"group_stats.{k} IS m.{k}" for k in GROUP_KEY)};""")
+    name = f"trg_summary_stats_{event.split()[0].lower()}"
+    return (f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON summary\n"
+            f"BEGIN{''.join(body)}\nEND")
+
+_NS, _RATIO, _CPS = _metrics("r", "s.contact_count")
+# key ごとの n / Σ / Σ²（接触/時・接触/精子）/ ΣN_sperm / 最新 run_id
+_SQL_GROUP = f"""
+    SELECT {", ".join(f"r.{k}" for k in GROUP_KEY)}, COUNT(*),
+           SUM({_RATIO}), SUM({_RATIO} * {_RATIO}), SUM({_CPS}), SUM({_CPS} * {_CPS}),
+           SUM({_NS}), MAX(r.run_id)
+      FROM summary AS s JOIN runs AS r USING(run_id)
+     GROUP BY {", ".join(f"r.{k}" for k in GROUP_KEY)}"""
+MIGRATIONS = {
+    1: list(DDL.values()),
+    2: _typed(_TYPED_V2) + [
+        "CREATE INDEX IF NOT EXISTS idx_contacts_run ON contacts(run_id)",
+        "CREATE INDEX IF NOT EXISTS idx_figures_run  ON figures(run_id)",
+        "CREATE INDEX IF NOT EXISTS idx_runs_group   "
+        "ON runs(shape, volume, sperm_conc)",
+    ],
+    # summary(run_id) は INTEGER PRIMARY KEY（= rowid）なので索引は不要
+    3: [
+        "ALTER TABLE runs ADD COLUMN exp_id TEXT",
+        "ALTER TABLE runs ADD COLUMN version TEXT",
+        "ALTER TABLE contacts ADD COLUMN egg_index INTEGER DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_runs_exp ON runs(exp_id)",
+    ] + _typed(_TYPED_V3) + [
+        """CREATE TABLE IF NOT EXISTS group_summary(
+            run_id INTEGER,
+            shape TEXT, sperm_conc INTEGER, volume REAL, VSL REAL, deviation REAL,
+            sim_min REAL, stick_sec INTEGER, spot_angle INTEGER, sampl_rate_Hz INTEGER,
+            egg_localization TEXT,
+            mean_contact_hr REAL, SD1 REAL, N_sperm INTEGER, C_per_N REAL, SD2 REAL,
+            total_simulations INTEGER
+        )""",
+        f"CREATE INDEX IF NOT EXISTS idx_group_summary_key ON group_summary({_KEY})",
+    ],
+    4: [
+        """CREATE TABLE IF NOT EXISTS group_stats(
+            shape TEXT, sperm_conc INTEGER, volume REAL, VSL REAL, deviation REAL,
+            sim_min REAL, stick_sec INTEGER, spot_angle INTEGER, sampl_rate_Hz INTEGER,
+            egg_localization TEXT,
+            n           INTEGER NOT NULL DEFAULT 0,
+            sum_ratio   REAL    NOT NULL DEFAULT 0,
+            sumsq_ratio REAL    NOT NULL DEFAULT 0,
+            sum_cps     REAL    NOT NULL DEFAULT 0,
+            sumsq_cps   REAL    NOT NULL DEFAULT 0,
+            sum_n_sperm INTEGER NOT NULL DEFAULT 0,
+            latest_run_id INTEGER NOT NULL DEFAULT 0
+        )""",
+        f"CREATE INDEX IF NOT EXISTS idx_group_stats_key ON group_stats({_KEY})",
+        _stats_trigger("INSERT", [("NEW", "+")]),
+        _stats_trigger("UPDATE OF contact_count", [("OLD", "-"), ("NEW", "+")]),
+        _stats_trigger("DELETE", [("OLD", "-")]),
+        # 既存の run を一度だけ積み上げる
+        f"""INSERT INTO group_stats ({_KEY}, n, sum_ratio, sumsq_ratio, sum_cps, sumsq_cps,
+                                     sum_n_sperm, latest_run_id) {_SQL_GROUP}""",
+    ],
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """conn の DB を SCHEMA_VERSION まで移行し、移行前の版を返す"""
+    ver = conn.execute("PRAGMA user_version").fetchone()[0]
+    for v in range(ver + 1, SCHEMA_VERSION + 1):
+        conn.executescript("BEGIN;\n" + ";\n".join(MIGRATIONS[v]) +
+                           f";\nPRAGMA user_version={v};\nCOMMIT;")
+    return ver
+
+_READY: set = set()       # このプロセスで移行済みの DB パス
+
+def _conn(path=None):
+    """スキーマ移行を保証したうえでコネクションを返す（パスごとに 1 回だけ）"""
+    path = str(path or DB_PATH)
+    conn = sqlite3.connect(path)
+    if path not in _READY:
+        conn.execute("PRAGMA journal_mode=WAL")
+        migrate(conn)
+        _READY.add(path)
     return conn
 
+def _now() -> str:
+    return dt.datetime.now().isoformat(timespec='seconds')
+
+_SQL_RUN     = "INSERT INTO runs(shape,params,created,exp_id,version) VALUES(?,?,?,?,?)"
+# REPLACE の削除は DELETE トリガを起こさないので UPSERT（UPDATE トリガが group_stats を直す）
+_SQL_SUMMARY = ("INSERT INTO summary(run_id,contact_count,note) VALUES(?,?,?) "
+                "ON CONFLICT(run_id) DO UPDATE SET "
+                "contact_count=excluded.contact_count, note=excluded.note")
+_SQL_CONTACT = ("INSERT INTO contacts(run_id,sperm_idx,step,time_s,x,y,z,egg_index) "
+                "VALUES(?,?,?,?,?,?,?,?)")
+_SQL_FIGURE  = "INSERT INTO figures(run_id,kind,path,created,note) VALUES(?,?,?,?,?)"
+
+def _json_default(o):
+    """NumPy のスカラー・配列を JSON へ（spermsim.main の constants 用）"""
+    return o.tolist() if hasattr(o, "tolist") else str(o)
+
+def _run_row(constants: dict, exp_id=None, version=None):
+    return (constants["shape"],
+            json.dumps(constants, separators=(',', ':'), default=_json_default),
+            _now(), exp_id, version)
+
+def _contact_row(run_id: int, r: Sequence) -> tuple:
+    """(sperm_idx, step, time_s, x, y, z[, egg_index]) → INSERT 用の行（egg_index 既定 0）"""
+    return (run_id, *r) if len(r) == 7 else (run_id, *r, 0)
+
+# ---------- group_summary -----------------
+def aggregate(conn: sqlite3.Connection, exp_id: Optional[str] = None) -> int:
+    """
+    exp_id の run が属する key だけ group_summary を作り直し、更新した行数を返す。
+    値は group_stats から出すので履歴全体は読まない。exp_id=None なら全 key。
+    """
+    stat_cols = "n, sum_ratio, sumsq_ratio, sum_cps, sumsq_cps, sum_n_sperm, latest_run_id"
+    if exp_id is None:
+        rows = conn.execute(f"SELECT {_KEY}, {stat_cols} FROM group_stats WHERE n > 0")
+    else:
+        match = " AND ".join(f"g.{k} IS k.{k}" for k in GROUP_KEY)
+        rows = conn.execute(f"""
+            SELECT {", ".join(f"g.{k}" for k in GROUP_KEY)}, {stat_cols}
+              FROM (SELECT DISTINCT {_KEY} FROM runs WHERE exp_id = ?) AS k
+              JOIN group_stats AS g ON {match}
+             WHERE n > 0""", (exp_id,))
+    def pstdev(s1, s2, n):
+        return math.sqrt(max(s2 / n - (s1 / n) ** 2, 0.0)) if n > 1 else 0.0
+    nk = len(GROUP_KEY)
+    out = []
+    for rec in rows.fetchall():
+        n, s_r, ss_r, s_p, ss_p, s_ns, latest = rec[nk:]
+        mean_hr = round(s_r / n, 1)
+        mean_ns = int(s_ns / n)
+        out.append((latest, *rec[:nk], mean_hr, round(pstdev(s_r, ss_r, n), 1), mean_ns,
+                    round(mean_hr / mean_ns, 1) if mean_ns else 0.0,
+                    round(pstdev(s_p, ss_p, n), 1), n))
+    conn.executemany("DELETE FROM group_summary WHERE " +
+                     " AND ".join(f"{k} IS ?" for k in GROUP_KEY),
+                     [r[1:1 + nk] for r in out])
+    conn.executemany(f"""
+        INSERT INTO group_summary(run_id, {_KEY}, mean_contact_hr, SD1, N_sperm,
+                                  C_per_N, SD2, total_simulations)
+        VALUES({",".join("?" * (nk + 7))})""", out)
+    conn.commit()
+    return len(out)
+
+# ---------- まとめ書きライタ -----------------
+class ResultWriter:
+    """
+    長寿命の書き込み用コネクション（core.storage.Storage の SQLite 実装）。
+    runs は run_id が要るので即 INSERT（同一トランザクション内なので fsync なし）、
+    summary / contacts / figures はバッファに溜めて flush() で executemany する。
+    commit_every run 溜まるか、with ブロックを抜けると commit。
+    contacts は max_rows 行を超えると commit 前でも書き出す。
+    """
+    def __init__(self, path=None, commit_every: int = 100, max_rows: int = 100_000):
+        self.path = path or DB_PATH
+        self.commit_every = commit_every
+        self.max_rows = max_rows
+        self.conn: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        self._summary: Dict[int, list] = {}     # run_id → [contact_count, note]
+        self._contacts: List[tuple] = []
+        self._figures: List[tuple] = []
+
+    def __enter__(self) -> "ResultWriter":
+        self.conn = _conn(self.path)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_run(self, constants: dict, contacts: Iterable[Sequence] = (),
+                note: str = "", exp_id: Optional[str] = None,
+                version: Optional[str] = None) -> int:
+        """runs / summary / contacts をまとめて積み、run_id を返す"""
+        run_id = self.conn.execute(_SQL_RUN, _run_row(constants, exp_id, version)).lastrowid
+        rows = [_contact_row(run_id, r) for r in contacts]
+        self._summary[run_id] = [len(rows), note]
+        self._contacts.extend(rows)
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+        elif len(self._contacts) >= self.max_rows:
+            self._write_contacts()
+        return run_id
+
+    def add_contacts(self, run_id: int, contacts: Iterable[Sequence]):
+        """add_run 済みの run に接触を足す（接触を逐次流す contact_only 用）。件数は変えない"""
+        self._contacts.extend(_contact_row(run_id, r) for r in contacts)
+        if len(self._contacts) >= self.max_rows:
+            self._write_contacts()
+
+    def set_contact_count(self, run_id: int, contact_count: int):
+        if run_id in self._summary:
+            self._summary[run_id][0] = contact_count
+        else:
+            self.conn.execute("UPDATE summary SET contact_count=? WHERE run_id=?",
+                              (contact_count, run_id))
+
+    def add_figure(self, run_id: int, kind: str, path: str, note: str = ""):
+        self._figures.append((run_id, kind, path, _now(), note))
+
+    def _write_contacts(self):
+        self.conn.executemany(_SQL_CONTACT, self._contacts)
+        self._contacts.clear()
+
+    def _write(self):
+        cur = self.conn.cursor()
+        cur.executemany(_SQL_SUMMARY, [(k, *v) for k, v in self._summary.items()])
+        cur.executemany(_SQL_CONTACT, self._contacts)
+        cur.executemany(_SQL_FIGURE, self._figures)
+        self._summary.clear(); self._contacts.clear(); self._figures.clear()
+
+    def flush(self):
+        """溜まった行を書き出して commit する"""
+        self._write()
+        self.conn.commit()
+        self._pending = 0
+
+    def aggregate(self, exp_id: Optional[str] = None) -> int:
+        """flush してから group_summary を更新する（core.db.aggregate）"""
+        self.flush()
+        return aggregate(self.conn, exp_id)
+
+    def query(self, sql: str, params: Sequence = ()) -> list:
+        """読み出し用。バッファを書いてから読むので未 commit の行も見える"""
+        self._write()
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def serve(self, queue) -> int:
+        """
+        単一ライタとして queue（queue.Queue / multiprocessing.Queue）を消化する。
+        要素は ("run", constants, contacts[, note]) か
+        ("figure", run_id, kind, path[, note])。None で終了し、処理件数を返す。
+        """
+        n = 0
+        for item in iter(queue.get, None):
+            kind, *args = item
+            if kind == "run":
+                self.add_run(*args)
+            elif kind == "figure":
+                self.add_figure(*args)
+            else:
+                raise ValueError(f"Unknown item kind '{kind}'")
+            n += 1
+        return n
+
 # ---------- 保存ヘルパ -----------------
 def save_run_meta(constants: dict) -> int:
     """runs に 1 行挿入して run_id を返す"""
-    conn=_conn(); cur=conn.cursor()
-    cur.execute("INSERT INTO runs(shape,params,created) VALUES(?,?,?)",
-                (constants["shape"],
-                 json.dumps(constants, separators=(',', ':')),
-                 dt.datetime.now().isoformat(timespec='seconds')))
-    run_id = cur.lastrowid
+    conn=_conn()
+    run_id = conn.execute(_SQL_RUN, _run_row(constants)).lastrowid
     conn.commit(); conn.close()
     return run_id
 
 def save_summary(run_id: int, contact_count: int, note: str = ""):
     conn=_conn()
-    conn.execute("""INSERT OR REPLACE INTO summary(run_id,contact_count,note)
-                    VALUES(?,?,?)""",
-                 (run_id, contact_count, note))
+    conn.execute(_SQL_SUMMARY, (run_id, contact_count, note))
     conn.commit(); conn.close()
 
 def save_contacts(run_id: int, rows: Iterable[Sequence]):
     """
-    rows = [(sperm_idx, step, time_s, x, y, z), ...]  ← 6 要素
+    rows = [(sperm_idx, step, time_s, x, y, z[, egg_index]), ...]  ← 6 か 7 要素
     """
-    conn = _conn(); cur = conn.cursor()
-
-    cur.executemany(
-        "INSERT INTO contacts(run_id,sperm_idx,step,time_s,x,y,z) "
-        "VALUES(?,?,?,?,?,?,?)",
-        [(run_id, *r) for r in rows]          # ← run_id + 6 要素 = 7
-    )
+    conn = _conn()
+    conn.executemany(_SQL_CONTACT,
+                     [_contact_row(run_id, r) for r in rows])   # ← run_id + 6(+egg) 要素
     conn.commit(); conn.close()
 
 
 def save_figure(run_id: int, kind: str, path: str, note: str = ""):
     conn=_conn()
-    conn.execute("""INSERT INTO figures(run_id,kind,path,created,note)
-                    VALUES(?,?,?,?,?)""",
-                 (run_id, kind, path,
-                  dt.datetime.now().isoformat(timespec='seconds'),
-                  note))
+    conn.execute(_SQL_FIGURE, (run_id, kind, path, _now(), note))
     conn.commit(); conn.close()
@@ -0,0 +1,317 @@
+"""
+core.export
+結果 DB を列指向ファイルへ書き出す（解析側で pandas / pyarrow から直接読む用）
+
+    parquet : pyarrow が必要。パーティションごとに 1 ファイル、chunk が 1 row group（zstd）
+    npz     : NumPy だけで書ける。chunk ごとに 1 ファイル（np.savez_compressed）
+
+出力は Hive 形式のディレクトリ:
+
+    out/runs/shape=cube/exp_id=__null__/part-00000.parquet
+    out/contacts/shape=drop/exp_id=2025-05-04_23_36_27/part-00000.npz, part-00001.npz, ...
+    out/group_summary/shape=spot/part-00000.parquet
+
+DB は core.db の results.db（runs / summary / contacts / group_summary）でも
+旧 Trajectory.db（basic_data / intersection / summary）でもよい（表の有無で判定）。
+どちらもパーティション値ごとに fetchmany(chunk_rows) で読むので、表全体を RAM に載せない。
+
+NPZ では NULL を float → NaN、int → -1、str → "" にする（Parquet は null のまま）。
+"""
+from __future__ import annotations
+import pathlib, re, sqlite3
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.db import TYPED_COLUMNS
+
+FORMATS = ("parquet", "npz")
+
+_NULL = {"int32": -1, "int64": -1, "float32": np.nan, "float64": np.nan, "str": ""}
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    source: str                                 # FROM 句
+    columns: Tuple[Tuple[str, str, str], ...]   # (出力列名, SQL 式, dtype)
+    partition: Tuple[Tuple[str, str], ...]      # (パーティション名, SQL 式)
+
+
+# ---- results.db（core.db） ------------------------------------------------
+_RUN_COLS = (("run_id", "runs.run_id", "int64"),)
+_RUN_PART = (("shape", "runs.shape"), ("exp_id", "runs.exp_id"))
+_SQL_DTYPE = {"REAL": "float64", "INTEGER": "int64", "TEXT": "str"}
+RESULTS_TABLES: Dict[str, TableSpec] = {
+    "runs": TableSpec(
+        "runs",
+        _RUN_COLS + (
+            ("shape", "runs.shape", "str"),
+            ("exp_id", "runs.exp_id", "str"),
+            ("version", "runs.version", "str"),
+            ("created", "runs.created", "str"),
+        ) + tuple((c, f"runs.{c}", _SQL_DTYPE[t]) for c, t in TYPED_COLUMNS.items())
+        + (("params", "runs.params", "str"),),
+        _RUN_PART),
+    "summary": TableSpec(
+        "summary JOIN runs USING(run_id)",
+        _RUN_COLS + (
+            ("contact_count", "summary.contact_count", "int64"),
+            ("note", "summary.note", "str"),
+        ),
+        _RUN_PART),
+    "contacts": TableSpec(
+        "contacts JOIN runs USING(run_id)",
+        _RUN_COLS + (
+            ("sperm_idx", "contacts.sperm_idx", "int32"),
+            ("step", "contacts.step", "int32"),
+            ("time_s", "contacts.time_s", "float64"),
+            ("x", "contacts.x", "float64"),
+            ("y", "contacts.y", "float64"),
+            ("z", "contacts.z", "float64"),
+            ("egg_index", "contacts.egg_index", "int32"),
+        ),
+        _RUN_PART),
+}
+
+# ---- 旧 data/Trajectory.db（spermsim.main） ----------------------------------
+_BASIC_PART = (("shape", "basic_data.shape"), ("exp_id", "basic_data.exp_id"))
+_KEY_COLS = (
+    ("shape", "shape", "str"),
+    ("sperm_conc", "sperm_conc", "int64"),
+    ("volume", "volume", "float64"),
+    ("VSL", "VSL", "float64"),
+    ("deviation", "deviation", "float64"),
+    ("sim_min", "sim_min", "float64"),
+    ("stick_sec", "stick_sec", "int32"),
+    ("spot_angle", "spot_angle", "int32"),
+    ("sampl_rate_Hz", "sampl_rate_Hz", "int32"),
+    ("egg_localization", "egg_localization", "str"),
+)
+_STAT_COLS = (
+    ("mean_contact_hr", "mean_contact_hr", "float64"),
+    ("SD1", "SD1", "float64"),
+    ("N_sperm", "N_sperm", "int64"),
+    ("C_per_N", "C_per_N", "float64"),
+    ("SD2", "SD2", "float64"),
+    ("total_simulations", "total_simulations", "int64"),
+)
+TRAJECTORY_TABLES: Dict[str, TableSpec] = {
+    "basic_data": TableSpec(
+        "basic_data",
+        (("id", "basic_data.id", "int64"),
+         ("exp_id", "basic_data.exp_id", "str"),
+         ("version", "basic_data.version", "str"),
+         ("N_contact", "basic_data.N_contact", "int64"),
+         ("seed_number", "basic_data.seed_number", "str"),
+         ("image_id", "basic_data.image_id", "str"),
+         ("mov_id", "basic_data.mov_id", "str"))
+        + tuple((n, f"basic_data.{e}", t) for n, e, t in _KEY_COLS),
+        _BASIC_PART),
+    "intersection": TableSpec(
+        "intersection JOIN basic_data ON basic_data.id = intersection.simulation_id",
+        (("simulation_id", "intersection.simulation_id", "int64"),
+         ("sperm_index", "intersection.sperm_index", "int32"),
+         ("start_step", "intersection.start_step", "int32"),
+         ("egg_index", "intersection.egg_index", "int32")),
+        _BASIC_PART),
+    "summary": TableSpec(
+        "summary",
+        (("simulation_id", "simulation_id", "int64"),) + _KEY_COLS + _STAT_COLS,
+        (("shape", "shape"),)),
+}
+
+RESULTS_TABLES["group_summary"] = TableSpec(
+    "group_summary",
+    (("run_id", "run_id", "int64"),) + _KEY_COLS + _STAT_COLS,
+    (("shape", "shape"),))
+
+_TRAJ_COLS = (("run_id", "int64"), ("sperm", "int32"), ("step", "int32"),
+              ("x", "float32"), ("y", "float32"), ("z", "float32"))
+
+
+def table_specs(conn: sqlite3.Connection) -> Dict[str, TableSpec]:
+    """
+    conn の DB に合う表定義（results.db か Trajectory.db か）。DB に無い表は除く。
+    古い DB に無い列は、runs の型付き列なら params(JSON) から、それ以外は NULL で埋める
+    （DB は読むだけで移行しない）。
+    """
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    specs = TRAJECTORY_TABLES if "basic_data" in names else RESULTS_TABLES
+    have = {t: {r[1] for r in conn.execute(f"PRAGMA table_xinfo({t})")} for t in names}
+
+    def fix(expr: str) -> str:
+        table, _, col = expr.rpartition(".")
+        if not table or col in have.get(table, ()):
+            return expr
+        if table == "runs" and col in TYPED_COLUMNS:
+            return f"CAST(json_extract(runs.params,'$.{col}') AS {TYPED_COLUMNS[col]})"
+        return "NULL"
+    return {name: TableSpec(spec.source, tuple((n, fix(e), t) for n, e, t in spec.columns),
+                            tuple((n, fix(e)) for n, e in spec.partition))
+            for name, spec in specs.items() if spec.source.split()[0] in names}
+
+
+# ---- 列の変換 ---------------------------------------------------------------
+def _np_column(values: Sequence, dtype: str) -> np.ndarray:
+    fill = _NULL[dtype]
+    vals = [fill if v is None else v for v in values]
+    if dtype == "str":
+        return np.array([str(v) for v in vals], dtype=str)
+    return np.array(vals, dtype=dtype)
+
+
+def _part_dir(out: pathlib.Path, names: Sequence[str], values: Sequence) -> pathlib.Path:
+    for n, v in zip(names, values):
+        v = "__null__" if v is None else re.sub(r"[^\w.+-]", "_", str(v))
+        out = out / f"{n}={v}"
+    return out
+
+
+# ---- 書き出し先 ---------------------------------------------------------------
+class NpzSink:
+    """chunk ごとに part-NNNNN.npz（列名 → 1 次元配列）"""
+    def __init__(self, directory: pathlib.Path, columns: Sequence[Tuple[str, str]]):
+        self.dir, self.columns, self._k = directory, columns, 0
+
+    def write(self, cols: Sequence[Sequence]):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        arrays = {n: c if isinstance(c, np.ndarray) else _np_column(c, t)
+                  for (n, t), c in zip(self.columns, cols)}
+        np.savez_compressed(self.dir / f"part-{self._k:05d}.npz", **arrays)
+        self._k += 1
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    """パーティションごとに part-00000.parquet 1 つ。write 1 回が 1 row group"""
+    def __init__(self, directory: pathlib.Path, columns: Sequence[Tuple[str, str]],
+                 compression: str = "zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq = pa, pq
+        types = {"int32": pa.int32(), "int64": pa.int64(), "float32": pa.float32(),
+                 "float64": pa.float64(), "str": pa.string()}
+        self.schema = pa.schema([(n, types[t]) for n, t in columns])
+        self.dir, self.compression = directory, compression
+        self._writer = None
+
+    def write(self, cols: Sequence[Sequence]):
+        pa = self._pa
+        if self._writer is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._writer = self._pq.ParquetWriter(self.dir / "part-00000.parquet",
+                                                  self.schema, compression=self.compression)
+        arrays = [pa.array(c if isinstance(c, np.ndarray) else list(c), type=f.type)
+                  for f, c in zip(self.schema, cols)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _sink(fmt: str, directory, columns):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Available: {list(FORMATS)}")
+    return ParquetSink(directory, columns) if fmt == "parquet" else NpzSink(directory, columns)
+
+
+# ---- 表・軌跡 ---------------------------------------------------------------
+def iter_chunks(conn: sqlite3.Connection, spec: TableSpec, chunk_rows: int = 100_000
+                ) -> Iterator[Tuple[tuple, List[tuple]]]:
+    """(パーティション値, 列ごとの値のリスト) を chunk_rows 行ずつ返す"""
+    part_sql = ", ".join(e for _, e in spec.partition)
+    parts = conn.execute(f"SELECT DISTINCT {part_sql} FROM {spec.source}").fetchall()
+    select = ", ".join(e for _, e, _ in spec.columns)
+    where = " AND ".join(f"{e} IS ?" for _, e in spec.partition)
+    for part in parts:
+        cur = conn.execute(f"SELECT {select} FROM {spec.source} WHERE {where}", part)
+        while rows := cur.fetchmany(chunk_rows):
+            yield part, list(zip(*rows))
+
+
+def export_table(conn: sqlite3.Connection, name: str, spec: TableSpec, out, fmt: str = "npz",
+                 chunk_rows: int = 100_000) -> int:
+    """1 表を out/name/ 以下へ書き、行数を返す。パーティション列はディレクトリ名にだけ持つ"""
+    names = [n for n, _ in spec.partition]
+    spec = TableSpec(spec.source, tuple(c for c in spec.columns if c[0] not in names),
+                     spec.partition)
+    columns = [(n, t) for n, _, t in spec.columns]
+    sinks: Dict[tuple, object] = {}
+    n = 0
+    try:
+        for part, cols in iter_chunks(conn, spec, chunk_rows):
+            if part not in sinks:
+                # パーティションは順に読み切るので、前のものは閉じてよい
+                for s in sinks.values():
+                    s.close()
+                sinks = {part: _sink(fmt, _part_dir(pathlib.Path(out) / name, names, part),
+                                     columns)}
+            sinks[part].write(cols)
+            n += len(cols[0])
+    finally:
+        for s in sinks.values():
+            s.close()
+    return n
+
+
+def _open_trajectory(path) -> np.ndarray:
+    """memmap（.npy）はそのまま、zlib は復元して (n_sperm, n_step, 3) を返す"""
+    from core.trajstore import read_zlib
+    with open(path, "rb") as fh:
+        is_npy = fh.read(6) == b"\x93NUMPY"
+    return np.load(path, mmap_mode="r") if is_npy else read_zlib(path)
+
+
+def export_trajectories(trajectories: Dict[int, str], out, fmt: str = "npz",
+                        chunk_rows: int = 1_000_000) -> int:
+    """
+    {run_id: 軌跡ファイル} を out/trajectories/run_id=N/ へ
+    (run_id, sperm, step, x, y, z) の長い形式で書く。精子単位で chunk_rows 行ずつ。
+    """
+    n = 0
+    for run_id, path in trajectories.items():
+        arr = _open_trajectory(path)
+        n_sperm, n_step, _ = arr.shape
+        per = max(1, chunk_rows // max(n_step, 1))
+        sink = _sink(fmt, pathlib.Path(out) / "trajectories" / f"run_id={run_id}", _TRAJ_COLS)
+        try:
+            for j0 in range(0, n_sperm, per):
+                block = np.asarray(arr[j0:j0 + per], dtype=np.float32)
+                k = block.shape[0]
+                sperm, step = np.meshgrid(np.arange(j0, j0 + k, dtype=np.int32),
+                                          np.arange(n_step, dtype=np.int32), indexing="ij")
+                xyz = block.reshape(-1, 3)
+                sink.write((np.full(k * n_step, run_id, dtype=np.int64), sperm.ravel(),
+                            step.ravel(), xyz[:, 0].copy(), xyz[:, 1].copy(), xyz[:, 2].copy()))
+                n += k * n_step
+        finally:
+            sink.close()
+    return n
+
+
+def export(db_path, out, fmt: str = "npz", tables: Optional[Iterable[str]] = None,
+           chunk_rows: int = 100_000, trajectories: Optional[Dict[int, str]] = None
+           ) -> Dict[str, int]:
+    """
+    db_path の表（既定: 全部）と、任意で軌跡ファイルを out 以下へ書き出す。
+    表名 → 書いた行数 を返す。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Available: {list(FORMATS)}")
+    conn = sqlite3.connect(f"file:{pathlib.Path(db_path)}?mode=ro", uri=True)
+    try:
+        specs = table_specs(conn)
+        names = list(specs) if tables is None else list(tables)
+        unknown = [t for t in names if t not in specs]
+        if unknown:
+            raise ValueError(f"Unknown table(s) {unknown}. Available: {list(specs)}")
+        counts = {t: export_table(conn, t, specs[t], out, fmt, chunk_rows) for t in names}
+    finally:
+        conn.close()
+    if trajectories:
+        counts["trajectories"] = export_trajectories(trajectories, out, fmt)
+    return counts
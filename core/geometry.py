@@ -12,33 +12,71 @@ class IOStatus(Enum):
     TEMP_EDGE = auto()
     STICK_SURFACE = auto()
 
+# ------------ rng -----------------------------
+# 乱数を使う関数はすべて rng (numpy Generator) を受け取る。
+# None のときは従来どおりグローバルな np.random を使う。
+def _rng(rng):
+    return np.random if rng is None else rng
+
 # ------------ vector helpers -----------------
-def random_unit_vector() -> np.ndarray:
-    phi = np.random.uniform(0, 2*math.pi)
-    costh = np.random.uniform(-1, 1)
+def random_unit_vector(rng=None) -> np.ndarray:
+    rng = _rng(rng)
+    phi = rng.uniform(0, 2*math.pi)
+    costh = rng.uniform(-1, 1)
     sinth = math.sqrt(1 - costh*costh)
     return np.array([sinth*math.cos(phi), sinth*math.sin(phi), costh])
 
-def initial_vec(constants: dict) -> np.ndarray:
+def unit_vectors_from_uniform(U: np.ndarray) -> np.ndarray:
+    """[0,1) 一様乱数 U (n,2) → 球面一様な単位ベクトル (n,3)"""
+    phi = 2*math.pi * U[:, 0]
+    costh = 2*U[:, 1] - 1
+    sinth = np.sqrt(1 - costh*costh)
+    return np.column_stack((sinth*np.cos(phi), sinth*np.sin(phi), costh))
+
+def random_unit_vectors(n: int, rng=None) -> np.ndarray:
+    """random_unit_vector の (n,3) 版"""
+    return unit_vectors_from_uniform(_rng(rng).random((n, 2)))
+
+def initial_vec(constants: dict, rng=None) -> np.ndarray:
     """旧仕様との互換：ランダム方向 × step_length"""
-    return random_unit_vector() * constants['step_length']
+    return random_unit_vector(rng) * constants['step_length']
 
 # ------------- random initial points ----------
-def random_point_cube(r: float) -> np.ndarray:
-    return np.random.uniform(-r, r, 3)
-
-def _rand_in_sphere(R: float) -> np.ndarray:
-    while True:
-        p = np.random.uniform(-R, R, 3)
-        if p @ p <= R*R:
-            return p
-
-def random_point_cap(R: float, theta: float) -> np.ndarray:
-    zc = R*math.cos(theta)
-    while True:
-        p = _rand_in_sphere(R)
-        if p[2] >= 0 and (p[2]-zc) >= -1e-9:
-            return p
+# いずれも棄却なしの厳密サンプラ。n 点を 1 回の呼び出しで (n,3) で返す。
+def sample_box(n: int, lo, hi, rng=None) -> np.ndarray:
+    """直方体 [lo, hi] 内の一様分布"""
+    return _rng(rng).uniform(lo, hi, (n, 3))
+
+def sample_ball(n: int, R: float, rng=None) -> np.ndarray:
+    """原点中心・半径 R の球内の一様分布（r = R u^(1/3)）"""
+    rng = _rng(rng)
+    costh = rng.uniform(-1, 1, n)
+    phi = rng.uniform(0, 2*math.pi, n)
+    r = R * np.cbrt(rng.random(n))
+    rho = r * np.sqrt(1 - costh*costh)
+    return np.column_stack((rho*np.cos(phi), rho*np.sin(phi), r*costh))
+
+def sample_cap(n: int, R: float, z_floor: float, rng=None) -> np.ndarray:
+    """
+    原点中心・半径 R の球のうち z >= z_floor の部分（球冠）内の一様分布。
+    z の周辺密度 ∝ π(R²-z²) の CDF は 3 次式なので、三角関数解で逆変換し、
+    その高さの円板内で (ρ, φ) を一様に引く。
+    """
+    rng = _rng(rng)
+    z0 = min(max(z_floor, -R), R)
+    G0 = R*R*z0 - z0**3/3
+    g = G0 + rng.random(n) * (2*R**3/3 - G0)
+    x = np.clip(-1.5*g / R**3, -1.0, 1.0)
+    z = 2*R*np.cos(np.arccos(x)/3 - 2*math.pi/3)
+    rho = np.sqrt(np.maximum(R*R - z*z, 0.0) * rng.random(n))
+    phi = rng.uniform(0, 2*math.pi, n)
+    return np.column_stack((rho*np.cos(phi), rho*np.sin(phi), z))
+
+def random_point_cube(r: float, rng=None) -> np.ndarray:
+    return sample_box(1, -r, r, rng)[0]
+
+def random_point_cap(R: float, theta: float, rng=None) -> np.ndarray:
+    return sample_cap(1, R, max(0.0, R*math.cos(theta)), rng)[0]
 
 # ---------------- IO checks -------------------
 def IO_check_cube(p0, p1, c):
@@ -48,10 +86,15 @@ def IO_check_cube(p0, p1, c):
     if np.any(np.isclose(abs1, R, atol=1e-9)): return IOStatus.TEMP_SURFACE
     return IOStatus.OUTSIDE
 
+def _cap_dist2(p1, R, theta):
+    """球冠中心 (0,0,R cosθ) からの距離²（配列を作らずに計算）"""
+    dz = p1[2] - R*math.cos(theta)
+    return p1[0]*p1[0] + p1[1]*p1[1] + dz*dz
+
 def IO_check_drop(p0, p1, c):
-    R = c['R']; theta = c['drop_angle']; zc = R*math.cos(theta)
+    R = c['R']
     if p1[2] < 0: return IOStatus.OUTSIDE
-    dist2 = np.sum((p1 - np.array([0,0,zc]))**2)
+    dist2 = _cap_dist2(p1, R, c['drop_angle'])
     if dist2 < R*R - 1e-9: return IOStatus.INSIDE
     if abs(dist2 - R*R) <= 1e-9: return IOStatus.TEMP_SURFACE
     return IOStatus.OUTSIDE
@@ -59,9 +102,8 @@ def IO_check_drop(p0, p1, c):
 def IO_check_spot(p0, p1, c):
     R = c['R_spot']
     theta = c.get('theta_spot', math.pi/6)      # fallback
-    zc = R*math.cos(theta)
     if p1[2] < 0: return IOStatus.OUTSIDE
-    dist2 = np.sum((p1 - np.array([0,0,zc]))**2)
+    dist2 = _cap_dist2(p1, R, theta)
     if dist2 < R*R - 1e-9: return IOStatus.INSIDE
     if abs(dist2 - R*R) <= 1e-9: return IOStatus.TEMP_SURFACE
     return IOStatus.OUTSIDE
@@ -92,8 +134,41 @@ def first_hit_normal_spot(p0, p1, R, theta):
         return v / dist
     return None
 
+# ------------- normals (batched) --------------
+def first_hit_normal_cube_batch(P1: np.ndarray, R: float):
+    """first_hit_normal_cube の (N,3) 版。戻り値 (hit (N,), n (N,3))"""
+    A = np.abs(P1)
+    on = A >= R - 1e-12
+    hit = ~np.all(A < R, axis=1) & on.any(axis=1)
+    n = np.zeros(P1.shape)
+    rows = np.flatnonzero(hit)
+    ax = np.argmax(on[rows], axis=1)            # 最初に当たった軸
+    n[rows, ax] = np.sign(P1[rows, ax])
+    return hit, n
+
+def first_hit_normal_cap_batch(P1: np.ndarray, R: float, theta: float):
+    """first_hit_normal_drop / _spot の (N,3) 版"""
+    n = np.zeros(P1.shape)
+    below = P1[:, 2] < 0
+    v = P1 - np.array([0.0, 0.0, R*math.cos(theta)])
+    dist = np.sqrt(np.einsum('ij,ij->i', v, v))
+    wall = ~below & (dist >= R - 1e-12)
+    n[wall] = v[wall] / dist[wall, None]
+    n[below, 2] = -1.0
+    return below | wall, n
+
+def first_hit_normal_batch(P1: np.ndarray, c: dict):
+    shape = c['shape']
+    if shape == 'cube':
+        return first_hit_normal_cube_batch(P1, c['radius'])
+    if shape == 'drop':
+        return first_hit_normal_cap_batch(P1, c['R'], c['drop_angle'])
+    if shape == 'spot':
+        return first_hit_normal_cap_batch(P1, c['R_spot'], c.get('theta_spot', math.pi/6))
+    return np.zeros(len(P1), dtype=bool), np.zeros(P1.shape)
+
 # -------------- prepare & resolve -------------
-def prepare_new_vector(last_vec, c, boundary_type="free", stick_status:int=0, inward_dir=None):
+def prepare_new_vector(last_vec, c, boundary_type="free", stick_status:int=0, inward_dir=None, rng=None):
     step = c['step_length']
     if stick_status > 0 and inward_dir is not None:
         n = inward_dir / np.linalg.norm(inward_dir)
@@ -105,11 +180,23 @@ def prepare_new_vector(last_vec, c, boundary_type="free", stick_status:int=0, in
         tang = tang / np.linalg.norm(tang)
         return tang * step
     dev = c.get('deviation', 0.4)
-    rand = random_unit_vector()
+    rand = random_unit_vector(rng)
     new = (1-dev)*last_vec + dev*rand
     new /= np.linalg.norm(new)
     return new * step
 
+def prepare_new_vector_batch(last_vec, c, n: int, rng=None, U=None) -> np.ndarray:
+    """
+    prepare_new_vector（stick なし）の n 本同時版。
+    last_vec は (3,) でも (n,3) でもよい。U (n,2) を渡すとその一様乱数を使う。
+    """
+    step = c['step_length']
+    dev = c.get('deviation', 0.4)
+    rand = unit_vectors_from_uniform(U) if U is not None else random_unit_vectors(n, rng)
+    new = (1-dev)*np.asarray(last_vec) + dev*rand
+    new /= np.linalg.norm(new, axis=1, keepdims=True)
+    return new * step
+
 def resolve_step(p_curr, v_raw, c):
     step = c['step_length']
     remaining = v_raw.copy()
@@ -133,3 +220,32 @@ def resolve_step(p_curr, v_raw, c):
         p = p + tang
         remaining = start + v_raw - p
     return p - start
+
+def resolve_step_batch(P: np.ndarray, V_raw: np.ndarray, c: dict, out=None) -> np.ndarray:
+    """
+    resolve_step の (N,3) 版。壁に当たった行だけを取り出して反復し、
+    それ以外の行は V_raw をそのまま返す（out を渡せば書き込み先に再利用）。
+    """
+    step = c['step_length']
+    if out is None:
+        out = np.empty_like(V_raw)
+    np.copyto(out, V_raw)
+    hit, n = first_hit_normal_batch(P + V_raw, c)
+    rows = np.flatnonzero(hit)
+    if rows.size == 0:
+        return out
+    vr, nr = V_raw[rows], n[rows]
+    moved = np.zeros_like(vr)                   # p - start
+    act = np.arange(rows.size)
+    for _ in range(3):
+        rem = vr[act] - moved[act]
+        na = nr[act]
+        tang = rem - np.einsum('ij,ij->i', rem, na)[:, None]*na
+        tn = np.sqrt(np.einsum('ij,ij->i', tang, tang))
+        keep = tn >= 1e-12
+        act = act[keep]
+        if act.size == 0:
+            break
+        moved[act] += tang[keep] * (step / tn[keep])[:, None]
+    out[rows] = moved
+    return out
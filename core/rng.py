@@ -0,0 +1,64 @@
+"""
+core.rng
+1 つの root seed から run ごと・精子ごとに独立な numpy Generator を導出する
+
+    root seed ── SeedSequence(seed, spawn_key=(run_index,))
+                   ├─ init        … 初期位置など run 全体で 1 本
+                   └─ sperm[0..N) … 精子ごとに 1 本
+
+精子ごとの乱数列はその精子しか消費しないので、精子を処理する順序
+（1 体ずつ / 全体一括 / 別プロセス）に関係なく同じ値が引かれる。
+"""
+from __future__ import annotations
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def resolve_seed(seed) -> int:
+    """None / 'None' なら新しいエントロピーから、それ以外は int 化して返す"""
+    if seed is None or str(seed).strip().lower() in ("", "none"):
+        return int(np.random.SeedSequence().generate_state(1)[0])
+    return int(seed)
+
+
+class RunStreams:
+    """1 run 分の乱数ストリーム（init 用 1 本 + 精子ごと n_sperm 本）"""
+
+    def __init__(self, seed, n_sperm: int, run_index: int = 0):
+        self.seed = resolve_seed(seed)
+        self.run_index = run_index
+        ss = np.random.SeedSequence(self.seed, spawn_key=(run_index,))
+        init_ss, sperm_ss = ss.spawn(2)
+        self.init = np.random.Generator(np.random.PCG64(init_ss))
+        self.sperm: List[np.random.Generator] = [
+            np.random.Generator(np.random.PCG64(s)) for s in sperm_ss.spawn(n_sperm)
+        ]
+
+    def uniforms(self, k: int, block: int = 64) -> "UniformStreams":
+        return UniformStreams(self.sperm, k, block)
+
+
+class UniformStreams:
+    """
+    精子ごとの Generator から 1 ステップあたり k 個の一様乱数を引く。
+    各精子 block ステップ分をまとめて引いてバッファしておくので、
+    全精子一括でも 1 体ずつでも各精子が受け取る値の並びは同一。
+    """
+
+    def __init__(self, gens: Sequence[np.random.Generator], k: int, block: int = 64):
+        self.gens, self.k, self.block = gens, k, block
+        n = len(gens)
+        self._buf = np.empty((n, block, k))
+        self._pos = np.full(n, block)
+        self._all = np.arange(n)
+
+    def draw(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """rows（重複なし）の精子について次の k 個を (len(rows), k) で返す"""
+        rows = self._all if rows is None else np.asarray(rows)
+        for i in rows[self._pos[rows] >= self.block].tolist():
+            self._buf[i] = self.gens[i].random((self.block, self.k))
+            self._pos[i] = 0
+        out = self._buf[rows, self._pos[rows]]
+        self._pos[rows] += 1
+        return out
@@ -2,9 +2,13 @@ from __future__ import annotations
 from core.db import save_run_meta, save_summary, save_contacts
 import numpy as np, math
 from core.geometry import (
-    prepare_new_vector, resolve_step,
-    random_point_cube, random_point_cap
+    prepare_new_vector_batch, resolve_step_batch,
+    sample_box, sample_cap
 )
+from core.rng import RunStreams
+from core.trajstore import open_store
+
+ENGINES = ("loop", "batch")
 
 # ───────────────── inside_egg ───────────────────
 def inside_egg(p: np.ndarray, c: dict) -> bool:
@@ -21,58 +25,163 @@ def inside_egg(p: np.ndarray, c: dict) -> bool:
         return np.linalg.norm(p) <= c['R_spot']
     return False
 
+def inside_egg_batch(P: np.ndarray, c: dict) -> np.ndarray:
+    """inside_egg の (N,3) 版。bool 配列 (N,) を返す"""
+    s = c['shape']
+    if s == 'cube':
+        return np.all(np.abs(P) <= c['radius'], axis=1)
+    elif s == 'drop':
+        return np.einsum('ij,ij->i', P, P) <= c['R']**2
+    elif s == 'spot':
+        return np.einsum('ij,ij->i', P, P) <= c['R_spot']**2
+    return np.zeros(len(P), dtype=bool)
+
 # ───────────────── シミュレーションクラス ───────────────────
 class SpermSimulation:
-    def __init__(self, c: dict):
+    """
+    engine='loop'  : 精子ごと・ステップごとに 1 点ずつ進める従来版
+    engine='batch' : 全精子を (n_sperm, 3) 配列で 1 ステップずつ一括で進める
+
+    乱数は c['seed_number'] を root に core.rng.RunStreams から引く
+    （run_index で repeat ごとに別系列）。精子ごとに独立なストリームなので
+    同じ seed なら loop / batch / 並列 sweep のどれでも結果はビット単位で一致する。
+    seed_number が None のときは新しく決めた seed を c に書き戻して DB に残す。
+
+    軌跡は c['trajectory_store']（memory / memmap / zlib / none、既定 memory）へ
+    ステップごとに書き出す。memory / memmap 以外では self.traj は None で、
+    エンジンは現在位置 self.pos (n_sperm, 3) だけを持って進む。
+    """
+    def __init__(self, c: dict, engine: str | None = None, run_index: int = 0,
+                 writer=None):
         self.c = c
+        self.writer = writer            # core.storage.Storage（None なら 1 run ずつ保存）
+        self.engine = engine or c.get('engine', 'loop')
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{self.engine}'. Available: {list(ENGINES)}")
         self.n_sperm = int(c.get('number_of_sperm', 1))
         self.n_step  = int(c.get('n_simulation', 100))
-        self.traj = np.zeros((self.n_sperm, self.n_step, 3))
+        self.rng = RunStreams(c.get('seed_number'), self.n_sperm, run_index)
+        c['seed_number'] = self.rng.seed
+        path = c.get('trajectory_path')
+        if isinstance(path, str):
+            path = path.format(run=run_index)
+        self.store = open_store(c.get('trajectory_store', 'memory'),
+                                self.n_sperm, self.n_step, path)
+        self.traj = self.store.array
         self.trajectory = self.traj
+        self.pos = np.zeros((self.n_sperm, 3))
 
     # ---- 初期位置 ------------------------------------------------
     def _init_pos(self) -> np.ndarray:
-        s = self.c['shape']
+        """全精子の初期位置 (n_sperm, 3) を一括で生成"""
+        s, n, rng = self.c['shape'], self.n_sperm, self.rng.init
         if s == 'cube':
-            return random_point_cube(self.c['radius'])
+            r = self.c['radius']
+            return sample_box(n, -r, r, rng)
         elif s == 'drop':
-            return random_point_cap(self.c['R'], self.c['drop_angle'])
+            R = self.c['R']
+            return sample_cap(n, R, max(0.0, R*math.cos(self.c['drop_angle'])), rng)
         elif s == 'spot':
-            return random_point_cap(
-                self.c['R_spot'],
-                self.c.get('theta_spot', math.pi / 6)
-            )
-        return np.zeros(3)
+            R = self.c['R_spot']
+            theta = self.c.get('theta_spot', math.pi / 6)
+            return sample_cap(n, R, max(0.0, R*math.cos(theta)), rng)
+        return np.zeros((n, 3))
 
     # ---- メイン ---------------------------------------------------
     def simulate(self):
+        # 1. 初期化
+        self.pos = self._init_pos()
+        self.store.write(0, self.pos)
+
+        # 2. メインループ
+        try:
+            if self.engine == 'batch':
+                contacts = self._run_batch()
+            else:
+                contacts = self._run_loop()
+        finally:
+            self.store.close()
+
+        # 3. DB へ保存
+        if self.writer is not None:
+            self.run_id = self.writer.add_run(self.c, contacts)
+        else:
+            self.run_id = save_run_meta(self.c)
+            save_summary(self.run_id, len(contacts))
+            if contacts:
+                save_contacts(self.run_id, contacts)
+
+        return self.traj
+
+    def _run_loop(self) -> list:
+        """1 精子ずつ進める。batch と同じ行カーネルを 1 行ずつ適用する"""
         step_len = self.c['step_length']
         last_vec = np.array([step_len, 0.0, 0.0])
 
         dt_sec = 4.0  # 1 step = 4 秒 (必要なら変更)
         contacts = []  # (idx, step, t_sec, x, y, z)
+        streams = self.rng.uniforms(2)
 
-        # 1. 初期化
-        for i in range(self.n_sperm):
-            self.traj[i, 0] = self._init_pos()
-        start_t = 1
-
-        # 2. メインループ
-        for t in range(start_t, self.n_step):
+        pos, nxt = self.pos, np.empty_like(self.pos)
+        for t in range(1, self.n_step):
             for i in range(self.n_sperm):
-                pos = self.traj[i, t - 1]
-                v_raw = prepare_new_vector(last_vec, self.c)
-                v = resolve_step(pos, v_raw, self.c)
-                newp = pos + v
-                self.traj[i, t] = newp
-                if inside_egg(newp, self.c):
-                    contacts.append((i, t, t * dt_sec, *newp))
-            last_vec = self.traj[0, t] - self.traj[0, t - 1]
+                p = pos[i:i+1]
+                v_raw = prepare_new_vector_batch(last_vec, self.c, 1,
+                                                 U=streams.draw([i]))
+                newp = p + resolve_step_batch(p, v_raw, self.c)
+                nxt[i] = newp[0]
+                if inside_egg_batch(newp, self.c)[0]:
+                    contacts.append((i, t, t * dt_sec, *newp[0].tolist()))
+            self.store.write(t, nxt)
+            last_vec = nxt[0] - pos[0]
+            pos, nxt = nxt, pos
+        self.pos = pos
+        return contacts
 
-        # 3. DB へ保存
-        run_id = save_run_meta(self.c)
-        save_summary(run_id, len(contacts))
-        if contacts:
-            save_contacts(run_id, contacts)
+    def _run_batch(self) -> list:
+        """
+        _run_loop と同じ規則（last_vec は精子 0 の直前ステップを全精子で共有）を
+        全精子まとめて適用する。
+        """
+        step_len = self.c['step_length']
+        last_vec = np.array([step_len, 0.0, 0.0])
 
-        return self.traj
+        dt_sec = 4.0
+        contacts = []
+        v = np.empty((self.n_sperm, 3))         # resolve 結果の使い回しバッファ
+        streams = self.rng.uniforms(2)
+
+        pos = self.pos
+        for t in range(1, self.n_step):
+            v_raw = prepare_new_vector_batch(last_vec, self.c, self.n_sperm,
+                                             U=streams.draw())
+            newp = pos + resolve_step_batch(pos, v_raw, self.c, out=v)
+            self.store.write(t, newp)
+            idx = np.nonzero(inside_egg_batch(newp, self.c))[0]
+            if len(idx):
+                hits = newp[idx].tolist()
+                contacts.extend((i, t, t * dt_sec, *p)
+                                for i, p in zip(idx.tolist(), hits))
+            last_vec = newp[0] - pos[0]
+            pos = newp
+        self.pos = pos
+        return contacts
+
+
+# ───────────────── ワーカ用 ───────────────────
+class _Collector:
+    """ResultWriter の代わりに add_run の中身を手元に残す"""
+    def add_run(self, constants: dict, contacts=(), note: str = ""):
+        self.result = (constants, list(contacts))
+        return None
+
+
+def simulate_run(c: dict, run_index: int = 0):
+    """
+    1 run を走らせて (constants, contacts) を返す。DB には書かないので
+    プロセスプールのワーカで回し、親の ResultWriter.add_run にそのまま渡す。
+    repeat 間で同じ系列にするには c['seed_number'] を呼び出し側で決めておくこと。
+    """
+    col = _Collector()
+    SpermSimulation(dict(c), run_index=run_index, writer=col).simulate()
+    return col.result
@@ -0,0 +1,105 @@
+"""
+core.storage
+結果の書き込み先を 1 つのインターフェースにまとめる
+
+    SQLiteStorage : core.db.ResultWriter（WAL・接続 1 本・executemany でまとめ書き）
+    MemoryStorage : 同じスキーマの :memory: SQLite（テスト・使い捨ての sweep 用）
+
+core.simulation と spermsim.main はどちらも Storage 越しに書くので、
+runs / summary / contacts / figures / group_summary は 1 つのスキーマに揃う。
+
+    with open_storage() as st:                     # results.db
+        run_id = st.add_run(constants, contacts, exp_id=exp_id, version=version)
+        st.aggregate(exp_id)
+
+旧 spermsim/data/Trajectory.db は import_trajectory_db() で取り込める。
+"""
+from __future__ import annotations
+import sqlite3
+from typing import Iterable, Optional, Protocol, Sequence
+
+from core.db import ResultWriter, migrate
+
+MEMORY = ":memory:"
+
+
+class Storage(Protocol):
+    """結果の書き込み先。with で開き、抜けると flush して閉じる"""
+    def __enter__(self) -> "Storage": ...
+    def __exit__(self, exc_type, exc, tb): ...
+
+    def add_run(self, constants: dict, contacts: Iterable[Sequence] = (),
+                note: str = "", exp_id: Optional[str] = None,
+                version: Optional[str] = None) -> int:
+        """contacts の行は (sperm_idx, step, time_s, x, y, z[, egg_index])"""
+    def add_contacts(self, run_id: int, contacts: Iterable[Sequence]): ...
+    def set_contact_count(self, run_id: int, contact_count: int): ...
+    def add_figure(self, run_id: int, kind: str, path: str, note: str = ""): ...
+    def flush(self): ...
+    def aggregate(self, exp_id: Optional[str] = None) -> int: ...
+    def query(self, sql: str, params: Sequence = ()) -> list: ...
+    def close(self): ...
+
+
+SQLiteStorage = ResultWriter
+
+
+class MemoryStorage(ResultWriter):
+    """
+    :memory: の SQLite。スキーマ・トリガ・aggregate は SQLiteStorage と同じで、
+    close() で中身ごと消える（読むのは with ブロックの中で query() から）。
+    """
+    def __init__(self, commit_every: int = 100, max_rows: int = 100_000):
+        super().__init__(MEMORY, commit_every, max_rows)
+
+    def __enter__(self) -> "MemoryStorage":
+        self.conn = sqlite3.connect(MEMORY)     # 接続ごとに別 DB なので毎回移行する
+        migrate(self.conn)
+        return self
+
+
+def open_storage(path=None, **kw) -> Storage:
+    """path が ":memory:" なら MemoryStorage、それ以外（None = results.db）は SQLiteStorage"""
+    if str(path) == MEMORY:
+        return MemoryStorage(**kw)
+    return SQLiteStorage(path, **kw)
+
+
+# ---------- 旧 Trajectory.db の取り込み -----------------
+_LEGACY_PARAMS = ("shape", "volume", "sperm_conc", "VSL", "stick_sec", "sim_min",
+                  "deviation", "egg_localization", "spot_angle", "sampl_rate_Hz",
+                  "seed_number")
+
+
+def import_trajectory_db(src, storage: Storage, chunk_rows: int = 100_000) -> int:
+    """
+    spermsim.main の旧 DB（basic_data / intersection）を storage へ写し、run 数を返す。
+    image_id / mov_id は figures（graph / movie）に、接触の time_s は
+    start_step / sampl_rate_Hz にする。旧 summary は group_summary から作り直せるので写さない。
+    """
+    conn = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    try:
+        has_egg = "egg_index" in {r[1] for r in conn.execute("PRAGMA table_info(intersection)")}
+        egg = "egg_index" if has_egg else "0"
+        cols = ", ".join(_LEGACY_PARAMS)
+        runs = conn.execute(f"SELECT id, exp_id, version, N_contact, image_id, mov_id, {cols} "
+                            "FROM basic_data ORDER BY id").fetchall()
+        n = 0
+        for sid, exp_id, version, n_contact, image_id, mov_id, *vals in runs:
+            constants = {k: v for k, v in zip(_LEGACY_PARAMS, vals) if v is not None}
+            rate = constants.get("sampl_rate_Hz") or 1
+            run_id = storage.add_run(constants, (), exp_id=exp_id, version=version)
+            cur = conn.execute(f"SELECT sperm_index, start_step, {egg} FROM intersection "
+                               "WHERE simulation_id = ? ORDER BY id", (sid,))
+            while rows := cur.fetchmany(chunk_rows):
+                storage.add_contacts(run_id, [(s, t, t / rate, None, None, None, e)
+                                              for s, t, e in rows])
+            storage.set_contact_count(run_id, n_contact or 0)
+            for kind, path in (("graph", image_id), ("movie", mov_id)):
+                if path:
+                    storage.add_figure(run_id, kind, path)
+            n += 1
+    finally:
+        conn.close()
+    storage.flush()
+    return n
@@ -0,0 +1,78 @@
+"""
+core.sweep
+(shape × volume × sperm_conc × repeat) のパラメータ格子を
+プロセスプールへ投げるスケジューラ
+
+* ジョブごとに root_seed と格子上の位置だけから決まる seed を振るので、
+  実行順序・ワーカ数に関係なく同じジョブは同じ乱数列で走る
+* 結果は完了順に呼び出し側へ返す（DB への書き込みは呼び出し側 1 か所）
+* cancel（threading.Event）が立つと未着手のジョブを取り消して止まる（GUI 用）
+"""
+from __future__ import annotations
+import itertools
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Any
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SweepJob:
+    index: int          # 格子上の通し番号（shape → volume → conc → repeat の順）
+    shape: str
+    volume: float
+    sperm_conc: int
+    repeat: int
+    seed: int
+
+
+def job_seed(root_seed: int, index: int) -> int:
+    """root_seed と通し番号から 32bit seed を導出する"""
+    return int(np.random.SeedSequence(root_seed, spawn_key=(index,))
+               .generate_state(1)[0])
+
+
+def make_jobs(shapes: Iterable[str], volumes: Iterable[float],
+              concs: Iterable[int], n_repeat: int,
+              root_seed: Optional[int] = None) -> List[SweepJob]:
+    """
+    main() の 3 重ループ + repeat_simulation の繰り返しをジョブ列に展開する。
+    root_seed=None のときは新しいエントロピーを root にする。
+    """
+    if root_seed is None:
+        root_seed = int(np.random.SeedSequence().generate_state(1)[0])
+    grid = itertools.product(shapes, volumes, concs, range(n_repeat))
+    return [SweepJob(i, shape, float(vol), int(conc), r, job_seed(root_seed, i))
+            for i, (shape, vol, conc, r) in enumerate(grid)]
+
+
+def run_sweep(fn: Callable[[SweepJob], Any], jobs: List[SweepJob],
+              workers: int = 1, cancel=None,
+              poll: float = 0.1) -> Iterator[Tuple[SweepJob, Any]]:
+    """
+    fn(job) を全ジョブに適用し、(job, 結果) を完了順に yield する。
+    workers <= 1 なら同一プロセスで順に実行する。fn と戻り値は pickle 可能なこと。
+    cancel.is_set() になったら、実行中のジョブの完了は待つが結果は返さず、
+    未着手のジョブは取り消して戻る（poll 秒ごとに確認）。呼び出し側が途中で
+    break / close したときも同じく未着手のジョブを取り消す。
+    """
+    if workers <= 1:
+        for job in jobs:
+            if cancel is not None and cancel.is_set():
+                return
+            yield job, fn(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(fn, job): job for job in jobs}
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    return
+                done, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield futures[fut], fut.result()
+        finally:
+            # cancel・呼び出し側の break / close・例外のどれでも未着手のジョブは走らせない
+            ex.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,157 @@
+"""
+core.trajstore
+軌跡 (n_sperm, n_step, 3) の保存先
+
+    memory : float64 の ndarray（従来どおり）
+    memmap : float32 の .npy を np.memmap で開いて書く（RAM に載せない）
+    zlib   : float32・差分符号化・zlib 圧縮のチャンクを追記していく
+    none   : 保存しない（接触だけ欲しい run 用）
+
+書き込みは全ストア共通で store.write(t, P)  … P はステップ t の (n_sperm, 3)。
+memory / memmap / none は store.write_sperm(j, rows) で精子単位でも書ける。
+memory / memmap は store.array で (n_sperm, n_step, 3) として読み書きもできる。
+zlib は t を 0 から順に書く前提で、read_zlib() で復元する。
+"""
+from __future__ import annotations
+import os, pathlib, struct, tempfile, zlib
+from typing import Optional
+
+import numpy as np
+
+STORES = ("memory", "memmap", "zlib", "none")
+
+_MAGIC = b"SPTZ"
+_HEAD = struct.Struct("<4sII")      # magic, n_sperm, chunk
+_CHUNK = struct.Struct("<II")       # ステップ数, 圧縮後バイト数
+
+
+class MemoryStore:
+    def __init__(self, n_sperm: int, n_step: int):
+        self.array = np.zeros((n_sperm, n_step, 3))
+
+    def write(self, t: int, P: np.ndarray):
+        self.array[:, t] = P
+
+    def write_sperm(self, j: int, rows: np.ndarray):
+        """精子 j の全ステップ (n_step, 3) をまとめて書く（1 精子ずつ進める main.py 用）"""
+        self.array[j] = rows
+
+    def close(self):
+        pass
+
+
+class MemmapStore(MemoryStore):
+    """
+    float32 の .npy ファイル。np.load(path, mmap_mode='r') でそのまま読める。
+    path=None なら名前のない一時ファイルに写像し、array が解放されるとディスクも空く。
+    """
+    def __init__(self, n_sperm: int, n_step: int, path=None):
+        shape = (n_sperm, n_step, 3)
+        if path is None:
+            self.path = None
+            with tempfile.TemporaryFile(prefix="traj_") as fh:
+                self.array = np.memmap(fh, dtype=np.float32, mode="w+", shape=shape)
+            return
+        self.path = pathlib.Path(path)
+        self.array = np.lib.format.open_memmap(
+            self.path, mode="w+", dtype=np.float32, shape=shape)
+
+    def close(self):
+        self.array.flush()
+
+
+class ZlibStore:
+    """
+    chunk ステップごとに 1 レコード:
+    先頭行は絶対座標、以降は「復元済みの直前行」からの差分を float32 で持つ。
+    復元値から差分を取るので float32 の丸めが累積しない（誤差は 1 ステップ分）。
+    delete=True なら close() でファイルを消す（open_store が一時ファイルを作ったとき）。
+    """
+    array = None
+
+    def __init__(self, n_sperm: int, path, chunk: int = 256, level: int = 6,
+                 delete: bool = False):
+        self.path = pathlib.Path(path)
+        self.n_sperm, self.chunk, self.level = n_sperm, chunk, level
+        self.delete = delete
+        self._buf = np.empty((chunk, n_sperm, 3), dtype=np.float32)
+        self._k = 0
+        self._prev: Optional[np.ndarray] = None     # 直前行の復元値 (float64)
+        self._fh = open(self.path, "wb")
+        self._fh.write(_HEAD.pack(_MAGIC, n_sperm, chunk))
+
+    def write(self, t: int, P: np.ndarray):
+        if self._k == 0:                            # チャンク先頭は絶対座標
+            row = np.asarray(P, dtype=np.float32)
+            self._prev = row.astype(float)
+        else:
+            row = (np.asarray(P) - self._prev).astype(np.float32)
+            self._prev = self._prev + row
+        self._buf[self._k] = row
+        self._k += 1
+        if self._k == self.chunk:
+            self._flush()
+
+    def _flush(self):
+        if self._k:
+            data = zlib.compress(self._buf[:self._k].tobytes(), self.level)
+            self._fh.write(_CHUNK.pack(self._k, len(data)))
+            self._fh.write(data)
+            self._k = 0
+
+    def close(self):
+        if not self._fh.closed:
+            self._flush()
+            self._fh.close()
+            if self.delete:
+                self.path.unlink(missing_ok=True)
+
+
+class NullStore:
+    array = None
+
+    def write(self, t: int, P: np.ndarray):
+        pass
+
+    def write_sperm(self, j: int, rows: np.ndarray):
+        pass
+
+    def close(self):
+        pass
+
+
+def read_zlib(path) -> np.ndarray:
+    """ZlibStore のファイルを (n_sperm, n_step, 3) float64 に復元する"""
+    with open(path, "rb") as fh:
+        magic, n_sperm, _ = _HEAD.unpack(fh.read(_HEAD.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        chunks = []
+        while head := fh.read(_CHUNK.size):
+            k, nbytes = _CHUNK.unpack(head)
+            rows = np.frombuffer(zlib.decompress(fh.read(nbytes)),
+                                 dtype=np.float32).reshape(k, n_sperm, 3)
+            chunks.append(np.cumsum(rows, axis=0, dtype=float))
+    if not chunks:
+        return np.zeros((n_sperm, 0, 3))
+    return np.concatenate(chunks).transpose(1, 0, 2)
+
+
+def open_store(kind: str, n_sperm: int, n_step: int, path=None, **kw):
+    """
+    kind に応じたストアを返す。path 省略時は一時ファイルに書き、
+    ストアが作った一時ファイルは後に残さない（memmap は array の解放時、zlib は close() で消える）
+    """
+    if kind not in STORES:
+        raise ValueError(f"Unknown trajectory store '{kind}'. Available: {list(STORES)}")
+    if kind == "memory":
+        return MemoryStore(n_sperm, n_step)
+    if kind == "none":
+        return NullStore()
+    if kind == "memmap":
+        return MemmapStore(n_sperm, n_step, path)
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="traj_", suffix=".traj")
+        os.close(fd)
+        kw.setdefault("delete", True)
+    return ZlibStore(n_sperm, path, **kw)
@@ -3,19 +3,26 @@
 Sperm Simulation GUI v3
 ──────────────────────────────────────────
 ┌ Parameters ┐┌ History ┐ の 2タブ構成
-* Parameters : 既存入力 → Run Simulation
+* Parameters : 既存入力 → Run Simulation（バックグラウンド実行・進捗・Cancel）
 * History    : 実行履歴一覧 → Histogram / Refresh
+
+Run はワーカスレッドが core.sweep.run_sweep で repeat をプロセスプールへ投げ、
+結果を core.storage（results.db）へ書き込みつつ進捗を queue に積む。Tk のメインスレッドは
+after() で queue を読むだけなので、実行中も UI は固まらない。
 """
 from __future__ import annotations
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3, json, pathlib, subprocess, math
+import sqlite3, json, math, os, queue, threading
+from functools import lru_cache, partial
 
-from core.simulation import SpermSimulation
+from core.simulation import simulate_run
+from core.sweep import run_sweep
+from core.rng import resolve_seed
 from core.db import save_figure, DB_PATH
+from core.storage import open_storage
 
-TOOLS_DIR  = pathlib.Path(__file__).resolve().parent / "tools"
-ANZ_SCRIPT = TOOLS_DIR / "analyze.py"
+POLL_MS = 100           # 進捗 queue を読む間隔
 
 # ───────────────── DB helper ──────────────────
 def list_runs(limit: int = 200):
@@ -27,6 +34,25 @@ def list_runs(limit: int = 200):
     conn.close()
     return rows
 
+@lru_cache(maxsize=64)
+def contact_times(run_id: int) -> tuple:
+    """run の接触時刻。書き込み後の run は変わらないのでキャッシュしてよい"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("SELECT time_s FROM contacts WHERE run_id=? ORDER BY time_s",
+                        (run_id,)).fetchall()
+    conn.close()
+    return tuple(t for (t,) in rows)
+
+def save_histogram(run_id: int, times, path, bins: int = 20):
+    """tools/analyze.py --hist と同じ図をこのプロセスで描く（pyplot を使わない）"""
+    from matplotlib.figure import Figure
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.hist(times, bins=bins, color="orange", edgecolor="k")
+    ax.set_title(f"Run {run_id} – Contact time histogram")
+    ax.set_xlabel("Time (s)"); ax.set_ylabel("Count")
+    fig.savefig(path, dpi=120)
+
 # ───────────────── GUI class ───────────────────
 class SimApp(ttk.Notebook):            # Notebook 継承 → タブ UI
     def __init__(self):
@@ -82,6 +108,11 @@ class SimApp(ttk.Notebook):            # Notebook 継承 → タブ UI
         tk.Entry(tab, textvariable=self.repeat, width=8
                  ).grid(row=r, column=1, sticky="w"); r += 1
 
+        lbl("Workers")
+        self.workers = tk.StringVar(value=str(os.cpu_count() or 1))
+        tk.Entry(tab, textvariable=self.workers, width=8
+                 ).grid(row=r, column=1, sticky="w"); r += 1
+
         # --- Drop params ---
         ttk.Label(tab, text="--- Drop params ---"
                   ).grid(row=r, columnspan=2, pady=2); r += 1
@@ -110,8 +141,16 @@ class SimApp(ttk.Notebook):            # Notebook 継承 → タブ UI
         tk.Entry(tab, textvariable=self.spot_H, width=8
                  ).grid(row=r, column=1, sticky="w"); r += 1
 
-        ttk.Button(tab, text="Run Simulation",
-                   command=self.run_sim).grid(row=r, columnspan=2, pady=10)
+        self.run_btn = ttk.Button(tab, text="Run Simulation", command=self.run_sim)
+        self.run_btn.grid(row=r, column=0, pady=10)
+        self.cancel_btn = ttk.Button(tab, text="Cancel", command=self.cancel_sim,
+                                     state="disabled")
+        self.cancel_btn.grid(row=r, column=1, pady=10, sticky="w"); r += 1
+        self.progress = ttk.Progressbar(tab, length=200, mode="determinate")
+        self.progress.grid(row=r, columnspan=2, padx=4, sticky="ew"); r += 1
+        self.status = tk.StringVar(value="")
+        ttk.Label(tab, textvariable=self.status).grid(row=r, columnspan=2)
+        self._cancel = None
 
     def build_constants(self):
         try:
@@ -143,17 +182,75 @@ class SimApp(ttk.Notebook):            # Notebook 継承 → タブ UI
                      H_spot=float(self.spot_H.get()))
         return c
 
+    # ---------- Run（バックグラウンド） ----------
     def run_sim(self):
         c = self.build_constants()
         if c is None:
             return
-        rep = int(self.repeat.get())
-        for _ in range(rep):
-            sim = SpermSimulation(c)
-            sim.simulate()
-        messagebox.showinfo("Done", f"Ran {rep} times.")
+        try:
+            rep = int(self.repeat.get())
+            workers = max(1, min(int(self.workers.get()), rep))
+        except ValueError as e:
+            messagebox.showerror("Input err", str(e))
+            return
+        # 直列実行と同じく全 repeat で 1 つの root seed を共有する（run_index で分岐）
+        c['seed_number'] = resolve_seed(c.get('seed_number'))
+        self._queue, self._cancel = queue.Queue(), threading.Event()
+        self.progress.configure(maximum=rep, value=0)
+        self.status.set(f"0 / {rep}")
+        self.run_btn.configure(state="disabled")
+        self.cancel_btn.configure(state="normal")
+        threading.Thread(target=self._worker, daemon=True,
+                         args=(c, rep, workers, self._queue, self._cancel)).start()
+        self.after(POLL_MS, self._poll)
+
+    @staticmethod
+    def _worker(c, rep, workers, q, cancel):
+        """ワーカスレッド: repeat を並列に回し、DB へは このスレッドだけが書く"""
+        done = 0
+        try:
+            with open_storage() as writer:
+                for _, (const, contacts) in run_sweep(partial(simulate_run, c), range(rep),
+                                                      workers=workers, cancel=cancel):
+                    writer.add_run(const, contacts)
+                    done += 1
+                    q.put(("progress", done, rep))
+            q.put(("done", done, rep))
+        except Exception as e:                      # UI 側でダイアログを出す
+            q.put(("error", e, rep))
+
+    def _poll(self):
+        try:
+            while True:
+                kind, val, rep = self._queue.get_nowait()
+                if kind == "progress":
+                    self.progress.configure(value=val)
+                    self.status.set(f"{val} / {rep}")
+                    continue
+                self._finish(kind, val, rep)
+                return
+        except queue.Empty:
+            self.after(POLL_MS, self._poll)
+
+    def _finish(self, kind, val, rep):
+        self.run_btn.configure(state="normal")
+        self.cancel_btn.configure(state="disabled")
+        if kind == "error":
+            self.status.set("error")
+            messagebox.showerror("Error", str(val))
+        elif self._cancel.is_set():
+            self.status.set(f"cancelled ({val} / {rep})")
+            messagebox.showinfo("Cancelled", f"Cancelled after {val} of {rep} runs.")
+        else:
+            messagebox.showinfo("Done", f"Ran {rep} times.")
         self.refresh_runs()
 
+    def cancel_sim(self):
+        if self._cancel is not None:
+            self._cancel.set()
+            self.status.set("cancelling…")
+            self.cancel_btn.configure(state="disabled")
+
     # ---------- History tab -------------------
     def make_history_tab(self):
         tab = ttk.Frame(self)
@@ -200,10 +297,14 @@ class SimApp(ttk.Notebook):            # Notebook 継承 → タブ UI
         rid = self._sel_run_id()
         if rid is None:
             return
-        subprocess.run(["python", ANZ_SCRIPT, "--hist", str(rid)],
-                       check=False)
-        save_figure(rid, "hist", f"hist_run{rid}.png")
-        messagebox.showinfo("Saved", f"hist_run{rid}.png saved")
+        times = contact_times(rid)
+        if not times:
+            messagebox.showinfo("Histogram", f"No contacts for run {rid}")
+            return
+        path = f"hist_run{rid}.png"
+        save_histogram(rid, times, path)
+        save_figure(rid, "hist", path)
+        messagebox.showinfo("Saved", f"{path} saved")
 
 if __name__ == "__main__":
     SimApp()
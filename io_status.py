@@ -1,35 +1,73 @@
 """
 I/O 状態を表す列挙型 ― spermsim_step1 版
 シミュレーション内部で参照される 18種類の状態を完全に網羅。
+
+値は 0 始まりの連番整数 (IntEnum)。状態そのものを配列の添字に使えるので、
+「前進するか」「境界か」「cut-and-bend が要るか」は下の真偽表を
+ADVANCES[status] のように引くだけで判定できる（リスト生成・所属検査なし）。
+np.int8 の状態コード配列にもそのまま使える:
+
+    codes = np.array([...], dtype=np.int8)
+    adv   = ADVANCES[codes]
 """
 
-from enum import Enum
+from enum import IntEnum
+
+import numpy as np
 
 
-class IOStatus(str, Enum):
+class IOStatus(IntEnum):
     # ── 基本 ───────────────────────────
-    NONE = "none"                 # 未定義
+    NONE = 0                      # 未定義
 
-    INSIDE = "inside"             # 領域内
-    OUTSIDE = "outside"           # 完全に外
-    BORDER = "border"             # 辺・面・頂点など境界上
-    SURFACE = "surface"           # 面上
+    INSIDE = 1                    # 領域内
+    OUTSIDE = 2                   # 完全に外
+    BORDER = 3                    # 辺・面・頂点など境界上
+    SURFACE = 4                   # 面上
 
     # ── 一時判定（temp_ で始まるもの） ─
-    TEMP_ON_SURFACE = "temp_on_surface"
-    TEMP_ON_EDGE = "temp_on_edge"
-    TEMP_ON_POLYGON = "temp_on_polygon"
+    TEMP_ON_SURFACE = 5
+    TEMP_ON_EDGE = 6
+    TEMP_ON_POLYGON = 7
 
     # ── 領域別・形状別 ──────────────────
-    SPHERE_OUT = "sphere_out"         # 球外
-    POLYGON_MODE = "polygon_mode"     # 多角形モード
-    SPOT_BOTTOM = "spot_bottom"
-    SPOT_EDGE_OUT = "spot_edge_out"
-    ON_EDGE_BOTTOM = "on_edge_bottom"
-    BOTTOM_EDGE_MODE = "bottom_edge_mode"
-    VERTEX_OUT = "vertex_out"
+    SPHERE_OUT = 8                # 球外
+    POLYGON_MODE = 9              # 多角形モード
+    SPOT_BOTTOM = 10
+    SPOT_EDGE_OUT = 11
+    ON_EDGE_BOTTOM = 12
+    BOTTOM_EDGE_MODE = 13
+    VERTEX_OUT = 14
 
     # ── “〜_OUT” グループ ────────────────
-    BOTTOM_OUT = "bottom_out"
-    SURFACE_OUT = "surface_out"
-    EDGE_OUT = "edge_out"
+    BOTTOM_OUT = 15
+    SURFACE_OUT = 16
+    EDGE_OUT = 17
+
+    def __str__(self):
+        return self.name.lower()      # 旧 str Enum の値 ("inside" など) と同じ表記
+
+
+STATUSES = tuple(IOStatus)            # コード → IOStatus
+
+
+def _table(*statuses) -> np.ndarray:
+    t = np.zeros(len(STATUSES), dtype=bool)
+    t[list(statuses)] = True
+    t.setflags(write=False)
+    return t
+
+
+# ---------- 真偽表（添字 = 状態コード） ---------- #
+# 1 ステップ前進する状態
+ADVANCES = _table(IOStatus.INSIDE, IOStatus.TEMP_ON_SURFACE, IOStatus.TEMP_ON_EDGE,
+                  IOStatus.SPOT_BOTTOM, IOStatus.ON_EDGE_BOTTOM, IOStatus.TEMP_ON_POLYGON)
+# 境界上（0.99 倍で引き直す）
+IS_BOUNDARY = _table(IOStatus.BORDER)
+# 壁に当たって cut-and-bend で曲げる状態（stick_status を立てる）
+NEEDS_BEND = _table(IOStatus.SPHERE_OUT, IOStatus.SPOT_EDGE_OUT, IOStatus.BOTTOM_OUT,
+                    IOStatus.SURFACE_OUT, IOStatus.EDGE_OUT, IOStatus.VERTEX_OUT)
+# prev_IO_status の持ち越し: CARRY_FROM から CARRY_OVER へ移ったら前回の状態を使う
+CARRY_FROM = _table(IOStatus.TEMP_ON_EDGE, IOStatus.TEMP_ON_SURFACE)
+CARRY_OVER = _table(IOStatus.INSIDE, IOStatus.TEMP_ON_POLYGON, IOStatus.TEMP_ON_SURFACE,
+                    IOStatus.TEMP_ON_EDGE, IOStatus.SPOT_BOTTOM)
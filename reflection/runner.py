@@ -1,9 +1,11 @@
 from __future__ import annotations
 from typing import Iterator, Tuple, Dict
+import numpy as np
+from core.geometry import resolve_step_batch
 from core.simulation import SpermSimulation
 from reflection.scenarios import cube_scenarios, drop_scenarios, spot_scenarios
 
-def run_all(shape: str, constants: Dict) -> Iterator[Tuple[str, SpermSimulation]]:
+def _scenarios(shape: str, constants: Dict):
     if shape == "cube":
         gen = cube_scenarios(constants["step_length"], constants["radius"])
     elif shape == "drop":
@@ -16,11 +18,23 @@ def run_all(shape: str, constants: Dict) -> Iterator[Tuple[str, SpermSimulation]
                              constants["theta_spot"])
     else:
         raise ValueError(f"Reflection not implemented for {shape}")
+    return gen
 
-    for name, params in gen:
+def run_all(shape: str, constants: Dict) -> Iterator[Tuple[str, SpermSimulation]]:
+    for name, params in _scenarios(shape, constants):
         c = constants.copy()
         c.update(params)
         c["analysis_type"] = "reflection"
         sim = SpermSimulation(c)
         sim.simulate()
         yield name, sim
+
+def resolve_all(shape: str, constants: Dict) -> Dict[str, np.ndarray]:
+    """全シナリオの (start_position, reflection_vector) を 1 回の
+    resolve_step_batch で解決し、シナリオ名 → 解決後ステップを返す"""
+    items = list(_scenarios(shape, constants))
+    P = np.array([p['start_position'] for _, p in items], dtype=float)
+    V = np.array([p['reflection_vector'] for _, p in items], dtype=float)
+    c = dict(constants, shape=shape)
+    steps = resolve_step_batch(P, V, c)
+    return {name: v for (name, _), v in zip(items, steps)}
@@ -0,0 +1,556 @@
+"""batch.py  –  main.SpermSimulation の全精子一括エンジン
+single_sperm_simulation の状態機械（IOStatus ごとの分岐・stick_status の
+カウントダウン・prev_IO_status の持ち越し）を、精子ごとの状態コード配列
+(int8) に置き換えて全精子同時に回す。
+
+1 サブステップ = ループ版 while の 1 周:
+    1. 全アクティブ精子の temp_position を形状ごとに一括分類
+    2. prev_IO_status の持ち越し規則を適用
+    3. 状態コードでグループ分けし、各 cut_and_bend_* 規則を NumPy で一括適用
+ステップを進めるのは「前進」グループと POLYGON_MODE だけなので、精子ごとに
+進んだステップ数 i は異なる。全員が n_simulation に達したら終了。
+
+乱数は各精子の Generator (sim.rng.sperm[j]) からループ版と同じ順で引くので、
+精子ごとの乱数列はループ版と一致する。
+
+    constants['engine'] = 'batch'
+    sim = SpermSimulation(constants, None, None)
+    sim.simulate()
+"""
+
+from __future__ import annotations
+import contextlib
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+from io_status import (IOStatus, STATUSES, ADVANCES, NEEDS_BEND,
+                       CARRY_FROM, CARRY_OVER)
+from .geometry import Cube, Drop, Spot
+from .cone import cone_vectors, draw_uniforms
+from .intersect import ray_sphere_exit, segment_circle, align_to_z, dot3, norm3
+
+# ---------- 状態コード ---------- #
+# IOStatus は 0 始まりの IntEnum なので、そのまま int8 のコードとして配列に入れる
+CODE = {s: np.int8(s) for s in STATUSES}
+
+_NONE, _INSIDE, _BORDER = CODE[IOStatus.NONE], CODE[IOStatus.INSIDE], CODE[IOStatus.BORDER]
+_ON_SURF, _ON_EDGE = CODE[IOStatus.TEMP_ON_SURFACE], CODE[IOStatus.TEMP_ON_EDGE]
+_ON_POLY, _SPOT_BOTTOM = CODE[IOStatus.TEMP_ON_POLYGON], CODE[IOStatus.SPOT_BOTTOM]
+_ON_EDGE_BOTTOM = CODE[IOStatus.ON_EDGE_BOTTOM]
+_SPHERE_OUT, _POLY_MODE = CODE[IOStatus.SPHERE_OUT], CODE[IOStatus.POLYGON_MODE]
+_SPOT_EDGE_OUT, _BOTTOM_OUT = CODE[IOStatus.SPOT_EDGE_OUT], CODE[IOStatus.BOTTOM_OUT]
+_SURF_OUT, _EDGE_OUT = CODE[IOStatus.SURFACE_OUT], CODE[IOStatus.EDGE_OUT]
+_VERTEX_OUT = CODE[IOStatus.VERTEX_OUT]
+
+
+# ---------- 小道具 ---------- #
+# 内積・長さはループ版と同じ dot3 / norm3（einsum だと丸めがずれて軌跡が一致しない）
+_dot, _norm = dot3, norm3
+
+def _unit(A):
+    return A / _norm(A)[:, None]
+
+def _cross(A, B):
+    return np.cross(A, B)
+
+
+# ---------- 一括分類 ---------- #
+def classify_drop(shape: Drop, P: np.ndarray, stick: np.ndarray):
+    d2 = _dot(P, P)
+    codes = np.full(len(P), _BORDER, dtype=np.int8)
+    inner = d2 < shape.R2_in
+    codes[inner] = np.where(stick[inner] > 0, _ON_POLY, _INSIDE)
+    codes[d2 > shape.R2_out] = _SPHERE_OUT
+    return codes
+
+
+def classify_spot(shape: Spot, P: np.ndarray, base: np.ndarray, prev: np.ndarray):
+    lim, bz, bR = shape.limit, shape.bottom_z, shape.bottom_R
+    x, y, z = P.T
+    codes = np.full(len(P), _INSIDE, dtype=np.int8)
+    # 底面より上
+    above = z > bz + lim
+    codes[above & (np.sqrt(x*x + y*y + z*z) > shape.R + lim)] = _SPHERE_OUT
+    # 底面より下: base→temp が底面円盤を横切るか
+    below = z < bz - lim
+    if below.any():
+        b, p = base[below], P[below]
+        t = (bz - b[:, 2]) / (p[:, 2] - b[:, 2])
+        ix = b[:, 0] + t * (p[:, 0] - b[:, 0])
+        iy = b[:, 1] + t * (p[:, 1] - b[:, 1])
+        hit = (t >= 0) & (t <= 1) & (np.sqrt(ix*ix + iy*iy) < bR + lim)
+        codes[below] = np.where(hit, _BOTTOM_OUT, _SPHERE_OUT)
+    # 底面上
+    on = (bz - lim < z) & (z < bz + lim)
+    r_xy = np.sqrt(x*x + y*y)
+    codes[on & (r_xy > bR + lim)] = _SPOT_EDGE_OUT
+    codes[on & (np.abs(r_xy - bR) <= lim)] = _BORDER
+    in_disc = on & (r_xy < bR - lim)
+    poly = (prev == _SPOT_EDGE_OUT) | (prev == _POLY_MODE)
+    codes[in_disc] = np.where(poly[in_disc], _POLY_MODE, _SPOT_BOTTOM)
+    return codes
+
+
+# ---------- cut & bend（一括版） ---------- #
+def cut_and_bend_cube(shape, base, temp, rem, limit):
+    """main.cut_and_bend_cube の一括版。(temp, ip, rem) を返す"""
+    lo, hi = shape.lo, shape.hi
+    d = temp - base
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_lo = (lo - base) / d
+        r_hi = (hi - base) / d
+    ratio = np.where(temp < lo - limit, r_lo, np.where(temp > hi + limit, r_hi, np.inf))
+    ax = np.argmin(ratio, axis=1)
+    rows = np.arange(len(base))
+    cut = ratio[rows, ax][:, None]
+    ip = base + d * cut
+    last = temp - ip
+    short = _norm(last) < limit
+    if short.any():                                   # ループ版と同じく 1.1 倍して取り直す
+        temp = temp.copy()
+        temp[short] = base[short] + 1.1 * d[short]
+        ip[short] = base[short] + (temp[short] - base[short]) * cut[short]
+        last[short] = temp[short] - ip[short]
+        if (_norm(last[short]) < limit).any():
+            sys.exit("last_vec too small even after scaling")
+    last[rows, ax] = 0
+    nv = _norm(last)
+    rem = np.maximum(rem - _norm(ip - base), 0.0)
+    if (nv == 0).any():
+        sys.exit("this is ありえない２２２！")
+    temp = ip + last / nv[:, None] * rem[:, None]
+    return temp, ip, rem
+
+
+def cut_and_bend_vertex(vertex, base, rem, step_length, gens):
+    """main.cut_and_bend_vertex の一括版。(ip, temp, rem) を返す"""
+    move = np.maximum(rem - _norm(vertex - base), 0.0)
+    inc = vertex - base
+    dist = _norm(inc)
+    with np.errstate(invalid='ignore'):
+        inc_dir = np.where(dist[:, None] == 0, 0.0, inc / dist[:, None])
+    sign = np.where(vertex > 0, -1.0, 1.0)
+    new_temp = np.empty_like(base)
+    for k, g in enumerate(gens):
+        edges = [e for e in (sign[k, a] * np.eye(3)[a] for a in range(3))
+                 if not (np.allclose(e, inc_dir[k]) or np.allclose(e, -inc_dir[k]))]
+        new_temp[k] = vertex[k] + edges[g.integers(len(edges))] * move[k]
+    return vertex.copy(), new_temp, np.full(len(base), step_length)
+
+
+def cut_and_bend_bottom(base, temp, rem, bottom_z, limit, min_len):
+    """main.cut_and_bend_bottom の一括版。(temp, ip, rem) を返す"""
+    ratio = (bottom_z - base[:, 2]) / (temp[:, 2] - base[:, 2])
+    ip = base + (temp - base) * ratio[:, None]
+    ip[:, 2] = bottom_z
+    last = temp - ip
+    if (_norm(last) < limit).any():
+        sys.exit("last_vec too small")
+    last[:, 2] = 0
+    nv = _norm(last)
+    rem = np.maximum(rem - _norm(ip - base), 0.0)
+    if (nv < limit).any():
+        sys.exit("vector finished on the surface: redo")
+    adj = last / nv[:, None] * rem[:, None]
+    if (_norm(adj) < min_len).any():
+        raise ValueError("last_vec_adjusted is too small; simulation aborted.")
+    return ip + adj, ip, rem
+
+
+def _edge_tangent(ip, base, inner_angle, eps_b, eps_o, fix_zero):
+    """底面の縁に沿って inner_angle だけ内側へ振った単位接線（xy 平面）"""
+    bi = ip - base
+    bi_norm = _norm(bi)
+    bi_norm[bi_norm < eps_b] = 1e-8
+    bi_n = bi / bi_norm[:, None]
+    oi = ip.copy()
+    oi[:, 2] = 0
+    oi_norm = _norm(oi)
+    oi_norm[oi_norm < eps_o] = 1e-8
+    oi_n = oi / oi_norm[:, None]
+    t1 = np.stack([-oi_n[:, 1], oi_n[:, 0], np.zeros(len(ip))], axis=1)
+    a1 = np.arccos(np.clip(t1[:, 0]*bi_n[:, 0] + t1[:, 1]*bi_n[:, 1], -1.0, 1.0))
+    a2 = np.arccos(np.clip(-t1[:, 0]*bi_n[:, 0] + -t1[:, 1]*bi_n[:, 1], -1.0, 1.0))
+    sel = np.where((a1 < a2)[:, None], t1, -t1)
+    cross = sel[:, 0]*bi_n[:, 1] - sel[:, 1]*bi_n[:, 0]
+    ang = np.where(cross > 0, -inner_angle, inner_angle)
+    c, s = np.cos(ang), np.sin(ang)
+    rot = np.stack([sel[:, 0]*c - sel[:, 1]*s, sel[:, 0]*s + sel[:, 1]*c,
+                    np.zeros(len(ip))], axis=1)
+    if fix_zero:
+        n = _norm(rot)
+        bad = n < fix_zero
+        rot[bad] = sel[bad]
+        return rot / _norm(rot)[:, None]
+    return rot / (_norm(rot) + 1e-12)[:, None]
+
+
+def cut_and_bend_spot_edge_out(base, temp, rem, bottom_z, bottom_R, inner_angle):
+    """main.cut_and_bend_spot_edge_out の一括版。(temp, ip, rem) を返す"""
+    _, xi, yi = segment_circle(base, temp, bottom_R)
+    ip = np.stack([xi, yi, np.full(len(base), bottom_z)], axis=1)
+    rem = np.maximum(rem - _norm(ip - base), 0.0)
+    tang = _edge_tangent(ip, base, inner_angle, 1e-12, 1e-12, fix_zero=0)
+    new_temp = ip + tang * rem[:, None]
+    new_temp[:, 2] = bottom_z
+    return new_temp, ip, rem
+
+
+def cut_and_bend_sphere(base, rem, temp, radius, inner_angle, limit):
+    """
+    main.cut_and_bend_sphere の一括版。(temp, ip) を返す。
+    折り返し後の長さには交点までを引いた残り距離を使うが、呼び出し側の
+    remaining_distance 自体は更新しない（ループ版と同じ）。
+    """
+    d = temp - base
+    d_norm = _norm(d)
+    if (d_norm < limit).any():
+        sys.exit("too short")
+    d_unit = d / d_norm[:, None]
+    t, ip, _, disc = ray_sphere_exit(base, d_unit, radius, limit)
+    if (disc < limit).any():
+        sys.exit("Vector bi_norm is zero!")
+    if np.isinf(t).any():
+        sys.exit("No positive t found for intersection.")
+    rem = rem - t * d_norm          # line_sphere_intersection と同じ（t は距離だが d_norm を掛ける）
+    oi_n = _unit(ip)
+    bi = ip - base
+    if (_norm(bi) < limit).any():
+        sys.exit("Vector bi_norm is zero!")
+    bi_n = bi / _norm(bi)[:, None]
+    normal_B = _unit(_cross(bi_n, oi_n))
+    tan1 = _unit(_cross(normal_B, oi_n))
+    bi_u = _unit(bi_n)
+    a1 = np.arccos(np.clip(_dot(_unit(tan1), bi_u), -1.0, 1.0))
+    a2 = np.arccos(np.clip(_dot(_unit(-tan1), bi_u), -1.0, 1.0))
+    sel = np.where((a1 < a2)[:, None], tan1, -tan1)
+    ang = np.where(_dot(_cross(sel, normal_B), bi_n) < 0, -inner_angle, inner_angle)
+    axis = _unit(normal_B)
+    cos, sin = np.cos(ang)[:, None], np.sin(ang)[:, None]
+    # main.rotate_vector と同じ式（第 3 項はスカラーとして全成分に加わる）
+    v = sel * cos + _cross(axis, sel) * sin + (_dot(axis, sel)[:, None] * (1 - cos))
+    return ip + _unit(v) * rem[:, None], ip
+
+
+def bottom_edge_mode(base, last_vec, stick, gens, bottom_z, bottom_R, inner_angle, limit):
+    """SpermSimulation.bottom_edge_mode の一括版。(temp, last_vec, stick) を返す"""
+    cand = base + last_vec
+    cand[:, 2] = bottom_z
+    temp, new_last = cand, last_vec.copy()
+    out = cand[:, 0]**2 + cand[:, 1]**2 > bottom_R**2
+    if out.any():
+        b, lv, st = base[out], last_vec[out], stick[out]
+        _, xi, yi = segment_circle(b, cand[out], bottom_R, clamp=True)
+        ip = np.stack([xi, yi, np.full(len(b), bottom_z)], axis=1)
+        lv_norm = _norm(lv)
+        rem = np.maximum(lv_norm - _norm(ip - b), 0)
+        nt = np.empty_like(b)
+        s = st > 0
+        if s.any():                                  # 縁に沿って滑る
+            tang = _edge_tangent(ip[s], b[s], inner_angle, limit, limit, fix_zero=limit)
+            nt[s] = ip[s] + tang * rem[s][:, None]
+            nt[s, 2] = bottom_z
+        f = ~s
+        if f.any():                                  # 底面と球面の間のコーンへ飛び出す
+            n = ip[f].copy()
+            nn = _norm(n)
+            small = nn < limit
+            n[small] = [0.0, 0.0, 1.0]
+            nn[small] = 1.0
+            n /= nn[:, None]
+            # ループ版は sphere_normal_3d が intersection_point の別名なので
+            # 正規化で交点自体も単位ベクトルに書き換わる。それに合わせる
+            fi = np.nonzero(f)[0]
+            ip[fi[~small]] = n[~small]
+            open_angle = np.arccos(np.clip(n[:, 2], -1, 1))
+            axis = n.copy()
+            axis[:, 2] += 1.0
+            axis /= 2
+            an = _norm(axis)
+            small = an < limit
+            axis[small] = [0.0, 0.0, 1.0]
+            an[small] = 1.0
+            axis /= an[:, None]
+            cos_max = np.cos(open_angle)
+            rows = np.nonzero(out)[0][f]
+            zp = np.empty((len(rows), 2))
+            for k, r in enumerate(rows):
+                zp[k] = gens[r].uniform(cos_max[k], 1.0), gens[r].uniform(0, 2*np.pi)
+            sq = np.sqrt(1 - zp[:, 0]**2)
+            local = np.stack([sq*np.cos(zp[:, 1]), sq*np.sin(zp[:, 1]), zp[:, 0]], axis=1)
+            nt[f] = ip[f] + align_to_z(axis, local) * lv_norm[f][:, None]
+        temp = cand.copy()
+        temp[out] = nt
+        new_last[out] = nt - ip
+    return temp, new_last, np.where(stick > 0, stick - 1, stick)
+
+
+# ---------- 方向生成（一括版） ---------- #
+def prepare_new_vector(last_vec, inward, do_proj, gens, c):
+    """
+    main.prepare_new_vector の一括版（edge かつ stick>0 の直進は呼び出し側で処理）。
+    inward は (N,3) か None、do_proj は (N,) bool。
+    """
+    vn = _norm(last_vec)
+    if (vn < c['limit']).any():
+        raise ValueError("prepare_new_vector: last_vec が短すぎます。")
+    return cone_vectors(last_vec / vn[:, None], draw_uniforms(gens), c, inward, do_proj)
+
+
+def face_inward_cube(shape, P, limit):
+    """face_and_inward_dir の TEMP_ON_SURFACE / TEMP_ON_EDGE 分岐（None は [0,0,1]）"""
+    lo, hi = shape.lo, shape.hi
+    on_lo = np.abs(P - lo) <= limit
+    on_hi = np.abs(P - hi) <= limit
+    pinned = on_lo | on_hi
+    hits = on_lo.sum(1) + on_hi.sum(1)
+    pin_val = np.where(on_lo, lo, hi)
+    out = np.tile([0.0, 0.0, 1.0], (len(P), 1))
+    one = hits == 1
+    if one.any():
+        # ループ版は「ピン留め値が max と一致するか」で向きを決める
+        at_max = np.abs(pin_val - hi) <= limit
+        out[one] = np.where(pinned[one], np.where(at_max[one], -1.0, 1.0), 0.0)
+    two = hits == 2
+    if two.any():
+        mid = np.where(pinned, pin_val, 0.0)
+        free = two & (pinned.sum(1) == 2)
+        mid[free] = np.where(pinned[free], mid[free], (lo + hi) / 2)
+        dv = -mid[two]
+        n = _norm(dv)
+        if (n < limit).any():
+            sys.exit("no way3")
+        out[two] = dv / n[:, None]
+    return out
+
+
+def face_inward_polygon(base, last_vec, limit):
+    """face_and_inward_dir の INSIDE / TEMP_ON_POLYGON 分岐"""
+    denom = _dot(last_vec, last_vec)
+    if (np.abs(denom) < limit).any():
+        sys.exit("last_vec is zero or near-zero in face_and_inward_dir")
+    t = -_dot(base, last_vec) / denom
+    F = base + t[:, None] * last_vec
+    nF = _norm(F)
+    if (nF <= limit).any():
+        sys.exit("原点を通るのでredo")
+    return -F / nF[:, None]
+
+
+def meets_eggs(eggs, base, temp):
+    """SpermSimulation.eggs_meeting_vector の一括版。(行番号, 卵子番号) の組を返す"""
+    if (_norm(temp - base) < 1e-9).any():
+        sys.exit("zzz")
+    return eggs.query(base, temp)
+
+
+def _progress_bar(total, quiet):
+    """tqdm は表示するときだけ import する。quiet なら update だけ持つダミー"""
+    if quiet:
+        return contextlib.nullcontext(SimpleNamespace(update=lambda n: None))
+    from tqdm import tqdm
+    return tqdm(total=total, desc="シミュレーション中のステップ進捗", ncols=100)
+
+
+# ---------- エンジン本体 ---------- #
+class BatchEngine:
+    """main.SpermSimulation の状態を配列に持ち替えて全精子を一括で進める"""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.c = sim.constants
+        self.geom = sim.geom                          # run ごとの不変量（main.run_geometry）
+        self.shape = self.geom.shape
+        self.eggs = self.geom.eggs
+        n = sim.number_of_sperm
+        self.gens = sim.rng.sperm
+        self.i = np.ones(n, dtype=np.int64)
+        self.base = sim.start_positions[:, 0].copy()
+        self.temp = sim.start_positions[:, 1].copy()
+        self.last_pos = self.base.copy()              # = trajectory[j, i - 1]
+        self.rem = np.full(n, self.geom.step_length)
+        self.stick = np.full(n, int(sim.initial_stick_status), dtype=np.int64)
+        self.last_vec = np.zeros((n, 3))
+        self.ip = np.zeros((n, 3))
+        self.has_ip = np.zeros(n, dtype=bool)
+        self.prev = np.full(n, _NONE, dtype=np.int8)
+        self.traj = sim.trajectory
+        if self.traj is not None:
+            self.traj[:, 0] = self.base
+
+    # ---- 1. 分類 ------------------------------------------------
+    def classify(self, act):
+        shape, temp, base = self.shape, self.temp[act], self.base[act]
+        vertex = None
+        if isinstance(shape, Cube):                   # cube / ceros
+            codes, vertex = shape.classify(temp)
+            return codes, vertex
+        if isinstance(shape, Drop):
+            fn = lambda P: classify_drop(shape, P, self.stick[act])
+        else:
+            fn = lambda P: classify_spot(shape, P, base, self.prev[act])
+        codes = fn(temp)
+        border = codes == _BORDER
+        if border.any():                              # 境界上は 0.99 倍して取り直す
+            vec = temp[border] - base[border]
+            ok = _norm(vec) > self.c['limit']
+            rows = act[border][ok]
+            self.temp[rows] = self.base[rows] + vec[ok] * 0.99
+            codes = fn(self.temp[act])
+            if (codes == _BORDER).any():
+                sys.exit("drop: rethink logic for border" if isinstance(shape, Drop)
+                         else "rethink logic 3")
+        return codes, vertex
+
+    # ---- 2. 前進（ステップ確定） ----------------------------------
+    def advance(self, rows, codes):
+        c, limit = self.c, self.c['limit']
+        temp = self.temp[rows].copy()
+        prev_pos = self.last_pos[rows]
+        i = self.i[rows]
+        if self.traj is not None:
+            self.traj[rows, i] = temp
+        self.base[rows] = temp
+        self.rem[rows] = self.geom.step_length
+        st = self.stick[rows]
+        st = np.where(st > 0, st - 1, st)
+        lv = np.where(self.has_ip[rows][:, None], temp - self.ip[rows], temp - prev_pos)
+        self.has_ip[rows] = False
+        k, egg = meets_eggs(self.eggs, prev_pos, temp)
+        if len(k):
+            self.sim.record_contacts(rows[k], i[k], egg)
+        new_temp = np.empty_like(temp)
+        gens = self.gens
+
+        def grp(code):
+            return np.nonzero(codes == code)[0]
+
+        if (codes == _ON_EDGE_BOTTOM).any():
+            sys.exit("ありえるのか？")
+        if isinstance(self.shape, Cube):
+            for code in (_ON_EDGE, _ON_SURF):
+                g = grp(code)
+                if not len(g):
+                    continue
+                inward = face_inward_cube(self.shape, temp[g], limit)
+                if code == _ON_EDGE:
+                    straight = st[g] > 0
+                    new_temp[g[straight]] = temp[g[straight]] + lv[g[straight]]
+                    g, inward = g[~straight], inward[~straight]
+                    proj = np.zeros(len(g), dtype=bool)
+                else:
+                    proj = st[g] > 0
+                if len(g):
+                    new_temp[g] = temp[g] + prepare_new_vector(
+                        lv[g], inward, proj, [gens[r] for r in rows[g]], c)
+        g = grp(_SPOT_BOTTOM)
+        if len(g):
+            inward = np.tile([0.0, 0.0, 1.0], (len(g), 1))
+            new_temp[g] = temp[g] + prepare_new_vector(
+                lv[g], inward, st[g] > 0, [gens[r] for r in rows[g]], c)
+        g = grp(_ON_POLY)
+        if len(g):
+            inward = face_inward_polygon(temp[g], lv[g], limit)
+            new_temp[g] = temp[g] + prepare_new_vector(
+                lv[g], inward, st[g] > 0, [gens[r] for r in rows[g]], c)
+        g = grp(_INSIDE)
+        if len(g):                                    # ループ版 else 節: stick をもう 1 回減らす
+            st[g] = np.where(st[g] > 0, st[g] - 1, st[g])
+            lv[g] = temp[g] - prev_pos[g]
+            if (_norm(lv[g]) < limit).any():
+                sys.exit("last vec is too short!")
+            new_temp[g] = temp[g] + prepare_new_vector(
+                lv[g], None, np.zeros(len(g), dtype=bool), [gens[r] for r in rows[g]], c)
+        self.stick[rows] = st
+        self.last_vec[rows] = lv
+        self.temp[rows] = new_temp
+        self.last_pos[rows] = temp
+        self.i[rows] += 1
+
+    # ---- 3. POLYGON_MODE --------------------------------------------
+    def polygon_mode(self, rows):
+        c = self.c
+        temp = self.temp[rows].copy()
+        if self.traj is not None:
+            self.traj[rows, self.i[rows]] = temp
+        self.base[rows] = temp
+        lv = np.where(self.has_ip[rows][:, None], temp - self.ip[rows],
+                      temp - self.last_pos[rows])
+        self.has_ip[rows] = False
+        new_temp, new_lv, st = bottom_edge_mode(
+            temp, lv, self.stick[rows], [self.gens[r] for r in rows],
+            self.shape.bottom_z, self.shape.bottom_R, c['inner_angle'], c['limit'])
+        self.temp[rows], self.last_vec[rows], self.stick[rows] = new_temp, new_lv, st
+        self.last_pos[rows] = temp
+        self.i[rows] += 1
+
+    # ---- 4. 境界外（cut & bend） ------------------------------------
+    def bend(self, rows, codes, vertex):
+        c, limit = self.c, self.c['limit']
+        st = self.stick[rows]
+        st[(st == 0) & NEEDS_BEND[codes]] = self.geom.stick_steps
+        self.stick[rows] = st
+        base, temp, rem = self.base[rows], self.temp[rows], self.rem[rows]
+        new_temp, ip, new_rem = temp.copy(), base.copy(), rem.copy()
+
+        g = np.nonzero(codes == _SPHERE_OUT)[0]
+        if len(g):
+            new_temp[g], ip[g] = cut_and_bend_sphere(
+                self.last_pos[rows[g]], rem[g], temp[g],
+                c['radius'], c['inner_angle'], limit)
+        g = np.nonzero(codes == _SPOT_EDGE_OUT)[0]
+        if len(g):
+            new_temp[g], ip[g], new_rem[g] = cut_and_bend_spot_edge_out(
+                base[g], temp[g], rem[g], self.shape.bottom_z, self.shape.bottom_R,
+                c['inner_angle'])
+        g = np.nonzero(codes == _BOTTOM_OUT)[0]
+        if len(g):
+            new_temp[g], ip[g], new_rem[g] = cut_and_bend_bottom(
+                base[g], temp[g], rem[g], self.shape.bottom_z, limit,
+                c['VSL'] / c['sampl_rate_Hz'] * 1e-7)
+        g = np.nonzero((codes == _SURF_OUT) | (codes == _EDGE_OUT))[0]
+        if len(g):
+            new_temp[g], ip[g], new_rem[g] = cut_and_bend_cube(
+                self.shape, base[g], temp[g], rem[g], limit)
+        g = np.nonzero(codes == _VERTEX_OUT)[0]
+        if len(g):
+            ip[g], new_temp[g], new_rem[g] = cut_and_bend_vertex(
+                vertex[g], base[g], rem[g], c['VSL'] / c['sampl_rate_Hz'],
+                [self.gens[r] for r in rows[g]])
+        self.base[rows] = ip
+        self.temp[rows] = new_temp
+        self.rem[rows] = new_rem
+        self.ip[rows] = ip
+        self.has_ip[rows] = True
+        self.last_vec[rows] = new_temp - ip
+
+    # ---- メインループ --------------------------------------------------
+    def run(self):
+        n_sim = self.sim.n_simulation
+        quiet = self.c.get('run_progress', 'yes') == 'no'
+        total = self.sim.number_of_sperm * max(n_sim - 1, 0)
+        with _progress_bar(total, quiet) as bar:
+            while True:
+                act = np.nonzero(self.i < n_sim)[0]
+                if not len(act):
+                    break
+                codes, vertex = self.classify(act)
+                carry = CARRY_FROM[self.prev[act]] & (self.stick[act] > 0) & CARRY_OVER[codes]
+                codes[carry] = self.prev[act][carry]
+                self.prev[act] = codes
+                adv = ADVANCES[codes]
+                poly = codes == _POLY_MODE
+                out = NEEDS_BEND[codes]
+                stuck = ~(adv | poly | out)
+                if stuck.any():
+                    s = STATUSES[codes[stuck][0]]
+                    raise RuntimeError(f"batch engine: unhandled status {s.name}")
+                if adv.any():
+                    self.advance(act[adv], codes[adv])
+                if poly.any():
+                    self.polygon_mode(act[poly])
+                if out.any():
+                    self.bend(act[out], codes[out], None if vertex is None else vertex[out])
+                bar.update(int(adv.sum() + poly.sum()))
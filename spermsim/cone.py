@@ -0,0 +1,197 @@
+"""cone.py  –  円錐方向サンプラ（一括版）
+main.py の旧 sample_random_angles / make_local_xy / generate_cone_vector を
+N 行まとめて処理する（cone_vectors）。ループ用の 1 本版 cone_vector もある。
+
+    θ : |N(0, σ)| を (limit, π - limit) に切った切断半正規分布
+    φ : U(-π, π)
+
+θ は棄却ループを使わず逆 CDF で 1 回で引く。半正規の CDF は
+F(x) = 2Φ(x/σ) - 1 なので、u ~ U(F(lo), F(hi)) に対して
+θ = σ Φ⁻¹((1 + u) / 2)。Φ⁻¹ は Acklam の有理近似（相対誤差 ~1e-9）。
+1 本あたりの乱数消費は常に一様乱数 2 個 (u_θ, u_φ) で、
+精子ごとの乱数列の進み方が棄却回数に左右されない。
+
+    U = draw_uniforms(gens)                    # (N,2)
+    d = cone_vectors(last_vec, U, c, inward, do_proj)
+    d = cone_vector(v, rng.random(2), c, inward, do_proj)   # 1 本版
+"""
+
+from __future__ import annotations
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .intersect import dot3 as _dot
+
+# ---------- Φ⁻¹ (Acklam) ---------- #
+_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+      1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+      6.680131188771972e+01, -1.328068155288572e+01)
+_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+      -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+      3.754408661907416e+00)
+_P_LOW = 0.02425
+
+
+def _poly(coef, x):
+    y = np.zeros_like(x)
+    for k in coef:
+        y = y * x + k
+    return y
+
+
+def ndtri(p) -> np.ndarray:
+    """標準正規分布の逆 CDF（p は (0,1) の配列）"""
+    p = np.asarray(p, dtype=float)
+    x = np.empty_like(p)
+    lo, hi = p < _P_LOW, p > 1 - _P_LOW
+    mid = ~(lo | hi)
+    q = p[mid] - 0.5
+    r = q * q
+    x[mid] = _poly(_A, r) * q / (_poly(_B, r) * r + 1)
+    for m, s, pp in ((lo, 1.0, p[lo]), (hi, -1.0, 1 - p[hi])):
+        q = np.sqrt(-2 * np.log(pp))
+        x[m] = s * _poly(_C, q) / (_poly(_D, q) * q + 1)
+    return x
+
+
+def ndtri1(p: float) -> float:
+    """ndtri のスカラー版。log は np.log（math.log とは最終ビットが違うことがある）"""
+    if _P_LOW <= p <= 1 - _P_LOW:
+        q = p - 0.5
+        r = q * q
+        a0, a1, a2, a3, a4, a5 = _A
+        b0, b1, b2, b3, b4 = _B
+        return (((((a0*r + a1)*r + a2)*r + a3)*r + a4)*r + a5) * q / \
+               (((((b0*r + b1)*r + b2)*r + b3)*r + b4)*r + 1)
+    s, pp = (1.0, p) if p < _P_LOW else (-1.0, 1 - p)
+    q = math.sqrt(-2 * float(np.log(pp)))
+    c0, c1, c2, c3, c4, c5 = _C
+    d0, d1, d2, d3 = _D
+    return s * (((((c0*q + c1)*q + c2)*q + c3)*q + c4)*q + c5) / \
+           ((((d0*q + d1)*q + d2)*q + d3)*q + 1)
+
+
+# ---------- 角度 ---------- #
+def _theta_bounds(sigma: float, limit: float):
+    s = sigma * math.sqrt(2)
+    return math.erf(limit / s), math.erf((math.pi - limit) / s)
+
+
+def sample_cone_angles(U: np.ndarray, sigma: float, limit: float) -> np.ndarray:
+    """一様乱数 U (N,2) → (θ, φ) (N,2)。θ は切断半正規、φ は U(-π, π)"""
+    f_lo, f_hi = _theta_bounds(sigma, limit)
+    u = f_lo + U[:, 0] * (f_hi - f_lo)
+    theta = sigma * ndtri((1 + u) / 2)
+    phi = -math.pi + U[:, 1] * (2 * math.pi)
+    return np.stack([theta, phi], axis=1)
+
+
+def draw_uniforms(gens: Sequence[np.random.Generator]) -> np.ndarray:
+    """精子ごとの Generator から 2 個ずつ。(N,2)"""
+    return np.array([g.random(2) for g in gens]).reshape(-1, 2)
+
+
+# ---------- 局所座標系 ---------- #
+def _cross(A, B):
+    """(N,3) × (N,3)。np.cross より軽い"""
+    return np.stack([A[:, 1]*B[:, 2] - A[:, 2]*B[:, 1],
+                     A[:, 2]*B[:, 0] - A[:, 0]*B[:, 2],
+                     A[:, 0]*B[:, 1] - A[:, 1]*B[:, 0]], axis=1)
+
+
+def local_frames(v: np.ndarray, inward: Optional[np.ndarray] = None):
+    """
+    make_local_xy の (N,3) 版。(v̂, local_x, local_y) を返す。
+    inward が None なら v と直交する任意軸、あれば inward を local_x にする。
+    """
+    vn = np.sqrt(_dot(v, v))
+    v = np.where((vn < 1e-12)[:, None], [0.0, 0.0, 1.0], v / np.where(vn < 1e-12, 1.0, vn)[:, None])
+    if inward is None:
+        arb = np.where((np.abs(v[:, 0]) > 0.9)[:, None], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0])
+        lx = _cross(v, arb)
+    else:
+        lx = np.asarray(inward, dtype=float)
+    lxn = np.sqrt(_dot(lx, lx))
+    small = lxn < 1e-12
+    lx = np.where(small[:, None], [1.0, 0.0, 0.0], lx / np.where(small, 1.0, lxn)[:, None])
+    if inward is not None and (np.abs(np.abs(_dot(lx, v)) - 1.0) <= 1e-12).any():
+        raise ValueError("inward_dir は v と平行でないベクトルを指定してください。")
+    ly = _cross(v, lx)
+    ly /= np.sqrt(_dot(ly, ly))[:, None]
+    return v, lx, ly
+
+
+# ---------- 円錐ベクトル ---------- #
+def cone_vectors(last_vec: np.ndarray, U: np.ndarray, c: dict,
+                 inward: Optional[np.ndarray] = None,
+                 do_proj: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    generate_cone_vector の (N,3) 版。last_vec まわりに (θ, φ) で振った
+    長さ step_length の方向を返す。do_proj の行は inward 方向の成分を落とす。
+    """
+    v, lx, ly = local_frames(np.asarray(last_vec, dtype=float), inward)
+    th, ph = sample_cone_angles(U, c['deviation'], c['limit']).T
+    st = np.sin(th)
+    d = (st*np.cos(ph))[:, None]*lx + (st*np.sin(ph))[:, None]*ly + np.cos(th)[:, None]*v
+    if do_proj is not None and do_proj.any():
+        inn = np.sqrt(_dot(inward, inward))
+        p = do_proj & (inn > 1e-12)
+        n_unit = inward[p] / inn[p][:, None]
+        d[p] -= _dot(d[p], n_unit)[:, None] * n_unit
+    nd = np.sqrt(_dot(d, d))
+    zero = nd < 1e-12
+    d *= (c['step_length'] / np.where(zero, 1.0, nd))[:, None]
+    d[zero] = 0.0
+    return d
+
+
+def cone_vector(v, u, c: dict, inward=None, do_proj: bool = False) -> np.ndarray:
+    """
+    cone_vectors の 1 本版（main.py のループ用）。v は単位ベクトル (3,)、
+    u は一様乱数 2 個。小さい配列に NumPy を通すと遅いので四則と sqrt は math で計算し、
+    三角関数だけ np（cone_vectors と同じ実装）に通して一括版とビット単位で揃える。
+    """
+    sigma, limit = c['deviation'], c['limit']
+    vx, vy, vz = v
+    vn = math.sqrt(vx*vx + vy*vy + vz*vz)
+    if vn < 1e-12:
+        vx, vy, vz = 0.0, 0.0, 1.0
+    else:
+        vx, vy, vz = vx/vn, vy/vn, vz/vn
+    if inward is None:
+        ax, ay, az = (0.0, 1.0, 0.0) if abs(vx) > 0.9 else (1.0, 0.0, 0.0)
+        lx, ly, lz = vy*az - vz*ay, vz*ax - vx*az, vx*ay - vy*ax
+    else:
+        lx, ly, lz = (float(t) for t in inward)
+    n = math.sqrt(lx*lx + ly*ly + lz*lz)
+    if n < 1e-12:
+        lx, ly, lz = 1.0, 0.0, 0.0
+    else:
+        lx, ly, lz = lx/n, ly/n, lz/n
+    if inward is not None and abs(abs(lx*vx + ly*vy + lz*vz) - 1.0) <= 1e-12:
+        raise ValueError("inward_dir は v と平行でないベクトルを指定してください。")
+    mx, my, mz = vy*lz - vz*ly, vz*lx - vx*lz, vx*ly - vy*lx
+    n = math.sqrt(mx*mx + my*my + mz*mz)
+    mx, my, mz = mx/n, my/n, mz/n
+    f_lo, f_hi = _theta_bounds(sigma, limit)
+    th = sigma * ndtri1((1 + (f_lo + u[0] * (f_hi - f_lo))) / 2)
+    ph = -math.pi + u[1] * (2 * math.pi)
+    (st, sp), (z, cp) = np.sin((th, ph)).tolist(), np.cos((th, ph)).tolist()
+    a, b = st*cp, st*sp
+    dx, dy, dz = a*lx + b*mx + z*vx, a*ly + b*my + z*vy, a*lz + b*mz + z*vz
+    if do_proj:
+        nx, ny, nz = (float(t) for t in inward)
+        n = math.sqrt(nx*nx + ny*ny + nz*nz)
+        if n > 1e-12:
+            nx, ny, nz = nx/n, ny/n, nz/n
+            k = dx*nx + dy*ny + dz*nz
+            dx, dy, dz = dx - k*nx, dy - k*ny, dz - k*nz
+    nd = math.sqrt(dx*dx + dy*dy + dz*dz)
+    if nd < 1e-12:
+        return np.zeros(3)
+    k = c['step_length'] / nd
+    return np.array([dx*k, dy*k, dz*k])
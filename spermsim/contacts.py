@@ -0,0 +1,125 @@
+"""contacts.py  –  接触ステップの記録と連続接触のまとめ
+record_contact は (精子, ステップ, 卵子) を int32 の伸長配列 ContactLog に積むだけにし、
+連続接触は merge_runs が run-length で一括にまとめる（ソート 1 回 + diff / flatnonzero）。
+
+    log = ContactLog()
+    log.append(j, i, egg)                   # 1 件（ループ版）
+    log.extend(rows, steps, eggs)           # N 件（一括版）
+    runs = merge_runs(log.array)            # (M,5) int32: 精子, 開始, 終了, 継続ステップ数, 卵子
+    runs[:, DURATION] / sampl_rate_Hz       # 滞在時間 [s]
+
+contact_only では RunLog が接触を受けたその場で連続接触にまとめる
+（ステップごとの行を持たないので、メモリは連続接触の数だけ）。
+log.runs() はどちらの log でも merge_runs と同じ (M,5) を返す。
+
+runs は (精子, 開始ステップ, 卵子) の昇順。
+"""
+
+from __future__ import annotations
+import array as _array
+
+import numpy as np
+
+SPERM, START, END, DURATION, EGG = range(5)
+_EMPTY_RUNS = np.zeros((0, 5), dtype=np.int32)
+
+
+class ContactLog:
+    """
+    (精子, ステップ, 卵子) の行を int32 で積む。中身は array.array('i') の 3 つ組の並びで、
+    容量は array が倍々に伸ばす（1 件 = 12 バイト、Python のタプルを作らない）。
+    """
+
+    def __init__(self):
+        self._buf = _array.array("i")
+
+    def __len__(self) -> int:
+        return len(self._buf) // 3
+
+    def append(self, sperm: int, step: int, egg: int = 0):
+        self._buf.extend((sperm, step, egg))
+
+    def extend(self, sperm, step, egg=0):
+        """sperm / step / egg は同じ長さの配列（スカラーは全行に使う）"""
+        sperm = np.asarray(sperm)
+        rows = np.empty((len(sperm), 3), dtype=np.int32)
+        rows[:, 0], rows[:, 1], rows[:, 2] = sperm, step, egg
+        self._buf.frombytes(rows.tobytes())
+
+    @property
+    def array(self) -> np.ndarray:
+        """積んだ行 (N,3) int32 のコピー"""
+        return np.frombuffer(self._buf, dtype=np.int32).reshape(-1, 3).copy()
+
+    def runs(self) -> np.ndarray:
+        return merge_runs(self.array)
+
+
+class RunLog:
+    """
+    ContactLog と同じ append / extend を受け、(精子, 卵子) ごとに開いている連続接触
+    [開始, 終了] だけを持つ。途切れた連続は (精子, 開始, 終了, 継続, 卵子) の int32 で
+    閉じた側へ積む。ステップは (精子, 卵子) ごとに非減少で来る前提（両エンジンとも満たす）。
+    """
+
+    def __init__(self):
+        self._open = {}                         # (精子, 卵子) → [開始, 終了]
+        self._closed = _array.array("i")
+
+    def __len__(self) -> int:
+        """持っている連続接触の数（開いているものを含む）"""
+        return len(self._closed) // 5 + len(self._open)
+
+    def append(self, sperm: int, step: int, egg: int = 0):
+        run = self._open.get((sperm, egg))
+        if run is not None and step <= run[1] + 1:         # 同じステップの重複も同じ連続
+            run[1] = max(run[1], step)
+            return
+        if run is not None:
+            self._closed.extend((sperm, run[0], run[1], run[1] - run[0] + 1, egg))
+        self._open[(sperm, egg)] = [step, step]
+
+    def extend(self, sperm, step, egg=0):
+        sperm = np.asarray(sperm)
+        for s, t, e in zip(sperm.tolist(), np.broadcast_to(step, sperm.shape).tolist(),
+                           np.broadcast_to(egg, sperm.shape).tolist()):
+            self.append(s, t, e)
+
+    def runs(self) -> np.ndarray:
+        """閉じた連続と開いている連続を merge_runs と同じ (M,5) int32・同じ順で返す"""
+        runs = np.frombuffer(self._closed, dtype=np.int32).reshape(-1, 5)
+        if self._open:
+            runs = np.vstack((runs, [(s, a, b, b - a + 1, e)
+                                     for (s, e), (a, b) in self._open.items()]))
+        if not len(runs):
+            return _EMPTY_RUNS.copy()
+        return runs[np.lexsort((runs[:, EGG], runs[:, START], runs[:, SPERM]))].astype(np.int32)
+
+
+def merge_runs(events) -> np.ndarray:
+    """
+    (N,3) の (精子, ステップ, 卵子) を (精子, 卵子) ごとの連続ステップにまとめ、
+    (M,5) int32 の (精子, 開始, 終了, 継続ステップ数, 卵子) を返す。
+    同じステップが重複していても 1 つの連続として扱う。
+    """
+    ev = np.asarray(events, dtype=np.int32).reshape(-1, 3)
+    if not len(ev):
+        return _EMPTY_RUNS.copy()
+    s, t, e = ev[np.lexsort((ev[:, 1], ev[:, 2], ev[:, 0]))].T     # 精子 → 卵子 → ステップ
+    new = np.empty(len(s), dtype=bool)
+    new[0] = True
+    new[1:] = (s[1:] != s[:-1]) | (e[1:] != e[:-1]) | (np.diff(t) > 1)
+    first = np.flatnonzero(new)
+    last = np.append(first[1:], len(s)) - 1
+    runs = np.column_stack((s[first], t[first], t[last], t[last] - t[first] + 1, e[first]))
+    return runs[np.lexsort((runs[:, EGG], runs[:, START], runs[:, SPERM]))].astype(np.int32)
+
+
+def start_events(events) -> list:
+    """
+    merge_runs の (M,5) でも (精子, 開始, 卵子) の列でも、
+    DB 用の (精子, 開始ステップ, 卵子) の int の列にする
+    """
+    if isinstance(events, np.ndarray) and events.ndim == 2 and events.shape[1] == 5:
+        return events[:, [SPERM, START, EGG]].tolist()
+    return [(int(s), int(t), int(e)) for s, t, e in events]
@@ -0,0 +1,126 @@
+"""eggs.py  –  複数卵子の配置と接触判定用の一様グリッド索引
+卵子中心 (M,3) を一辺 2R + reach のセルに振り分けておくと、長さ reach 以下の
+線分に触れうる卵子は「線分の中点が入るセルとその周り 26 セル」にしかいない。
+1 ステップの線分ごとに全卵子を調べる O(M) の代わりに、近傍セルの卵子だけを
+segment_meets_sphere で確かめる。reach より長い線分だけは全卵子と総当たり。
+
+    eggs = EggIndex(centers, gamete_R, reach=step_length)
+    ids = eggs.hits(p0, p1)                 # 1 本（ループ版）→ 卵子番号（昇順）
+    seg, egg = eggs.query(P0, P1)           # N 本（一括版）→ (線分番号, 卵子番号)
+
+卵子の位置は constants['egg_positions'] で指定する（parse_egg_positions 参照）。
+未指定なら egg_localization から決まる 1 個（従来どおり）。
+"""
+
+from __future__ import annotations
+import ast
+import os
+from typing import Optional
+
+import numpy as np
+
+from .intersect import segment_meets_sphere
+
+_OFF = 1 << 19                  # セル番号のずらし（±2^19 セルまで）
+_S = 1 << 20
+_NEIGHBORS = np.array([(dx, dy, dz) for dx in (-1, 0, 1)
+                       for dy in (-1, 0, 1) for dz in (-1, 0, 1)], dtype=np.int64)
+_EMPTY = np.zeros(0, dtype=np.int64)
+_BRUTE_MAX = 8                  # これ以下の個数なら索引を引かずに全卵子を調べる
+
+
+def parse_egg_positions(value) -> Optional[np.ndarray]:
+    """
+    egg_positions の設定値を (M,3) にする。None / "" / "none" は未指定。
+    文字列は CSV ファイル（x,y,z の行）のパスか、"[(x, y, z), ...]" の Python リテラル。
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        v = value.strip()
+        if v == "" or v.lower() == "none":
+            return None
+        if os.path.isfile(v):
+            return np.loadtxt(v, delimiter=",", ndmin=2)
+        value = ast.literal_eval(v)
+    P = np.asarray(value, dtype=float).reshape(-1, 3)
+    return P
+
+
+def _keys(cells: np.ndarray) -> np.ndarray:
+    c = cells + _OFF
+    return (c[..., 0] * _S + c[..., 1]) * _S + c[..., 2]
+
+
+class EggIndex:
+    """卵子中心の一様グリッド。セルのキーでソートして searchsorted で引く"""
+
+    def __init__(self, centers, radius: float, reach: float):
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        self.radius = float(radius)
+        self.reach = float(reach)
+        self.cell = 2 * self.radius + self.reach
+        keys = _keys(np.floor(self.centers / self.cell).astype(np.int64))
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        self._table = {}                              # ループ版用: キー → 卵子番号
+        for k, e in zip(self.keys.tolist(), self.order.tolist()):
+            self._table.setdefault(k, []).append(e)
+
+    def __len__(self):
+        return len(self.centers)
+
+    # ---- 1 本 -------------------------------------------------------
+    def hits(self, p0, p1) -> np.ndarray:
+        """線分 p0→p1 が触れる卵子の番号（昇順）"""
+        m = len(self.centers)
+        if m == 0:
+            return _EMPTY
+        if m == 1:
+            if segment_meets_sphere(p0, p1, self.centers[0], self.radius):
+                return np.zeros(1, dtype=np.int64)
+            return _EMPTY
+        if m <= _BRUTE_MAX or np.linalg.norm(p1 - p0) > self.reach:
+            cand = np.arange(m)
+        else:
+            base = np.floor((p0 + p1) / (2 * self.cell)).astype(np.int64)
+            cand = [e for k in _keys(base + _NEIGHBORS).tolist()
+                    for e in self._table.get(k, ())]
+            if not cand:
+                return _EMPTY
+            cand = np.sort(np.asarray(cand, dtype=np.int64))
+        hit = segment_meets_sphere(np.broadcast_to(p0, (len(cand), 3)),
+                                   np.broadcast_to(p1, (len(cand), 3)),
+                                   self.centers[cand], self.radius)
+        return cand[hit]
+
+    # ---- N 本 -------------------------------------------------------
+    def query(self, P0, P1):
+        """N 本の線分について触れた (線分番号, 卵子番号) の組を線分・卵子の昇順で返す"""
+        P0, P1 = np.asarray(P0, dtype=float), np.asarray(P1, dtype=float)
+        m, n = len(self.centers), len(P0)
+        if m == 0 or n == 0:
+            return _EMPTY, _EMPTY
+        if m <= _BRUTE_MAX:
+            seg, egg = np.repeat(np.arange(n), m), np.tile(np.arange(m), n)
+        else:
+            long = np.sqrt(np.einsum('ij,ij->i', P1 - P0, P1 - P0)) > self.reach
+            mid = np.floor((P0 + P1) / (2 * self.cell)).astype(np.int64)
+            nk = _keys(mid[:, None, :] + _NEIGHBORS)            # (N,27)
+            lo = np.searchsorted(self.keys, nk, side="left")
+            hi = np.searchsorted(self.keys, nk, side="right")
+            cnt = (hi - lo).ravel()
+            seg = np.repeat(np.repeat(np.arange(n), 27), cnt)
+            start = np.repeat(lo.ravel(), cnt)
+            run = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            egg = self.order[start + run]
+            keep = ~long[seg]                                   # 長い線分は総当たりへ
+            seg, egg = seg[keep], egg[keep]
+            L = np.nonzero(long)[0]
+            if L.size:
+                seg = np.concatenate([seg, np.repeat(L, m)])
+                egg = np.concatenate([egg, np.tile(np.arange(m), L.size)])
+        hit = segment_meets_sphere(P0[seg], P1[seg], self.centers[egg], self.radius)
+        seg, egg = seg[hit], egg[hit]
+        o = np.lexsort((egg, seg))
+        return seg[o], egg[o]
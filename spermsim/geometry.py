@@ -1,120 +1,297 @@
-
-"""geometry.py  –  Step2 形状クラス薄ラッパー
-現状 main.py 内の形状依存関数 (IO_check_xxx) をクラス化するための土台。
-まずは既存関数をそのまま呼び出すだけに留め、挙動を変えません。
-本ファイルを spermsim/ フォルダに置き、main.py から:
-    from geometry import create_shape
-で Shape インスタンスを生成して利用してください。
+"""geometry.py  –  形状オブジェクト
+main.py の形状依存関数 (get_limits / IO_check_xxx / 初期位置生成) を
+run ごとに 1 回だけ組み立てる不変オブジェクトにまとめたもの。
+中心・半径²・limits・許容誤差は生成時に前計算し、ステップごとに
+constants 辞書を読み直したり get_limits() を呼んだりしない。
+
+    from spermsim.geometry import create_shape
+    shape = create_shape(constants["shape"], constants)
+    status, vertex = shape.io_check(temp_position, base_position)
+
+形状・limits・卵子索引・stick ステップ数は RunGeometry にまとめて run 開始時に
+1 回だけ作る（main.run_geometry）。ループ版・一括版・描画はそこから読む。
 """
 
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Any, Tuple, Protocol
+from typing import Dict, Any, Tuple, Protocol, Optional
+
+import numpy as np
+
+from io_status import IOStatus
+from core.geometry import sample_box, sample_ball, sample_cap
+from .spot import solve_spot
+
+Limits = Tuple[float, float, float, float, float, float]
+
+
+def _frozen(a) -> np.ndarray:
+    a = np.asarray(a, dtype=float)
+    a.setflags(write=False)
+    return a
 
 
 # ---------- インタフェース ---------- #
 class Shape(Protocol):
     name: str
 
-    def get_limits(self) -> Tuple[float, float, float, float, float, float]:
+    def get_limits(self) -> Limits:
         ...
 
-    def io_check(self, x: float, y: float, z: float) -> str:
+    def io_check(self, temp_position, base_position=None,
+                 stick_status: int = 0, prev_status=IOStatus.NONE
+                 ) -> Tuple[IOStatus, Optional[np.ndarray]]:
         ...
 
-    def initial_position(self) -> Tuple[float, float, float]:
+    def first_hit_normal(self, p0, p1) -> Optional[np.ndarray]:
         ...
 
+    def initial_position(self, n: Optional[int] = None, rng=None) -> np.ndarray:
+        ...
 
-# ---------- 共通親 ---------- #
-@dataclass
-class BaseShape:
-    constants: Dict[str, Any]
-
-    def get_limits(self):
-        raise NotImplementedError
-
-    def io_check(self, x, y, z):
-        raise NotImplementedError
-
-    def initial_position(self):
-        raise NotImplementedError
-
-
-# ---------- 各 Shape 薄ラッパー ---------- #
-class CubeShape(BaseShape):
-    name = "cube"
-
-    def get_limits(self):
-        from .main import get_limits_cube
-        return get_limits_cube(self.constants)
-
-    def io_check(self, x, y, z):
-        from .main import IO_check_cube
-        return IO_check_cube(x, y, z, self.constants)
-
-    def initial_position(self):
-        from .main import initial_position_cube
-        return initial_position_cube(self.constants)
-
-
-class DropShape(BaseShape):
-    name = "drop"
-
-    def get_limits(self):
-        from .main import get_limits_drop
-        return get_limits_drop(self.constants)
-
-    def io_check(self, x, y, z):
-        from .main import IO_check_drop
-        return IO_check_drop(x, y, z, self.constants)
-
-    def initial_position(self):
-        from .main import initial_position_drop
-        return initial_position_drop(self.constants)
-
-
-class SpotShape(BaseShape):
-    name = "spot"
-
-    def get_limits(self):
-        from .main import get_limits_spot
-        return get_limits_spot(self.constants)
-
-    def io_check(self, x, y, z):
-        from .main import IO_check_spot
-        return IO_check_spot(x, y, z, self.constants)
-
-    def initial_position(self):
-        from .main import initial_position_spot
-        return initial_position_spot(self.constants)
-
-
-class CerosShape(BaseShape):
-    name = "ceros"
 
-    def get_limits(self):
-        from .main import get_limits_ceros
-        return get_limits_ceros(self.constants)
+# ---------- Cube ---------- #
+def classify_cube(P, lo, hi, limit: float = 1e-10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cube.io_check の (N,3) 版。軸ごとの inside / surface / outside を
+    ブール配列で数え、行ごとの状態コード (int8, IOStatus の値) と
+    VERTEX_OUT 用の頂点座標 (N,3) を返す。頂点は VERTEX_OUT の行だけ意味を持つ。
+    """
+    P = np.asarray(P, dtype=float)
+    lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    out = (P < lo - limit) | (P > hi + limit)
+    surf = ~out & ((np.abs(P - lo) <= limit) | (np.abs(P - hi) <= limit))
+    n_out, n_sf = out.sum(1), surf.sum(1)
+    n_in = 3 - n_out - n_sf
+    codes = np.full(len(P), IOStatus.BORDER, dtype=np.int8)
+    codes[n_in == 3] = IOStatus.INSIDE
+    codes[(n_in == 2) & (n_sf == 1)] = IOStatus.TEMP_ON_SURFACE
+    codes[(n_in == 1) & (n_sf == 2)] = IOStatus.TEMP_ON_EDGE
+    codes[(n_out > 0) & (n_in + n_out == 3)] = IOStatus.SURFACE_OUT
+    vtx = (n_in == 0) & (n_sf == 2)
+    codes[vtx] = IOStatus.VERTEX_OUT
+    codes[(n_out > 0) & (n_sf == 1) & ~vtx] = IOStatus.EDGE_OUT
+    vertex = np.where(P < (lo + hi) / 2, lo, hi)
+    return codes, vertex
+
+
+@dataclass(frozen=True, slots=True)
+class Cube:
+    lo: np.ndarray          # (x_min, y_min, z_min)
+    hi: np.ndarray          # (x_max, y_max, z_max)
+    limit: float = 1e-10
+    name: str = "cube"
+
+    @classmethod
+    def from_constants(cls, c: Dict[str, Any]) -> "Cube":
+        return cls(_frozen([c['x_min'], c['y_min'], c['z_min']]),
+                   _frozen([c['x_max'], c['y_max'], c['z_max']]),
+                   c.get('limit', 1e-10))
+
+    def get_limits(self) -> Limits:
+        (x0, y0, z0), (x1, y1, z1) = self.lo, self.hi
+        return (x0, x1, y0, y1, z0, z1)
+
+    def io_check(self, temp_position, base_position=None,
+                 stick_status=0, prev_status=IOStatus.NONE):
+        """main.IO_check_cube と同一仕様。(IOStatus, vertex_point) を返す"""
+        lim = self.limit
+        n_sf = n_out = 0                           # 軸ごとに surface / outside を数える
+        for pos, lo, hi in zip(temp_position, self.lo, self.hi):
+            if pos < lo - lim or pos > hi + lim:
+                n_out += 1
+            elif abs(pos - lo) <= lim or abs(pos - hi) <= lim:
+                n_sf += 1
+        n_in = 3 - n_sf - n_out
+        if n_in == 3:
+            return IOStatus.INSIDE, None
+        if n_in == 2 and n_sf == 1:
+            return IOStatus.TEMP_ON_SURFACE, None
+        if n_in == 1 and n_sf == 2:
+            return IOStatus.TEMP_ON_EDGE, None
+        if n_out and n_in + n_out == 3:
+            return IOStatus.SURFACE_OUT, None
+        if n_in == 0 and n_sf == 2:
+            vertex = np.where(np.asarray(temp_position) < (self.lo + self.hi) / 2,
+                              self.lo, self.hi)
+            return IOStatus.VERTEX_OUT, vertex
+        if n_out and n_sf == 1:
+            return IOStatus.EDGE_OUT, None
+        if n_sf == 3:
+            return IOStatus.BORDER, None
+        raise ValueError("Unknown inside/surface/outside combination")
+
+    def classify(self, P):
+        """(N,3) の点をまとめて判定。(codes, vertex) を返す（classify_cube 参照）"""
+        return classify_cube(P, self.lo, self.hi, self.limit)
+
+    def first_hit_normal(self, p0, p1):
+        """p0→p1 が最初に横切る面の外向き法線。内側なら None"""
+        p0, p1 = np.asarray(p0, float), np.asarray(p1, float)
+        d = p1 - p0
+        best, n = np.inf, None
+        for ax in range(3):
+            if p1[ax] < self.lo[ax] - self.limit:
+                wall, sgn = self.lo[ax], -1.0
+            elif p1[ax] > self.hi[ax] + self.limit:
+                wall, sgn = self.hi[ax], 1.0
+            else:
+                continue
+            t = (wall - p0[ax]) / d[ax]
+            if t < best:
+                best, n = t, np.zeros(3)
+                n[ax] = sgn
+        return n
+
+    def initial_position(self, n=None, rng=None):
+        p = sample_box(1 if n is None else n, self.lo, self.hi, rng)
+        return p[0] if n is None else p
+
+
+@dataclass(frozen=True, slots=True)
+class Ceros(Cube):
+    name: str = "ceros"
+
+    @classmethod
+    def from_constants(cls, c: Dict[str, Any]) -> "Ceros":
+        return cls(_frozen([c['ceros_x_min'], c['ceros_y_min'], c['ceros_z_min']]),
+                   _frozen([c['ceros_x_max'], c['ceros_y_max'], c['ceros_z_max']]),
+                   c.get('limit', 1e-10))
+
+
+# ---------- Drop ---------- #
+@dataclass(frozen=True, slots=True)
+class Drop:
+    R: float
+    R2_in: float            # (R - limit)²
+    R2_out: float           # (R + limit)²
+    limit: float = 1e-10
+    name: str = "drop"
+
+    @classmethod
+    def from_constants(cls, c: Dict[str, Any]) -> "Drop":
+        R = c.get('drop_R')
+        if R is None:
+            R = (c['volume'] * 3 / (4 * np.pi)) ** (1 / 3)
+        lim = c.get('limit', 1e-10)
+        return cls(R, (R - lim) ** 2, (R + lim) ** 2, lim)
+
+    def get_limits(self) -> Limits:
+        R = self.R
+        return (-R, R, -R, R, -R, R)
+
+    def io_check(self, temp_position, base_position=None,
+                 stick_status=0, prev_status=IOStatus.NONE):
+        """main.IO_check_drop と同一仕様"""
+        x, y, z = temp_position
+        d2 = x*x + y*y + z*z
+        if d2 > self.R2_out:
+            return IOStatus.SPHERE_OUT, None
+        if d2 < self.R2_in:
+            return (IOStatus.TEMP_ON_POLYGON if stick_status > 0 else IOStatus.INSIDE), None
+        return IOStatus.BORDER, None
+
+    def first_hit_normal(self, p0, p1):
+        p1 = np.asarray(p1, float)
+        d2 = p1 @ p1
+        if d2 <= self.R2_out:
+            return None
+        return p1 / np.sqrt(d2)
+
+    def initial_position(self, n=None, rng=None):
+        p = sample_ball(1 if n is None else n, self.R, rng)
+        return p[0] if n is None else p
+
+
+# ---------- Spot ---------- #
+@dataclass(frozen=True, slots=True)
+class Spot:
+    R: float                # 球半径 (spot_R)
+    bottom_z: float         # 底面高さ (spot_bottom_height)
+    bottom_R: float         # 底面半径 (spot_bottom_R)
+    angle: float            # spot_angle [rad]
+    limit: float = 1e-10
+    name: str = "spot"
+
+    @classmethod
+    def from_constants(cls, c: Dict[str, Any]) -> "Spot":
+        if c.get('spot_R') is None:
+            c.update(solve_spot(c['volume'], c['spot_angle']).as_constants())
+        return cls(c['spot_R'], c['spot_bottom_height'], c['spot_bottom_R'],
+                   np.deg2rad(c['spot_angle']), c.get('limit', 1e-10))
+
+    def get_limits(self) -> Limits:
+        b = self.bottom_R
+        return (-b, b, -b, b, self.bottom_z, self.R)
+
+    def io_check(self, temp_position, base_position=None,
+                 stick_status=0, prev_status=IOStatus.NONE):
+        """main.IO_check_spot と同一仕様（底面との交差判定に base_position を使う）"""
+        lim, bz, bR = self.limit, self.bottom_z, self.bottom_R
+        x, y, z = temp_position
+        if z > bz + lim:
+            if np.sqrt(x*x + y*y + z*z) > self.R + lim:
+                return IOStatus.SPHERE_OUT, None
+            return IOStatus.INSIDE, None
+        if z < bz - lim:
+            t = (bz - base_position[2]) / (z - base_position[2])
+            if t < 0 or t > 1:
+                return IOStatus.SPHERE_OUT, None
+            ix = base_position[0] + t * (x - base_position[0])
+            iy = base_position[1] + t * (y - base_position[1])
+            if np.sqrt(ix*ix + iy*iy) < bR + lim:
+                return IOStatus.BOTTOM_OUT, None
+            return IOStatus.SPHERE_OUT, None
+        if not (bz - lim < z < bz + lim):
+            return IOStatus.INSIDE, None
+        r_xy = np.sqrt(x*x + y*y)
+        if r_xy > bR + lim:
+            return IOStatus.SPOT_EDGE_OUT, None
+        if abs(r_xy - bR) <= lim:
+            return IOStatus.BORDER, None
+        if r_xy < bR - lim:
+            if prev_status in (IOStatus.SPOT_EDGE_OUT, IOStatus.POLYGON_MODE):
+                return IOStatus.POLYGON_MODE, None
+            return IOStatus.SPOT_BOTTOM, None
+        return IOStatus.INSIDE, None
+
+    def first_hit_normal(self, p0, p1):
+        p1 = np.asarray(p1, float)
+        if p1[2] < self.bottom_z - self.limit:
+            return np.array([0.0, 0.0, -1.0])
+        r = np.sqrt(p1 @ p1)
+        if r > self.R + self.limit:
+            return p1 / r
+        return None
+
+    def initial_position(self, n=None, rng=None):
+        p = sample_cap(1 if n is None else n, self.R, self.bottom_z, rng)
+        return p[0] if n is None else p
+
+
+# ---------- Run ごとの不変量 ---------- #
+@dataclass(frozen=True, slots=True)
+class RunGeometry:
+    shape: Shape
+    limits: Limits          # shape.get_limits() の結果
+    eggs: Any               # eggs.EggIndex
+    step_length: float
+    stick_steps: int        # stick_sec × sampl_rate_Hz
+    limit: float = 1e-10
 
-    def io_check(self, x, y, z):
-        from .main import IO_check_ceros
-        return IO_check_ceros(x, y, z, self.constants)
 
-    def initial_position(self):
-        from .main import initial_position_ceros
-        return initial_position_ceros(self.constants)
+# ---------- Factory ---------- #
+SHAPES = {
+    "cube": Cube,
+    "drop": Drop,
+    "spot": Spot,
+    "ceros": Ceros,
+}
 
 
-# ---------- Factory ---------- #
 def create_shape(shape_name: str, constants: Dict[str, Any]) -> Shape:
-    shape_map = {
-        "cube": CubeShape,
-        "drop": DropShape,
-        "spot": SpotShape,
-        "ceros": CerosShape,
-    }
     try:
-        return shape_map[shape_name.lower()](constants)
+        cls = SHAPES[shape_name.lower()]
     except KeyError:
-        raise ValueError(f"Unknown shape '{shape_name}'. Available: {list(shape_map)}")
+        raise ValueError(f"Unknown shape '{shape_name}'. Available: {list(SHAPES)}")
+    return cls.from_constants(constants)
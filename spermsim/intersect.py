@@ -0,0 +1,125 @@
+"""intersect.py  –  線分と球・円の交差カーネル
+main.py のループ版と batch.py の一括版で共有する。入力は (3,) でも (N,3) でもよく、
+行ごとの結果を返す（(3,) ならスカラー）。
+
+    segment_meets_sphere : 卵との接触判定（端点が中 or 線分が球面を横切る）
+    ray_sphere_exit      : 原点中心の球面から出る点（cut_and_bend_sphere 用）
+    segment_circle       : xy 平面で原点中心の円と最初に交わる点（底面の縁）
+    align_to_z           : axis を z 軸に重ねる最小回転（scipy Rotation の代わり）
+    dot3 / norm3         : 行ごとの内積・長さ（両エンジンで丸めを揃える）
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def dot3(A, B):
+    """
+    行ごとの内積 (…,3)·(…,3)。x, y, z の順に掛けて足すだけなので、(3,) でも (N,3) でも
+    行ごとの丸めが同じになる（@ / einsum は FMA や足す順が BLAS・SIMD 次第で変わり、
+    ループ版と一括版の軌跡がビット単位でずれる）。
+    """
+    if A.ndim == 1 and B.ndim == 1:         # ループ版の 1 本は float で（同じ丸めで速い）
+        ax, ay, az = A.tolist()
+        bx, by, bz = B.tolist()
+        return ax*bx + ay*by + az*bz
+    return A[..., 0]*B[..., 0] + A[..., 1]*B[..., 1] + A[..., 2]*B[..., 2]
+
+
+def norm3(A):
+    """行ごとの長さ（dot3 と同じ丸め）。LA.norm の代わりに両エンジンで使う"""
+    return np.sqrt(dot3(A, A))
+
+
+def _cross(A, B):
+    """np.cross より軽い (…,3) × (…,3)"""
+    return np.stack([A[..., 1]*B[..., 2] - A[..., 2]*B[..., 1],
+                     A[..., 2]*B[..., 0] - A[..., 0]*B[..., 2],
+                     A[..., 0]*B[..., 1] - A[..., 1]*B[..., 0]], axis=-1)
+
+
+# ---------- 球 ---------- #
+def sphere_roots(p0, d, center, radius):
+    """
+    |p0 + t d - center| = radius の 2 根 (t1 <= t2) と「交わるか」(判別式 >= 0)。
+    d は正規化しなくてよい（t は d の長さを 1 とした媒介変数）。d = 0 の行は不可。
+    """
+    f = p0 - center
+    a = dot3(d, d)
+    b = 2 * dot3(f, d)
+    c = dot3(f, f) - radius*radius
+    disc = b*b - 4*a*c
+    sq = np.sqrt(np.maximum(disc, 0.0))
+    return (-b - sq) / (2*a), (-b + sq) / (2*a), disc >= 0
+
+
+def segment_meets_sphere(p0, p1, center, radius):
+    """p0→p1 が球 (center, radius) に触れるか。端点が球内か、根が [0,1] にあれば True"""
+    f1 = p1 - center
+    r2 = radius*radius
+    t1, t2, real = sphere_roots(p0, p1 - p0, center, radius)
+    inside = (dot3(p0 - center, p0 - center) <= r2) | (dot3(f1, f1) <= r2)
+    return inside | (real & (((0 <= t1) & (t1 <= 1)) | ((0 <= t2) & (t2 <= 1))))
+
+
+def ray_sphere_exit(p0, d_unit, radius, eps):
+    """
+    原点中心・半径 radius の球面と p0 + t d_unit (t > eps) の最初の交点。
+    桁落ちしない q = -(b + sign(b)√D)/2 の形で根を取る。
+    戻り値 (t, point, normal, disc)。交わらない行は t = inf、disc < eps の行は
+    接するだけとみなして呼び出し側で扱う（ループ版は元の点を返す）。
+    """
+    b = 2.0 * dot3(p0, d_unit)
+    c = dot3(p0, p0) - radius**2
+    disc = b*b - 4*c
+    with np.errstate(invalid='ignore', divide='ignore'):
+        q = -0.5 * (b + np.copysign(np.sqrt(disc), b))
+        t2 = np.where(np.abs(q) > eps, c / np.where(q == 0, 1.0, q), np.inf)
+    t1 = np.where(q > eps, q, np.inf)
+    t = np.minimum(t1, np.where(t2 > eps, t2, np.inf))
+    point = p0 + np.asarray(t)[..., None] * d_unit
+    return t, point, point / radius, disc
+
+
+# ---------- 円（xy 平面） ---------- #
+def segment_circle(p0, p1, radius, clamp=False):
+    """
+    xy 平面で p0→p1 が原点中心・半径 radius の円と最初に交わる t ∈ [0,1] と
+    交点 (x, y)。根が無い行は t = 0（p0 のまま）。clamp=True なら判別式を 0 で切る。
+    """
+    x0, y0 = p0[..., 0], p0[..., 1]
+    dx, dy = p1[..., 0] - x0, p1[..., 1] - y0
+    A = dx*dx + dy*dy
+    B = 2 * (x0*dx + y0*dy)
+    C = x0*x0 + y0*y0 - radius**2
+    disc = B*B - 4*A*C
+    if clamp:
+        disc = np.maximum(disc, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sq = np.sqrt(disc)
+        t1 = (-B + sq) / (2*A)
+        t2 = (-B - sq) / (2*A)
+    t1 = np.where((t1 >= 0) & (t1 <= 1), t1, np.inf)
+    t2 = np.where((t2 >= 0) & (t2 <= 1), t2, np.inf)
+    t = np.minimum(t1, t2)
+    t = np.where(np.isinf(t), 0.0, t)
+    return t, x0 + t*dx, y0 + t*dy
+
+
+# ---------- 回転 ---------- #
+def align_to_z(axis, V):
+    """
+    単位ベクトル axis を z 軸に重ねる最小回転（Rodrigues）を V に掛ける（R @ axis = e_z）。
+    scipy の Rotation.align_vectors([[0,0,1]], [axis])[0].apply(V) と同じ向き。
+    axis = -z のときは x 軸まわりの 180° 回転（符号反転だと鏡映になる）。
+    """
+    z = np.zeros_like(axis)
+    z[..., 2] = 1.0
+    k = _cross(axis, z)
+    s2 = dot3(k, k)
+    c = axis[..., 2]
+    f = np.where(s2 > 0, (1 - c) / np.where(s2 > 0, s2, 1), 0.0)
+    out = V * c[..., None] + _cross(k, V) + k * (dot3(k, V) * f)[..., None]
+    flip = (s2 == 0) & (c < 0)
+    return np.where(flip[..., None], V * np.array([1.0, -1.0, -1.0]), out)
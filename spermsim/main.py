@@ -5,34 +5,30 @@ import configparser
 # IO 状態を表す列挙型 ★ADDED
 # ------------------------------------------------------------
 from enum import Enum
-from io_status import IOStatus
+from io_status import IOStatus, ADVANCES, NEEDS_BEND, CARRY_FROM, CARRY_OVER
 
 from datetime import datetime
 import os
-import random
-import sqlite3
 import sys
 import time
-import tkinter as tk
 
 # -------------------------------
 # 外部ライブラリ
+# シミュレーション本体は NumPy だけで動く。tkinter / matplotlib / tqdm は
+# 使う関数の中で import し、--no-gui の sweep ワーカが起動時に読まないようにする。
 # -------------------------------
-import matplotlib
-
-matplotlib.use("Agg")  # GUI 非依存の描画専用モード
-
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import matplotlib.patches as patches
 import numpy as np
 import numpy.linalg as LA
-import pandas as pd
-from scipy.optimize import fsolve
-from scipy.spatial.transform import Rotation as R
-from tqdm import tqdm
 # (import 群のどこかで)
-from .geometry import create_shape      # 追加
+from .geometry import create_shape, classify_cube, RunGeometry      # 追加
+from .batch import BatchEngine
+from .cone import cone_vector
+from .intersect import ray_sphere_exit, segment_circle, align_to_z, dot3, norm3
+from .eggs import EggIndex, parse_egg_positions
+from .spot import solve_spot
+from .contacts import ContactLog, RunLog, start_events
+from core.rng import RunStreams
+from core.trajstore import open_store
 
 
 
@@ -43,9 +39,18 @@ except NameError:
 DATA_DIR  = os.path.join(_SCRIPT_DIR, "data")
 IMG_DIR   = os.path.join(DATA_DIR, "graphs")
 MOV_DIR   = os.path.join(DATA_DIR, "movies")
-os.makedirs(IMG_DIR, exist_ok=True)
-os.makedirs(MOV_DIR, exist_ok=True)
-DB_PATH_DEFAULT = os.path.join(DATA_DIR, "Trajectory.db")
+def _pyplot():
+    """描画するときだけ matplotlib を読む（Agg: GUI 非依存の描画専用モード）"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+def _progress(iterable=None, disable=False, **kwargs):
+    """tqdm の遅延版。disable なら tqdm を import せずそのまま返す"""
+    if disable:
+        return iterable
+    from tqdm import tqdm
+    return tqdm(iterable, **kwargs)
 def _safe_anim_save(anim, output_path):                  
     """
     ffmpeg が無くても PillowWriter で保存を試みる安全ラッパー
@@ -58,32 +63,12 @@ def _safe_anim_save(anim, output_path):
             anim.save(output_path, writer="pillow", fps=5)
         except Exception as e2:
             print(f"[ERROR] pillow writer でも保存に失敗しました: {e2}")
-os.chdir(_SCRIPT_DIR)                                    
-np.set_printoptions(threshold=np.inf)
-def spot_volume_eq(R, angle_rad, volume):
-    """
-    Spot形状の体積計算（球冠の公式に基づく）
-    """
-    h = R * (1 - np.cos(angle_rad))
-    return (np.pi * h**2 * (3*R - h)) / 3 - volume
 def compute_spot_parameters(constants):
     """
     spotの各種パラメータを計算し、constants辞書に格納する関数。
+    球冠の体積式は R について閉じた形で解ける（spermsim/spot.py、(volume, 角度) ごとにキャッシュ）。
     """
-    angle_rad = np.deg2rad(constants['spot_angle'])
-    spot_R_initial_guess = [(constants['volume'] * 3 / (4 * np.pi)) ** (1/3)]
-    spot_R_solution = fsolve(spot_volume_eq, spot_R_initial_guess, args=(angle_rad, constants['volume']))
-    spot_R_solution = spot_R_solution[0]    
-    spot_bottom_height = spot_R_solution * np.cos(angle_rad)
-    spot_bottom_R = spot_R_solution * np.sin(angle_rad)
-    constants.update({
-        'spot_R': spot_R_solution,
-        'radius': spot_R_solution,
-        'spot_bottom_height': spot_bottom_height,
-        'spot_bottom_R': spot_bottom_R,
-        'z_min': spot_bottom_height,
-        'z_max': spot_R_solution
-    })
+    constants.update(solve_spot(constants['volume'], constants['spot_angle']).as_constants())
 def get_program_version():
     """
     スクリプトファイル名をバージョン情報として返す。
@@ -116,6 +101,7 @@ def get_constants_from_gui(selected_data, shape, volume, sperm_conc):
     constants['limit'] = 1e-10
     egg_localization = selected_data.get('egg_localization', 'bottom_center').strip()
     constants['egg_localization'] = egg_localization
+    constants['egg_positions'] = selected_data.get('egg_positions')      # 複数卵子 (None なら 1 個)
     constants['initial_direction']    = selected_data.get('initial_direction', 'random').strip()
     constants['initial_stick_status'] = int(selected_data.get('initial_stick_status', 0))
     constants['seed_number']          = selected_data.get('seed_number', None)
@@ -123,9 +109,12 @@ def get_constants_from_gui(selected_data, shape, volume, sperm_conc):
     outputs = selected_data.get('outputs', [])
     constants['draw_trajectory'] = 'yes' if 'graph' in outputs else 'no'
     constants['make_movie']      = 'yes' if 'movie' in outputs else 'no'
-    if constants['seed_number'] and str(constants['seed_number']).lower() != IOStatus.NONE:
-        np.random.seed(int(constants['seed_number']))
     constants['reflection_analysis'] = 'yes' if selected_data.get('analysis_type', 'simulation') == 'reflection' else 'no'
+    constants['engine'] = selected_data.get('engine', 'loop')    # loop | batch
+    # 接触イベントだけを流す軽量モード（軌跡・描画なし）
+    constants['contact_only'] = 'yes' if selected_data.get('contact_only', 'no') == 'yes' else 'no'
+    if constants['contact_only'] == 'yes':
+        constants['draw_trajectory'] = constants['make_movie'] = 'no'
     return constants
 def placement_of_eggs(constants):
     """
@@ -198,6 +187,28 @@ def placement_of_eggs(constants):
         e_x_max, e_y_max, e_z_max,
         egg_center, egg_position_4d
     )
+def egg_centers(constants):
+    """
+    卵子中心 (M,3)。egg_positions が指定されていればそれを使い、
+    無ければ egg_localization で決まる 1 個。ceros は卵子なし。
+    """
+    positions = parse_egg_positions(constants.get('egg_positions'))
+    if positions is not None:
+        return positions
+    if constants['shape'].lower() == "ceros":
+        return np.zeros((0, 3))
+    return placement_of_eggs(constants)[9][None]
+def run_geometry(constants):
+    """
+    run ごとの幾何量を 1 回だけ求める。spot のパラメータは形状の生成時に
+    constants へ書き込まれるので、卵子の配置はその後で読む。
+    """
+    shape = create_shape(constants['shape'], constants)
+    eggs = EggIndex(egg_centers(constants), constants['gamete_R'], constants['step_length'])
+    return RunGeometry(shape, shape.get_limits(), eggs,
+                       float(constants['step_length']),
+                       int(constants['stick_sec'] * constants['sampl_rate_Hz']),
+                       constants.get('limit', 1e-10))
 def get_limits(constants):
     shape = constants['shape'].lower()
     if shape == "cube":
@@ -234,7 +245,7 @@ def get_limits(constants):
         )
     else:
         raise ValueError(f"Unknown shape: {shape}")
-def get_reflection_initial_positions(shape, volume, initial_direction, constants):
+def get_reflection_initial_positions(shape, volume, initial_direction, constants, rng=None):
     """
     Reflectionモードの際、初期位置と初期ベクトルをshapeとvolumeに応じて動的に決定する関数。
     initial_direction: 'right', 'left', 'up', 'down', 'random' など
@@ -260,14 +271,14 @@ def get_reflection_initial_positions(shape, volume, initial_direction, constants
         'down': np.array([0, -1, 0]),
         'forward': np.array([0, 0, 1]),
         'backward': np.array([0, 0, -1]),
-        'random': np.random.normal(size=3)
+        'random': (np.random if rng is None else rng).normal(size=3)
     }
     direction_vec = directions.get(initial_direction.lower(), directions['random'])
     direction_vec = normalize_vector(direction_vec)
     first_temp = base_position + direction_vec * constants['step_length']
     return base_position, first_temp
 def normalize_vector(v):
-    norm = LA.norm(v)
+    norm = norm3(v)
     if norm == 0:
         raise ValueError("Zero vector cannot be normalized.")
     return v / norm
@@ -277,11 +288,11 @@ def normalize_vector(v):
 # ------------------------------------------------------------
 def calc_remaining(old_remaining, base_position, hit_point):
     """境界衝突後の残り移動距離を一括計算する共通ルーチン。"""
-    return max(old_remaining - np.linalg.norm(hit_point - base_position), 0.0)
+    return max(old_remaining - norm3(hit_point - base_position), 0.0)
 
 def cut_and_bend_cube(self, IO_status, base_position, temp_position, remaining_distance, constants):
     out_flags = []
-    x_min, x_max, y_min, y_max, z_min, z_max = get_limits(constants)
+    x_min, x_max, y_min, y_max, z_min, z_max = self.geom.limits
     cutting_ratios = {}
     axes = ['x', 'y', 'z']
     min_vals = [x_min, y_min, z_min]
@@ -304,16 +315,16 @@ def cut_and_bend_cube(self, IO_status, base_position, temp_position, remaining_d
         vector_to_surface = vector_to_be_cut * cutting_ratio
         intersection_point = base_position + vector_to_surface
         last_vec = temp_position - intersection_point
-        if LA.norm(last_vec) < constants['limit']:
+        if norm3(last_vec) < constants['limit']:
             temp_position = base_position + 1.1 * (temp_position - base_position)
             vector_to_be_cut = temp_position - base_position
             vector_to_surface = vector_to_be_cut * cutting_ratio
             intersection_point = base_position + vector_to_surface
             last_vec = temp_position - intersection_point
-            if LA.norm(last_vec) < constants['limit']:
+            if norm3(last_vec) < constants['limit']:
                 sys.exit("last_vec too small even after scaling")
         last_vec[first_out_axis_index] = 0
-        nv = LA.norm(last_vec)
+        nv = norm3(last_vec)
         # dist_to_surface = LA.norm(vector_to_surface)  # ★COMMENTED OUT
         remaining_distance = calc_remaining(remaining_distance, base_position, intersection_point)  # ★ADDED
         # remaining_distance -= dist_to_surface  # ★COMMENTED OUT
@@ -328,8 +339,8 @@ def cut_and_bend_cube(self, IO_status, base_position, temp_position, remaining_d
     else:
         intersection_point = base_position                                
     return temp_position, intersection_point, remaining_distance
-def cut_and_bend_vertex(vertex_point, base_position, remaining_distance, constants):
-    dist_to_vertex = np.linalg.norm(vertex_point - base_position)
+def cut_and_bend_vertex(vertex_point, base_position, remaining_distance, constants, rng=None):
+    dist_to_vertex = norm3(vertex_point - base_position)
     move_on_new_edge = remaining_distance - dist_to_vertex
     if move_on_new_edge < 0:
         move_on_new_edge = 0
@@ -341,7 +352,7 @@ def cut_and_bend_vertex(vertex_point, base_position, remaining_distance, constan
         edge_vec[i] = direction
         candidate_edges.append(edge_vec)
     incoming_vec = vertex_point - base_position
-    dist_incoming = np.linalg.norm(incoming_vec)
+    dist_incoming = norm3(incoming_vec)
     if dist_incoming == 0:
         incoming_dir = np.zeros(3)
     else:
@@ -351,7 +362,8 @@ def cut_and_bend_vertex(vertex_point, base_position, remaining_distance, constan
         if not (np.allclose(edge, incoming_dir) or np.allclose(edge, -incoming_dir))
     ]
     if filtered_edges:
-        new_edge = random.choice(filtered_edges)
+        rng = np.random.default_rng() if rng is None else rng
+        new_edge = filtered_edges[rng.integers(len(filtered_edges))]
     new_temp_position = vertex_point + new_edge * move_on_new_edge
     intersection_point = vertex_point
     new_remaining_distance = constants['VSL'] / constants['sampl_rate_Hz']
@@ -368,10 +380,10 @@ def cut_and_bend_bottom(self, IO_status, base_position, temp_position, remaining
     intersection_point[2] = bottom_z
     vector_to_surface = intersection_point - base_position
     last_vec = temp_position - intersection_point
-    if LA.norm(last_vec) < constants['limit']:
+    if norm3(last_vec) < constants['limit']:
         sys.exit("last_vec too small")
     last_vec[2] = 0
-    nv = LA.norm(last_vec)
+    nv = norm3(last_vec)
     # remaining_distance -= LA.norm(vector_to_surface)  # ★COMMENTED OUT
     remaining_distance = calc_remaining(remaining_distance, base_position, intersection_point)  # ★ADDED
     if nv < constants['limit']:
@@ -379,7 +391,7 @@ def cut_and_bend_bottom(self, IO_status, base_position, temp_position, remaining
     else:
         last_vec_adjusted = last_vec / nv * remaining_distance
     threshold = constants['VSL'] / constants['sampl_rate_Hz'] * 1e-7
-    if LA.norm(last_vec_adjusted) < threshold:
+    if norm3(last_vec_adjusted) < threshold:
         raise ValueError("last_vec_adjusted is too small; simulation aborted.")
     temp_position = intersection_point + last_vec_adjusted
     return temp_position, intersection_point, remaining_distance
@@ -391,43 +403,29 @@ def cut_and_bend_spot_edge_out(self, IO_status, base_position, temp_position,
     """
     spot_bottom_R = constants['spot_bottom_R']
     inner_angle = constants['inner_angle']
-    x0, y0 = base_position[0], base_position[1]
-    x1, y1 = temp_position[0], temp_position[1]
     z = constants['spot_bottom_height']
-    dx = x1 - x0
-    dy = y1 - y0
-    A = dx**2 + dy**2
-    B = 2 * (x0 * dx + y0 * dy)
-    C = x0**2 + y0**2 - spot_bottom_R**2
-    discriminant = B**2 - 4*A*C
-    sqrt_discriminant = np.sqrt(discriminant)
-    t1 = (-B + sqrt_discriminant) / (2*A)
-    t2 = (-B - sqrt_discriminant) / (2*A)
-    t_candidates = [t for t in [t1, t2] if 0 <= t <= 1]
-    t_intersect = min(t_candidates) if t_candidates else 0
-    xi = x0 + t_intersect * dx
-    yi = y0 + t_intersect * dy
+    _, xi, yi = segment_circle(base_position, temp_position, spot_bottom_R)
     intersection_point = np.array([xi, yi, z])
     # distance_to_intersection = LA.norm(intersection_point - base_position)  # ★COMMENTED OUT
     remaining_distance = calc_remaining(remaining_distance, base_position, intersection_point)  # ★ADDED
     # remaining_distance -= distance_to_intersection  # ★COMMENTED OUT
     bi = intersection_point - base_position
-    bi_norm = LA.norm(bi)
+    bi_norm = norm3(bi)
     if bi_norm < 1e-12:
         bi_norm = 1e-8
     bi_normalized = bi / bi_norm
     oi = np.array([xi, yi, 0])
-    oi_norm = LA.norm(oi)
+    oi_norm = norm3(oi)
     if oi_norm < 1e-12:
         oi_norm = 1e-8
     oi_normalized = oi / oi_norm
     tangent_1 = np.array([-oi_normalized[1], oi_normalized[0], 0])
     tangent_2 = -tangent_1
     angle_with_tangent_1 = np.arccos(
-        np.clip(tangent_1[:2] @ bi_normalized[:2], -1.0, 1.0)
+        np.clip(tangent_1[0]*bi_normalized[0] + tangent_1[1]*bi_normalized[1], -1.0, 1.0)
     )
     angle_with_tangent_2 = np.arccos(
-        np.clip(tangent_2[:2] @ bi_normalized[:2], -1.0, 1.0)
+        np.clip(tangent_2[0]*bi_normalized[0] + tangent_2[1]*bi_normalized[1], -1.0, 1.0)
     )
     if angle_with_tangent_1 < angle_with_tangent_2:
         selected_tangent = tangent_1
@@ -445,7 +443,7 @@ def cut_and_bend_spot_edge_out(self, IO_status, base_position, temp_position,
         y_new = vec[0]*s + vec[1]*c
         return np.array([x_new, y_new, 0])
     last_vec = rotate_vector_2d(selected_tangent, angle_adjust)
-    last_vec /= (LA.norm(last_vec) + 1e-12)
+    last_vec /= (norm3(last_vec) + 1e-12)
     last_vec = last_vec * remaining_distance
     new_temp_position = intersection_point + last_vec
     new_temp_position[2] = z
@@ -453,26 +451,16 @@ def cut_and_bend_spot_edge_out(self, IO_status, base_position, temp_position,
     return new_temp_position, intersection_point, remaining_distance, is_bottom_edge
 def line_sphere_intersection(base_position, temp_position, radius, remaining_distance, constants):
     d = temp_position - base_position
-    d_norm = LA.norm(d)
+    d_norm = norm3(d)
     if d_norm < constants['limit']:
         sys.exit("too short")
     d_unit = d / d_norm
-    f = base_position
-    a = 1.0
-    b = 2.0 * (f @ d_unit)
-    c = (f @ f) - radius ** 2
-    discriminant = b**2 - 4*a*c
+    t, intersection_point, _, discriminant = ray_sphere_exit(
+        base_position, d_unit, radius, constants['limit'])
     if discriminant < constants['limit']:
         return base_position, remaining_distance
-    sqrt_discriminant = np.sqrt(discriminant)
-    q = -0.5 * (b + np.copysign(sqrt_discriminant, b))
-    t1 = q / a
-    t2 = c / q if abs(q) > constants['limit'] else np.inf
-    t_candidates = [t for t in [t1, t2] if t > constants['limit']]
-    if not t_candidates:
+    if np.isinf(t):
         sys.exit("No positive t found for intersection.")
-    t = min(t_candidates)
-    intersection_point = base_position + t * d_unit
     distance_traveled = t * d_norm
     updated_remaining_distance = remaining_distance - distance_traveled
     return intersection_point, updated_remaining_distance
@@ -480,7 +468,7 @@ def compute_normalized_vectors(base_position, intersection_point, constants):
     oi = intersection_point
     oi_normalized = normalize_vector(oi)
     bi = intersection_point - base_position
-    bi_norm = LA.norm(bi)
+    bi_norm = norm3(bi)
     if bi_norm < constants['limit']:
         print("oi", oi)
         print("LA.norm(bi)", LA.norm(bi))
@@ -488,7 +476,7 @@ def compute_normalized_vectors(base_position, intersection_point, constants):
     bi_normalized = bi / bi_norm
     return oi_normalized, bi_normalized
 def determine_rotation_direction(selected_tangent, normal_B, bi_normalized, modify_angle):
-    cross_product = (np.cross(selected_tangent, normal_B) @ bi_normalized)
+    cross_product = dot3(np.cross(selected_tangent, normal_B), bi_normalized)
     if cross_product < 0:
         modify_angle = -modify_angle
     return modify_angle
@@ -506,7 +494,7 @@ def compute_tangent_vectors(oi_normalized, bi_normalized):
 def calculate_angle_between_vectors(v1, v2):
     v1_u = normalize_vector(v1)
     v2_u = normalize_vector(v2)
-    dot_product = np.clip(v1_u @ v2_u, -1.0, 1.0)
+    dot_product = np.clip(dot3(v1_u, v2_u), -1.0, 1.0)
     return np.arccos(dot_product)
 def rotate_vector(vector, axis, angle):
     axis = normalize_vector(axis)
@@ -514,7 +502,7 @@ def rotate_vector(vector, axis, angle):
     sin_theta = np.sin(angle)
     return (vector * cos_theta +
             np.cross(axis, vector) * sin_theta +
-            (axis @ vector) * (1 - cos_theta))
+            dot3(axis, vector) * (1 - cos_theta))
 def cut_and_bend_sphere(base_position, remaining_distance, temp_position, constants):
     radius = constants['radius']
     modify_angle = constants['inner_angle']
@@ -532,14 +520,14 @@ def cut_and_bend_sphere(base_position, remaining_distance, temp_position, consta
     last_vec_normalized = normalize_vector(last_vec)
     last_vec = last_vec_normalized * remaining_distance
     new_temp_position = intersection_point + last_vec
-    lv_dot = np.dot(last_vec, last_vec)
+    lv_dot = dot3(last_vec, last_vec)
     if abs(lv_dot) < constants['limit']:
         inward_dir = np.array([0.0, 0.0, 0.0])
     else:
-        t = - np.dot(intersection_point, last_vec) / lv_dot
+        t = - dot3(intersection_point, last_vec) / lv_dot
         F = intersection_point + t * last_vec
         inward_dir = -F
-        norm_id = LA.norm(inward_dir)
+        norm_id = norm3(inward_dir)
         if norm_id < constants['limit']:
             inward_dir = np.array([0.0,0.0,0.0])
         else:
@@ -574,19 +562,20 @@ def _calculate_inward_dir_from_axes_hit(x, y, z, x_min, x_max, y_min, y_max, z_m
     else:
         free_axes.append('z')
     return pinned_coords, free_axes, hit_count
-def face_and_inward_dir(temp_position, base_position, last_vec, IO_status, stick_status, constants):
+def face_and_inward_dir(temp_position, base_position, last_vec, IO_status, stick_status, constants,
+                        limits=None):
     if IO_status == IOStatus.INSIDE or IO_status ==IOStatus.TEMP_ON_POLYGON:
-        denom = np.dot(last_vec, last_vec)
+        denom = dot3(last_vec, last_vec)
         if abs(denom) < constants['limit']:
             sys.exit("last_vec is zero or near-zero in face_and_inward_dir")
-        t = - np.dot(base_position, last_vec) / denom
+        t = - dot3(base_position, last_vec) / denom
         F = base_position + t * last_vec
-        if np.linalg.norm(F) <= constants['limit']:
+        if norm3(F) <= constants['limit']:
             sys.exit("原点を通るのでredo")
-        inward_dir = -F / np.linalg.norm(F)
+        inward_dir = -F / norm3(F)
         return inward_dir
-    elif IO_status in [IOStatus.TEMP_ON_EDGE, IOStatus.TEMP_ON_SURFACE]:
-        x_min, x_max, y_min, y_max, z_min, z_max = get_limits(constants)
+    elif IO_status in (IOStatus.TEMP_ON_EDGE, IOStatus.TEMP_ON_SURFACE):
+        x_min, x_max, y_min, y_max, z_min, z_max = limits if limits is not None else get_limits(constants)
         x, y, z = temp_position
         pinned_coords, free_axes, hit_count = _calculate_inward_dir_from_axes_hit(
             x, y, z, x_min, x_max, y_min, y_max, z_min, z_max, constants
@@ -630,7 +619,7 @@ def face_and_inward_dir(temp_position, base_position, last_vec, IO_status, stick
                     mid_z = (z_min + z_max) / 2
             midpoint_of_edge = np.array([mid_x, mid_y, mid_z], dtype=float)
             direction_vec = -midpoint_of_edge
-            norm_dv = np.linalg.norm(direction_vec)
+            norm_dv = norm3(direction_vec)
             if norm_dv < constants['limit']:
                 sys.exit("no way3")
             inward_dir = direction_vec / norm_dv
@@ -641,183 +630,34 @@ def face_and_inward_dir(temp_position, base_position, last_vec, IO_status, stick
         return None
     else:
         return None
-def sample_random_angles(sigma, constants, cone_type="full"):
-    max_theta = np.pi
-    if cone_type == "quarter":
-        min_theta = constants['limit']
-        max_theta = np.pi - constants['limit']
-        min_phi = -np.pi/4 + constants['limit']
-        max_phi = np.pi/4 - constants['limit']
-    elif cone_type == "half":
-        min_theta = constants['limit']
-        max_theta = np.pi - constants['limit']
-        min_phi = -np.pi/2 + constants['limit']
-        max_phi = np.pi/2 - constants['limit']
-    else:
-        min_theta = constants['limit']
-        max_theta = np.pi - constants['limit']
-        min_phi = -np.pi
-        max_phi = np.pi
-    while True:
-        theta = abs(np.random.normal(0, sigma))
-        if min_theta < theta < max_theta:
-            break
-    phi = np.random.uniform(min_phi, max_phi)
-    return theta, phi
-def make_local_xy(v, inward_dir=None):
-    v_norm = LA.norm(v)
-    if v_norm < 1e-12:
-        v = np.array([0, 0, 1], dtype=float)
-    else:
-        v = v / v_norm
-    if inward_dir is None:
-        arbitrary = np.array([1, 0, 0], dtype=float)
-        if abs(v[0]) > 0.9:
-            arbitrary = np.array([0, 1, 0], dtype=float)
-        local_x = np.cross(v, arbitrary)
-        lx = LA.norm(local_x)
-        if lx < 1e-12:
-            local_x = np.array([1, 0, 0], dtype=float)
-        else:
-            local_x /= lx
-    else:
-        inward_norm = np.linalg.norm(inward_dir)
-        if inward_norm < 1e-12:
-            local_x = np.array([1, 0, 0], dtype=float)
-        else:
-            local_x = inward_dir / inward_norm
-        if np.allclose(np.abs(np.dot(local_x, v)), 1.0, atol=1e-12):
-            raise ValueError("inward_dir は v と平行でないベクトルを指定してください。")
-    local_y = np.cross(v, local_x)
-    local_y /= LA.norm(local_y)
-    return local_x, local_y
-def generate_cone_vector(v, local_x, local_y, inward_dir, constants, sigma, remaining_distance,
-                         cone_type='full', do_projection=False):
-    theta, phi = sample_random_angles(sigma, constants, cone_type="full")
-    x_local = np.sin(theta)*np.cos(phi)
-    y_local = np.sin(theta)*np.sin(phi)
-    z_local = np.cos(theta)
-    temp_dir = x_local*local_x + y_local*local_y + z_local*v
-    if do_projection:
-        n = inward_dir
-        n_norm = LA.norm(n)
-        if n_norm > 1e-12:
-            n_unit = n / n_norm
-            dot_val = np.dot(temp_dir, n_unit)
-            temp_dir = temp_dir - dot_val*n_unit
-    nd = LA.norm(temp_dir)
-    if nd < 1e-12:
-        return np.zeros(3)
-    temp_dir *= (remaining_distance / nd)
-    return temp_dir
 def prepare_new_vector(last_vec, constants,
                        boundary_type="free",
                        stick_status=0,
-                       inward_dir=None):
-    v_norm = LA.norm(last_vec)
+                       inward_dir=None,
+                       rng=None):
+    """
+    last_vec まわりの円錐から次の 1 歩を引く（本体は cone.cone_vector）。
+    edge で stick 中は直進、surface / polygon で stick 中は inward 成分を落とす。
+    """
+    v_norm = norm3(last_vec)
     if v_norm < constants['limit']:
         raise ValueError("prepare_new_vector: last_vec が短すぎます。")
     v = last_vec / v_norm
-    if boundary_type == "edge":
-        cone_type = "quarter"
-        do_proj = False
-        if stick_status > 0:
-            return v * constants['step_length']
-    elif boundary_type == "surface":
-        cone_type = "half"
-        do_proj = (stick_status > 0)
-    elif boundary_type == "polygon":
-        cone_type = "half"
-        do_proj = (stick_status > 0)
-    else:
-        cone_type = "full"
-        do_proj = False
-    local_x, local_y = make_local_xy(v, inward_dir)
-    new_vec = generate_cone_vector(
-        v, local_x, local_y, inward_dir,constants,
-        sigma=constants['deviation'],
-        remaining_distance=constants['step_length'],
-        cone_type=cone_type,
-        do_projection=do_proj
-    )
-    return new_vec
+    if boundary_type == "edge" and stick_status > 0:
+        return v * constants['step_length']
+    do_proj = boundary_type in ("surface", "polygon") and stick_status > 0
+    rng = np.random if rng is None else rng
+    return cone_vector(v, rng.random(2), constants, inward_dir, do_proj)
 def IO_check_cube(temp_position, constants):
+    """1 点版。判定本体は geometry.classify_cube（(N,3) 一括版）"""
     x_min, x_max, y_min, y_max, z_min, z_max = get_limits(constants)
-    def classify_dimension(pos, min_val, max_val, constants):
-        if pos < min_val - constants['limit']:
-            return IOStatus.OUTSIDE
-        elif pos > max_val + constants['limit']:
-            return IOStatus.OUTSIDE
-        elif abs(pos - min_val) <= constants['limit'] or abs(pos - max_val) <= constants['limit']:
-            return IOStatus.SURFACE
-        else:
-            return IOStatus.INSIDE
-    x_class = classify_dimension(temp_position[0], x_min, x_max, constants)
-    y_class = classify_dimension(temp_position[1], y_min, y_max, constants)
-    z_class = classify_dimension(temp_position[2], z_min, z_max, constants)
-    classifications = [x_class, y_class, z_class]
-    inside_count  = classifications.count(IOStatus.INSIDE)
-    surface_count = classifications.count(IOStatus.SURFACE)
-    outside_count = classifications.count(IOStatus.OUTSIDE)
-
-    if inside_count == 3:
-        return IOStatus.INSIDE, None
-    elif inside_count == 2 and surface_count == 1:
-        return IOStatus.TEMP_ON_SURFACE, None
-    elif inside_count == 1 and surface_count == 2:
-        return IOStatus.TEMP_ON_EDGE, None
-    elif inside_count == 2 and outside_count == 1:
-        return IOStatus.SURFACE_OUT, None
-    elif inside_count == 1 and outside_count == 2:
-        return IOStatus.SURFACE_OUT, None
-    elif inside_count == 0 and surface_count == 2 and outside_count == 1:
-        vx, vy, vz = None, None, None
-        x, y, z = temp_position
-        if x_class == IOStatus.SURFACE:
-            if abs(x - x_min) <= constants['limit']:
-                vx = x_min
-            else:
-                vx = x_max
-        elif x_class == IOStatus.OUTSIDE:
-            if x < x_min - constants['limit']:
-                vx = x_min
-            else:
-                vx = x_max
-        if y_class == IOStatus.SURFACE:
-            if abs(y - y_min) <= constants['limit']:
-                vy = y_min
-            else:
-                vy = y_max
-        elif y_class == IOStatus.OUTSIDE:
-            if y < y_min - constants['limit']:
-                vy = y_min
-            else:
-                vy = y_max
-        if z_class == IOStatus.SURFACE:
-            if abs(z - z_min) <= constants['limit']:
-                vz = z_min
-            else:
-                vz = z_max
-        elif z_class == IOStatus.OUTSIDE:
-            if z < z_min - constants['limit']:
-                vz = z_min
-            else:
-                vz = z_max
-        vertex_coords = np.array([vx, vy, vz], dtype=float)
-        return IOStatus.VERTEX_OUT, vertex_coords
-    elif (
-        (inside_count == 1 and surface_count == 1 and outside_count == 1) or
-        (inside_count == 0 and surface_count == 1 and outside_count == 2)
-    ):
-        return IOStatus.EDGE_OUT, None
-    elif inside_count == 0 and surface_count == 0 and outside_count == 3:
-        return IOStatus.SURFACE_OUT, None
-    elif inside_count == 0 and surface_count == 3 and outside_count == 0:
-        return IOStatus.BORDER, None
-    else:
-        raise ValueError("Unknown inside/surface/outside combination")
+    codes, vertex = classify_cube(np.reshape(temp_position, (1, 3)),
+                                  (x_min, y_min, z_min), (x_max, y_max, z_max),
+                                  constants['limit'])
+    IO_status = IOStatus(codes[0])
+    return IO_status, (vertex[0] if IO_status == IOStatus.VERTEX_OUT else None)
 def IO_check_drop(temp_position, stick_status, constants):
-    distance_from_center = LA.norm(temp_position)
+    distance_from_center = norm3(temp_position)
     radius = constants['drop_R']
     if distance_from_center > radius + constants['limit']:
         IO_status = IOStatus.SPHERE_OUT
@@ -838,7 +678,7 @@ def IO_check_spot(base_position, temp_position, constants, IO_status):
     bottom_z = constants['spot_bottom_height']
     bottom_R = constants['spot_bottom_R']
     z_tip = temp_position[2]
-    r_tip = LA.norm(temp_position)                    
+    r_tip = norm3(temp_position)                    
     xy_dist = np.sqrt(temp_position[0]**2 + temp_position[1]**2)
     if z_tip > bottom_z + constants['limit']:
         if r_tip > radius + constants['limit']:
@@ -868,8 +708,20 @@ def IO_check_spot(base_position, temp_position, constants, IO_status):
             else:
                 return IOStatus.SPOT_BOTTOM
     return IOStatus.INSIDE
+class _StepRing:
+    """
+    traj[i] / traj[i - 1] しか読まない single_sperm_simulation 用の 2 行リング。
+    contact_only では軌跡全体の代わりにこれを使う（精子あたり O(1) メモリ）。
+    接触も RunLog が連続接触にまとめて持つので、ステップ数には比例しない。
+    """
+    def __init__(self):
+        self.buf = np.zeros((2, 3))
+    def __getitem__(self, i):
+        return self.buf[i & 1]
+    def __setitem__(self, i, value):
+        self.buf[i & 1] = value
 class SpermSimulation:
-    def __init__(self, constants, visualizer, simulation_data):
+    def __init__(self, constants, visualizer, simulation_data, run_index=0, on_contact=None):
         self.constants = constants
         self.visualizer = visualizer
         self.simulation = simulation_data
@@ -880,61 +732,95 @@ class SpermSimulation:
             self.initial_stick_status = constants['initial_stick_status']
         else:
             self.initial_stick_status = 0
-        self.vec_colors = np.empty((self.number_of_sperm, self.n_simulation), dtype=object)
-        self.vec_thickness_2d = np.zeros((self.number_of_sperm, self.n_simulation), dtype=float)
-        self.vec_thickness_3d = np.zeros((self.number_of_sperm, self.n_simulation), dtype=float)
-        self.trajectory = np.zeros((self.number_of_sperm, self.n_simulation, 3))
-        self.prev_IO_status = [None] * self.number_of_sperm
-        self.intersection_records = []
-        self.initialize_colors()
-        self.initialize_thickness()
+        # contact_only: 位置・直前ベクトル・stick 状態だけで進める（軌跡を持たない）。
+        # on_contact があれば接触開始ごとに on_contact(sperm_index, start_step, egg) を呼ぶ
+        # （merge_contact_events と同じ粒度）
+        self.contact_only = constants.get('contact_only', 'no') == 'yes'
+        self.on_contact = on_contact
+        # 接触ステップ (精子, ステップ, 卵子) int32。contact_only は連続接触だけ持つ RunLog
+        self.contacts = RunLog() if self.contact_only else ContactLog()
+        self._last_hit_step = {}                    # (精子, 卵子) → 直前に接触したステップ
+        # 軌跡の保存先: memory（既定）/ memmap（float32 の .npy）/ none（接触のみ）
+        store = 'none' if self.contact_only else constants.get('trajectory_store', 'memory')
+        if store not in ('memory', 'memmap', 'none'):
+            raise ValueError(f"trajectory_store '{store}' is not supported here")
+        self.store = open_store(store, self.number_of_sperm, self.n_simulation,
+                                constants.get('trajectory_path'))
+        self.trajectory = self.store.array
+        # 卵と交差したベクトルだけを bool で持ち、色・太さは描画時に作る
+        self.vec_hit = (None if self.trajectory is None else
+                        np.zeros((self.number_of_sperm, self.n_simulation), dtype=bool))
+        self._color_override = {}
+        self._vec_style = None
+        self.prev_IO_status = [IOStatus.NONE] * self.number_of_sperm
+        self.geom = run_geometry(constants)                        # run 中は不変
+        self.shape = self.geom.shape
+        self.eggs = self.geom.eggs
+        # 精子ごとに独立な乱数ストリーム（seed_number を root に run_index で分岐）
+        self.rng = RunStreams(constants.get('seed_number'), self.number_of_sperm, run_index)
+        constants['seed_number'] = self.rng.seed
+        self.start_positions = np.zeros((self.number_of_sperm, 2, 3))   # (base, temp)
         for j in range(self.number_of_sperm):
-            base_position, temp_position = self.initial_vec(j, constants)
-            self.trajectory[j, 0] = base_position
-            if self.n_simulation > 1:
-                self.trajectory[j, 1] = temp_position
+            self.start_positions[j] = self.initial_vec(j, constants)
         print("初期化時のconstants:", constants)
     def merge_contact_events(self):
         """
-        接触イベント（(精子番号, ステップ番号)）をまとめて連続接触を1つに圧縮。
+        接触ステップを (精子, 卵子) ごとの連続接触にまとめ、(M,5) int32 の
+        (精子, 開始ステップ, 終了ステップ, 継続ステップ数, 卵子) を
+        (精子, 開始, 卵子) の昇順で返す（contacts.merge_runs と同じ）。
         """
-        from collections import defaultdict
-        events_by_sperm = defaultdict(list)
-        for sperm_index, step in sorted(self.intersection_records, key=lambda x: (x[0], x[1])):
-            events_by_sperm[sperm_index].append(step)
-        merged_events = []
-        for sperm_index, steps in events_by_sperm.items():
-            if not steps:
-                continue
-            start_step = steps[0]
-            end_step = steps[0]
-            for step in steps[1:]:
-                if step == end_step + 1:
-                    end_step = step
-                else:
-                    merged_events.append((sperm_index, start_step))
-                    start_step = step
-                    end_step = step
-            merged_events.append((sperm_index, start_step))
-        return merged_events
-    def initialize_colors(self):
-        base_colors = [
-            "#000000","#1f77b4","#ff7f0e","#2ca02c","#9467bd","#8c564b",
-            "#e377c2","#7f7f7f","#bcbd22","#17becf","#aec7e8","#ffbb78",
-            "#98df8a","#c5b0d5","#c49c94","#f7b6d2","#c7c7c7","#dbdb8d",
-            "#9edae5","#2f4f4f",
-        ]
-        for j in range(self.number_of_sperm):
-            c = base_colors[j % len(base_colors)]
-            for i in range(self.n_simulation):
-                self.vec_colors[j, i] = c
-    def initialize_thickness(self):
-        for j in range(self.number_of_sperm):
-            for i in range(self.n_simulation):
-                self.vec_thickness_2d[j, i] = 0.4
-                self.vec_thickness_3d[j, i] = 1.5
+        return self.contacts.runs()
+    BASE_COLORS = [
+        "#000000","#1f77b4","#ff7f0e","#2ca02c","#9467bd","#8c564b",
+        "#e377c2","#7f7f7f","#bcbd22","#17becf","#aec7e8","#ffbb78",
+        "#98df8a","#c5b0d5","#c49c94","#f7b6d2","#c7c7c7","#dbdb8d",
+        "#9edae5","#2f4f4f",
+    ]
+    def _build_vec_style(self):
+        """vec_hit から (colors, thickness_2d, thickness_3d) を作ってキャッシュ"""
+        if self._vec_style is None:
+            n, m = self.number_of_sperm, self.n_simulation
+            hit = self.vec_hit if self.vec_hit is not None else np.zeros((n, m), dtype=bool)
+            base = np.array([self.BASE_COLORS[j % len(self.BASE_COLORS)] for j in range(n)],
+                            dtype=object)
+            colors = np.where(hit, "red", np.repeat(base[:, None], m, axis=1)).astype(object)
+            for (j, i), c in self._color_override.items():
+                colors[j, i] = c
+            self._vec_style = (colors,
+                               np.where(hit, 2.0, 0.4),
+                               np.where(hit, 4.0, 1.5))
+        return self._vec_style
+    @property
+    def vec_colors(self):
+        return self._build_vec_style()[0]
+    @property
+    def vec_thickness_2d(self):
+        return self._build_vec_style()[1]
+    @property
+    def vec_thickness_3d(self):
+        return self._build_vec_style()[2]
     def set_vector_color(self, j, i, color):
-        self.vec_colors[j, i] = color
+        self._color_override[(j, i)] = color
+        self._vec_style = None
+    def record_contact(self, j, i, egg=0):
+        """精子 j のステップ i - 1 → i が卵子 egg と交差した"""
+        self.contacts.append(j, i, egg)
+        if self.vec_hit is not None:
+            self.vec_hit[j, i - 1] = True
+        if self.on_contact is not None:
+            self._notify(j, i, egg)
+    def record_contacts(self, rows, steps, eggs):
+        """record_contact の一括版（batch エンジン用）。rows / steps / eggs は同じ長さの配列"""
+        self.contacts.extend(rows, steps, eggs)
+        if self.vec_hit is not None:
+            self.vec_hit[rows, steps - 1] = True
+        if self.on_contact is not None:
+            for j, i, egg in zip(rows.tolist(), steps.tolist(), eggs.tolist()):
+                self._notify(j, i, egg)
+    def _notify(self, j, i, egg):
+        if self._last_hit_step.get((j, egg)) != i - 1:      # (精子, 卵子) ごとの連続接触の開始
+            self.on_contact(j, i, egg)
+        self._last_hit_step[(j, egg)] = i
     def initial_vec(self, j, constants):
         shape = self.constants['shape']
         analysis_type = self.constants.get('analysis_type', 'single_simulation')
@@ -964,7 +850,7 @@ class SpermSimulation:
             local_stick = self.constants['initial_stick_status']
             if IO_status in [IOStatus.TEMP_ON_SURFACE, IOStatus.TEMP_ON_EDGE]:
                 last_vec = temp_position - base_position
-                if np.linalg.norm(last_vec) < self.constants['limit']:
+                if norm3(last_vec) < self.constants['limit']:
                     last_vec = np.array([constants['step_length'], 0.0, 0.0])
                 inward_dir = face_and_inward_dir(
                     temp_position,
@@ -972,7 +858,8 @@ class SpermSimulation:
                     last_vec,
                     IO_status,
                     local_stick,
-                    constants=self.constants
+                    constants=self.constants,
+                    limits=self.geom.limits
                 )
                 if inward_dir is None:
                     inward_dir = np.array([0.0, 0.0, 1.0])
@@ -980,77 +867,25 @@ class SpermSimulation:
                     last_vec, self.constants,
                     boundary_type=("edge" if IO_status == IOStatus.TEMP_ON_EDGE else "surface"),
                     stick_status=local_stick,
-                    inward_dir=inward_dir
+                    inward_dir=inward_dir,
+                    rng=self.rng.sperm[j]
                 )
                 temp_position = base_position + new_vec
         elif (reflection_mode == "no") and (analysis_type == "single_simulation"):
-            if shape in ["cube", "ceros"]:
-                x_min, x_max, y_min, y_max, z_min, z_max = get_limits(self.constants)
-                x_base = np.random.uniform(x_min, x_max)
-                y_base = np.random.uniform(y_min, y_max)
-                z_base = np.random.uniform(z_min, z_max)
-                base_position = np.array([x_base, y_base, z_base])
-            elif shape == "drop":
-                theta_base = np.arccos(2 * np.random.random() - 1)
-                phi_base = np.random.uniform(-np.pi, np.pi)
-                s_base = (self.constants['drop_R'] * (np.random.random() ** (1/3)))
-                x_base = s_base * np.sin(theta_base) * np.cos(phi_base)
-                y_base = s_base * np.sin(theta_base) * np.sin(phi_base)
-                z_base = s_base * np.cos(theta_base)
-                base_position = np.array([x_base, y_base, z_base])
-            elif shape == "spot":
-                radius = self.constants['radius']
-                spot_angle_rad = np.deg2rad(self.constants['spot_angle'])
-                while True:
-                    theta_base = np.random.uniform(0, spot_angle_rad)
-                    phi_base = np.random.uniform(-np.pi, np.pi)
-                    r_base = radius * (np.random.random() ** (1/3))
-                    x_base = r_base * np.sin(theta_base) * np.cos(phi_base)
-                    y_base = r_base * np.sin(theta_base) * np.sin(phi_base)
-                    z_base = r_base * np.cos(theta_base)
-                    if z_base >= (radius * np.cos(spot_angle_rad)):
-                        break
-                base_position = np.array([x_base, y_base, z_base])
-            else:
-                base_position = np.array([0, 0, 0])
-            initial_vector = self.get_random_direction_3D() * constants['step_length']
+            # cube / ceros / drop / spot とも棄却なしの一様サンプラ
+            base_position = self.shape.initial_position(rng=self.rng.sperm[j])
+            initial_vector = self.get_random_direction_3D(self.rng.sperm[j]) * constants['step_length']
             temp_position = base_position + initial_vector
         else:
-            if shape in ["cube", "ceros"]:
-                x_min, x_max, y_min, y_max, z_min, z_max = get_limits(self.constants)
-                x_base = np.random.uniform(x_min, x_max)
-                y_base = np.random.uniform(y_min, y_max)
-                z_base = np.random.uniform(z_min, z_max)
-                base_position = np.array([x_base, y_base, z_base])
-            elif shape == "drop":
-                theta_base = np.arccos(2 * np.random.random() - 1)
-                phi_base = np.random.uniform(-np.pi, np.pi)
-                s_base = (self.constants['drop_R'] * (np.random.random() ** (1/3)))
-                x_base = s_base * np.sin(theta_base) * np.cos(phi_base)
-                y_base = s_base * np.sin(theta_base) * np.sin(phi_base)
-                z_base = s_base * np.cos(theta_base)
-                base_position = np.array([x_base, y_base, z_base])
-            elif shape == "spot":
-                radius = self.constants['radius']
-                spot_angle_rad = np.deg2rad(self.constants['spot_angle'])
-                while True:
-                    theta_base = np.random.uniform(0, spot_angle_rad)
-                    phi_base = np.random.uniform(-np.pi, np.pi)
-                    r_base = radius * (np.random.random() ** (1/3))
-                    x_base = r_base * np.sin(theta_base) * np.cos(phi_base)
-                    y_base = r_base * np.sin(theta_base) * np.sin(phi_base)
-                    z_base = r_base * np.cos(theta_base)
-                    if z_base >= (radius * np.cos(spot_angle_rad)):
-                        break
-                base_position = np.array([x_base, y_base, z_base])
-            else:
-                base_position = np.array([0, 0, 0])
-            initial_vector = self.get_random_direction_3D() * constants['step_length']
+            # cube / ceros / drop / spot とも棄却なしの一様サンプラ
+            base_position = self.shape.initial_position(rng=self.rng.sperm[j])
+            initial_vector = self.get_random_direction_3D(self.rng.sperm[j]) * constants['step_length']
             temp_position = base_position + initial_vector
         return base_position, temp_position
-    def get_random_direction_3D(self):
-        phi = np.random.uniform(0, 2*np.pi)
-        costheta = np.random.uniform(-1, 1)
+    def get_random_direction_3D(self, rng=None):
+        rng = np.random if rng is None else rng
+        phi = rng.uniform(0, 2*np.pi)
+        costheta = rng.uniform(-1, 1)
         theta = np.arccos(costheta)
         return np.array([
             np.sin(theta) * np.cos(phi),
@@ -1058,132 +893,103 @@ class SpermSimulation:
             np.cos(theta)
         ])
     def simulate(self):
+        if self.constants.get('engine', 'loop') == 'batch':
+            # 全精子を状態コード配列で一括に進める（spermsim/batch.py）
+            BatchEngine(self).run()
+            self.store.close()
+            return
         step_desc = "シミュレーション中の精子数進捗"
-        for j in tqdm(range(self.number_of_sperm), desc=step_desc, ncols=100):
-            base_position = self.trajectory[j, 0]
-            temp_position = self.trajectory[j, 1]
+        quiet = self.constants.get('run_progress', 'yes') == 'no'
+        for j in _progress(range(self.number_of_sperm), desc=step_desc, ncols=100, disable=quiet):
+            base_position, temp_position = self.start_positions[j]
             remaining_distance = self.constants['step_length'] 
             self.single_sperm_simulation(
                 j, base_position, temp_position,
                 remaining_distance, self.constants
             )
-    def is_vector_meeting_egg(self, base_position, temp_position, egg_center, gamete_R):
-        vector = temp_position - base_position
-        if LA.norm(vector) < 1e-9:
+        self.store.close()
+    def eggs_meeting_vector(self, base_position, temp_position):
+        """base → temp が触れた卵子の番号（昇順）"""
+        if norm3(temp_position - base_position) < 1e-9:
             sys.exit("zzz")
-        distance_base = LA.norm(base_position - egg_center)
-        distance_tip = LA.norm(temp_position - egg_center)
-        if distance_base <= gamete_R or distance_tip <= gamete_R:
-            return True
-        f = base_position - egg_center
-        a = vector @ vector
-        b = 2 * (f @ vector)
-        c = f @ f - gamete_R**2
-        discriminant = b**2 - 4*a*c
-        if discriminant < 0:
-            return False
-        sqrt_discriminant = np.sqrt(discriminant)
-        t1 = (-b - sqrt_discriminant) / (2*a)
-        t2 = (-b + sqrt_discriminant) / (2*a)
-        if (0 <= t1 <= 1) or (0 <= t2 <= 1):
-            return True
-        return False
+        return self.eggs.hits(base_position, temp_position)
     def single_sperm_simulation(self, j, base_position, temp_position, remaining_distance, constants):
         if constants['reflection_analysis'] == "yes":
             stick_status = self.initial_stick_status
         else:
             stick_status = 0
-        self.trajectory[j, 0] = base_position
+        # この精子の軌跡（float64）。contact_only では直前 2 行だけ持つ
+        traj = _StepRing() if self.contact_only else np.zeros((self.n_simulation, 3))
+        traj[0] = base_position
         i = 1
         intersection_point = np.array([])
         shape = constants['shape']
-        gamete_R = constants['gamete_R']
-        if shape != "ceros":
-            (egg_x, egg_y, egg_z,
-            e_x_min, e_y_min, e_z_min,
-            e_x_max, e_y_max, e_z_max,
-            egg_center, egg_position_4d) = placement_of_eggs(constants)
-        else:
-            egg_center = np.array([np.inf, np.inf, np.inf])
-            gamete_R = constants['gamete_R']
         if self.n_stop is not None and not np.isnan(self.n_stop):
             max_steps = int(self.n_stop)
         else:
             max_steps = self.n_simulation
+        io_check = self.shape.io_check
+        rng = self.rng.sperm[j]
+        limits = self.geom.limits
+        step_length = self.geom.step_length
+        stick_init = self.geom.stick_steps
         while i < self.n_simulation:
             if shape in ["cube", "ceros"]:
-                new_IO_status, vertex_point = IO_check_cube(temp_position, constants)
+                new_IO_status, vertex_point = io_check(temp_position)
             elif shape == "drop":
-                new_IO_status = IO_check_drop(temp_position, stick_status, constants)
-                vertex_point = None
+                new_IO_status, vertex_point = io_check(temp_position, stick_status=stick_status)
                 if new_IO_status == IOStatus.BORDER:
                     vec = temp_position - base_position
-                    vec_length = np.linalg.norm(vec)
+                    vec_length = norm3(vec)
                     if vec_length > constants['limit']:
                         adjusted_vec = vec * 0.99
                         temp_position = base_position + adjusted_vec
-                        new_IO_status = IO_check_drop(temp_position, stick_status, constants)
+                        new_IO_status, _ = io_check(temp_position, stick_status=stick_status)
                     if new_IO_status == IOStatus.BORDER:
                         sys.exit("drop: rethink logic for border")
             elif shape == "spot":
                 prev_stat = self.prev_IO_status[j]
-                if prev_stat is None:
-                    prev_stat = "none"
-                new_IO_status = IO_check_spot(base_position, temp_position, constants, prev_stat)
-                vertex_point = None
+                new_IO_status, vertex_point = io_check(temp_position, base_position, prev_status=prev_stat)
                 if new_IO_status == IOStatus.BORDER:
                     vec = temp_position - base_position
-                    vec_length = np.linalg.norm(vec)
+                    vec_length = norm3(vec)
                     if vec_length > constants['limit']:
                         adjusted_vec = vec * 0.99
                         temp_position = base_position + adjusted_vec
-                        new_IO_status = IO_check_spot(base_position, temp_position, constants, prev_stat)
+                        new_IO_status, _ = io_check(temp_position, base_position, prev_status=prev_stat)
                     if new_IO_status == IOStatus.BORDER:
                         sys.exit("rethink logic 3")
             else:
-                new_IO_status = "inside"
+                new_IO_status = IOStatus.INSIDE
                 vertex_point = None
             prev_stat = self.prev_IO_status[j]
-            if prev_stat in [IOStatus.TEMP_ON_EDGE, IOStatus.TEMP_ON_SURFACE] and (stick_status > 0):
-                if new_IO_status in [
-                    IOStatus.INSIDE,
-                    IOStatus.TEMP_ON_POLYGON,
-                    IOStatus.TEMP_ON_SURFACE,
-                    IOStatus.TEMP_ON_EDGE,
-                    IOStatus.SPOT_BOTTOM,
-            ]:
+            if CARRY_FROM[prev_stat] and (stick_status > 0):
+                if CARRY_OVER[new_IO_status]:
                     new_IO_status = prev_stat
                     vertex_point = None
             IO_status = new_IO_status
             self.prev_IO_status[j] = IO_status
             if remaining_distance < 0:
                 sys.exit("rd<0")
-            if IO_status in [
-                IOStatus.INSIDE,
-                IOStatus.TEMP_ON_SURFACE,
-                IOStatus.TEMP_ON_EDGE,
-                IOStatus.SPOT_BOTTOM,
-                IOStatus.ON_EDGE_BOTTOM,
-                IOStatus.TEMP_ON_POLYGON,
-        ]:
-                self.trajectory[j, i] = temp_position
-                base_position = self.trajectory[j, i]
-                remaining_distance = constants['step_length']
+            if NEEDS_BEND[IO_status] and stick_status == 0:
+                stick_status = stick_init
+            if ADVANCES[IO_status]:
+                traj[i] = temp_position
+                base_position = traj[i]
+                remaining_distance = step_length
                 if stick_status > 0:
                     stick_status -= 1
                 if len(intersection_point) != 0:
                     last_vec = temp_position - intersection_point
                     intersection_point = np.array([])
                 else:
-                    last_vec = self.trajectory[j, i] - self.trajectory[j, i - 1]
-                if self.is_vector_meeting_egg(self.trajectory[j, i - 1], temp_position, egg_center, gamete_R):
-                    self.intersection_records.append((j, i))
-                    self.vec_colors[j, i - 1] = "red"
-                    self.vec_thickness_2d[j, i - 1] = 2.0
-                    self.vec_thickness_3d[j, i - 1] = 4.0
+                    last_vec = traj[i] - traj[i - 1]
+                for egg in self.eggs_meeting_vector(traj[i - 1], temp_position):
+                    self.record_contact(j, i, int(egg))
                 if IO_status == IOStatus.TEMP_ON_EDGE:
                     inward_dir = face_and_inward_dir(
-                        temp_position, base_position, last_vec, IO_status, stick_status, constants
+                        temp_position, base_position, last_vec, IO_status, stick_status, constants,
+                        limits
                     )
                     if inward_dir is None:
                         inward_dir = np.array([0, 0, 1], dtype=float)
@@ -1194,12 +1000,14 @@ class SpermSimulation:
                             last_vec, constants,
                             boundary_type="edge",
                             stick_status=stick_status,
-                            inward_dir=inward_dir
+                            inward_dir=inward_dir,
+                            rng=rng
                         )
                         temp_position = base_position + new_vec
                 elif IO_status == IOStatus.TEMP_ON_SURFACE:
                     inward_dir = face_and_inward_dir(
-                        temp_position, base_position, last_vec, IO_status, stick_status, constants
+                        temp_position, base_position, last_vec, IO_status, stick_status, constants,
+                        limits
                     )
                     if inward_dir is None:
                         inward_dir = np.array([0, 0, 1], dtype=float)
@@ -1207,7 +1015,8 @@ class SpermSimulation:
                         last_vec, constants,
                         boundary_type="surface",
                         stick_status=stick_status,
-                        inward_dir=inward_dir
+                        inward_dir=inward_dir,
+                        rng=rng
                     )
                     temp_position = base_position + new_vec
                 elif IO_status == IOStatus.SPOT_BOTTOM:
@@ -1216,14 +1025,16 @@ class SpermSimulation:
                         last_vec, constants,
                         boundary_type="surface",
                         stick_status=stick_status,
-                        inward_dir=inward_dir
+                        inward_dir=inward_dir,
+                        rng=rng
                     )
                     temp_position = base_position + new_vec
                 elif IO_status == IOStatus.ON_EDGE_BOTTOM:
                     sys.exit("ありえるのか？")
                 elif IO_status == IOStatus.TEMP_ON_POLYGON:
                     inward_dir = face_and_inward_dir(
-                        temp_position, base_position, last_vec, IO_status, stick_status, constants
+                        temp_position, base_position, last_vec, IO_status, stick_status, constants,
+                        limits
                     )
                     if inward_dir is None:
                         inward_dir = np.array([0, 0, 1], dtype=float)
@@ -1231,36 +1042,36 @@ class SpermSimulation:
                         last_vec, constants,
                         boundary_type="polygon",
                         stick_status=stick_status,
-                        inward_dir=inward_dir
+                        inward_dir=inward_dir,
+                        rng=rng
                     )
                     temp_position = base_position + new_vec
                 else:            
-                    self.trajectory[j, i] = temp_position
-                    base_position = self.trajectory[j, i]
-                    remaining_distance = constants['step_length']
+                    traj[i] = temp_position
+                    base_position = traj[i]
+                    remaining_distance = step_length
                     if stick_status > 0:
                         stick_status -= 1
                     if len(intersection_point) != 0:
                         last_vec = temp_position - intersection_point
                         intersection_point = np.array([])
                     else:
-                        last_vec = self.trajectory[j, i] - self.trajectory[j, i - 1]
-                    if LA.norm(last_vec) < constants['limit']:
+                        last_vec = traj[i] - traj[i - 1]
+                    if norm3(last_vec) < constants['limit']:
                         sys.exit("last vec is too short!")
                     new_vec = prepare_new_vector(
                         last_vec, constants,
                         boundary_type="free",
                         stick_status=stick_status,
-                        inward_dir=None
+                        inward_dir=None,
+                        rng=rng
                     )
-                    temp_position = self.trajectory[j, i] + new_vec
+                    temp_position = traj[i] + new_vec
                 i += 1
                 continue
             elif IO_status == IOStatus.SPHERE_OUT:
-                if stick_status == 0:
-                    stick_status = int(constants['stick_sec'] * constants['sampl_rate_Hz'])
                 new_temp_pos, intersection_point, remaining_dist, inward_dir = cut_and_bend_sphere(
-                    self.trajectory[j, i - 1],
+                    traj[i - 1],
                     remaining_distance,
                     temp_position,
                     constants
@@ -1270,15 +1081,15 @@ class SpermSimulation:
                 last_vec = temp_position - intersection_point
                 continue
             elif IO_status == IOStatus.POLYGON_MODE:
-                self.trajectory[j, i] = temp_position
-                base_position = self.trajectory[j, i]
+                traj[i] = temp_position
+                base_position = traj[i]
                 if len(intersection_point) != 0:
                     last_vec = temp_position - intersection_point
                     intersection_point = np.array([])
                 else:
-                    last_vec = self.trajectory[j, i] - self.trajectory[j, i - 1]
+                    last_vec = traj[i] - traj[i - 1]
                 new_temp_position, new_last_vec, updated_stick, next_state = self.bottom_edge_mode(
-                    base_position, last_vec, stick_status, constants
+                    base_position, last_vec, stick_status, constants, rng=rng
                 )
                 temp_position = new_temp_position
                 last_vec = new_last_vec
@@ -1287,8 +1098,6 @@ class SpermSimulation:
                 IO_status = next_state
                 continue
             elif IO_status == IOStatus.SPOT_EDGE_OUT:
-                if stick_status == 0:
-                    stick_status = int(constants['stick_sec'] * constants['sampl_rate_Hz'])
                 (new_temp_pos,
                  intersection_point,
                  remaining_distance,
@@ -1300,8 +1109,6 @@ class SpermSimulation:
                 last_vec = temp_position - intersection_point
                 continue
             elif IO_status == IOStatus.BOTTOM_OUT:
-                if stick_status == 0:
-                    stick_status = int(constants['stick_sec'] * constants['sampl_rate_Hz'])
                 (new_temp_pos,
                  intersection_point,
                  remaining_distance) = cut_and_bend_bottom(
@@ -1311,9 +1118,7 @@ class SpermSimulation:
                 temp_position = new_temp_pos
                 last_vec = temp_position - intersection_point
                 continue
-            elif IO_status in [IOStatus.SURFACE_OUT, IOStatus.EDGE_OUT]:
-                if stick_status == 0:
-                    stick_status = int(constants['stick_sec'] * constants['sampl_rate_Hz'])
+            elif IO_status in (IOStatus.SURFACE_OUT, IOStatus.EDGE_OUT):
                 (new_temp_pos,
                  intersection_point,
                  remaining_distance) = cut_and_bend_cube(
@@ -1324,18 +1129,18 @@ class SpermSimulation:
                 last_vec = temp_position - intersection_point
                 continue
             elif IO_status == IOStatus.VERTEX_OUT:
-                if stick_status == 0:
-                    stick_status = int(constants['stick_sec'] * constants['sampl_rate_Hz'])
                 (intersection_point,
                  new_temp_pos,
                  remaining_distance) = cut_and_bend_vertex(
-                     vertex_point, base_position, remaining_distance, constants
+                     vertex_point, base_position, remaining_distance, constants, rng=rng
                 )
                 base_position = intersection_point
                 temp_position = new_temp_pos
                 last_vec = temp_position - intersection_point
                 continue
-    def bottom_edge_mode(self, base_position, last_vec, stick_status, constants):
+        self.store.write_sperm(j, traj)
+        self._vec_style = None
+    def bottom_edge_mode(self, base_position, last_vec, stick_status, constants, rng=None):
         """
         底面を這いつつ底面の円周に当たった時の処理。
         後者コードを反映して修正。 polygon_mode から呼ばれる。
@@ -1348,46 +1153,30 @@ class SpermSimulation:
         dist2 = candidate_position[0]**2 + candidate_position[1]**2
         radius2 = r_edge**2
         if dist2 > radius2:
-            x0, y0 = base_position[0], base_position[1]
-            x1, y1 = candidate_position[0], candidate_position[1]
-            dx = x1 - x0
-            dy = y1 - y0
-            A = dx**2 + dy**2
-            B = 2*(x0*dx + y0*dy)
-            C = x0**2 + y0**2 - r_edge**2
-            discriminant = B**2 - 4*A*C
-            if discriminant < 0:
-                discriminant = 0
-            sqrt_discriminant = np.sqrt(discriminant)
-            t1 = (-B + sqrt_discriminant)/(2*A)
-            t2 = (-B - sqrt_discriminant)/(2*A)
-            t_candidates = [t for t in [t1,t2] if 0<=t<=1]
-            t_intersect = min(t_candidates) if t_candidates else 0.0
-            xi = x0 + t_intersect*dx
-            yi = y0 + t_intersect*dy
+            _, xi, yi = segment_circle(base_position, candidate_position, r_edge, clamp=True)
             intersection_point = np.array([xi, yi, z_floor], dtype=float)
-            distance_to_intersection = np.linalg.norm(intersection_point - base_position)
-            new_remaining = np.linalg.norm(last_vec) - distance_to_intersection
+            distance_to_intersection = norm3(intersection_point - base_position)
+            new_remaining = norm3(last_vec) - distance_to_intersection
             if new_remaining < 0:
                 new_remaining = 0
             if stick_status > 0:
                 bi = intersection_point - base_position
-                bi_norm = np.linalg.norm(bi)
+                bi_norm = norm3(bi)
                 if bi_norm < constants['limit']:
                     bi_norm = 1e-8
                 bi_normalized = bi / bi_norm
                 oi = np.array([xi, yi, 0.0])
-                oi_norm = np.linalg.norm(oi)
+                oi_norm = norm3(oi)
                 if oi_norm < constants['limit']:
                     oi_norm = 1e-8
                 oi_normalized = oi / oi_norm
                 tangent_1 = np.array([-oi_normalized[1], oi_normalized[0], 0])
                 tangent_2 = -tangent_1
                 angle_with_t1 = np.arccos(
-                    np.clip(tangent_1[:2] @ bi_normalized[:2], -1.0,1.0)
+                    np.clip(tangent_1[0]*bi_normalized[0] + tangent_1[1]*bi_normalized[1], -1.0,1.0)
                 )
                 angle_with_t2 = np.arccos(
-                    np.clip(tangent_2[:2] @ bi_normalized[:2], -1.0,1.0)
+                    np.clip(tangent_2[0]*bi_normalized[0] + tangent_2[1]*bi_normalized[1], -1.0,1.0)
                 )
                 if angle_with_t1 < angle_with_t2:
                     selected_tangent = tangent_1
@@ -1407,39 +1196,39 @@ class SpermSimulation:
                     y_new = vec[0]*s + vec[1]*c
                     return np.array([x_new,y_new,0])
                 new_tangent = rotate_vector_2d(selected_tangent, angle_adjust)
-                norm_tan = np.linalg.norm(new_tangent)
+                norm_tan = norm3(new_tangent)
                 if norm_tan < constants['limit']:
                     new_tangent = selected_tangent
-                    norm_tan = np.linalg.norm(new_tangent)
+                    norm_tan = norm3(new_tangent)
                 new_tangent /= norm_tan
                 last_vec_corrected = new_tangent * new_remaining
                 new_temp_position = intersection_point + last_vec_corrected
                 new_temp_position[2] = z_floor
                 new_last_vec = new_temp_position - intersection_point
             else:
-                new_remaining = np.linalg.norm(last_vec)
+                new_remaining = norm3(last_vec)
                 sphere_normal_3d = intersection_point
-                norm_sphere = np.linalg.norm(sphere_normal_3d)
+                norm_sphere = norm3(sphere_normal_3d)
                 if norm_sphere < constants['limit']:
                     sphere_normal_3d = np.array([0,0,1])
                     norm_sphere = 1.0
                 sphere_normal_3d /= norm_sphere
                 plane_normal = np.array([0,0,1], dtype=float)
-                dot_val = np.clip(np.dot(sphere_normal_3d, plane_normal), -1, 1)
+                dot_val = np.clip(dot3(sphere_normal_3d, plane_normal), -1, 1)
                 angle_plane_sphere = np.arccos(dot_val)
                 def sample_vector_in_cone(axis, max_angle):
                     cos_max = np.cos(max_angle)
-                    z_ = np.random.uniform(cos_max, 1.0)
-                    phi_ = np.random.uniform(0, 2*np.pi)
+                    rng_ = np.random if rng is None else rng
+                    z_ = rng_.uniform(cos_max, 1.0)
+                    phi_ = rng_.uniform(0, 2*np.pi)
                     sqrt_part = np.sqrt(1 - z_*z_)
                     x_local = sqrt_part * np.cos(phi_)
                     y_local = sqrt_part * np.sin(phi_)
                     z_local = z_
-                    rot = R.align_vectors([[0,0,1]], [axis])[0]
                     v_local = np.array([x_local, y_local, z_local])
-                    return rot.apply(v_local)
+                    return align_to_z(axis, v_local)
                 center_axis = (plane_normal + sphere_normal_3d) / 2
-                center_axis_norm = np.linalg.norm(center_axis)
+                center_axis_norm = norm3(center_axis)
                 if center_axis_norm < constants['limit']:
                     center_axis = plane_normal
                     center_axis_norm = 1.0
@@ -1527,7 +1316,9 @@ class SpermPlot:
             ax.set_zlim([-0.05 , 0.05 ])
             ax.set_box_aspect([1.63, 1.24, 0.1])
     def _draw_graph(self, shape):
-        import matplotlib.pyplot as plt
+        import matplotlib.patches as patches
+        from tqdm import tqdm
+        plt = _pyplot()
         plt.close('all')                                  
         plt.rcdefaults()                                    
         if hasattr(self, "already_saved") and self.already_saved:
@@ -1547,16 +1338,15 @@ class SpermPlot:
                         ('Y', 'Z', 2)]
         index_map = {'X': 0, 'Y': 1, 'Z': 2}
         if shape != "ceros":
-            egg_constants = self.constants.copy()
-            egg_x, egg_y, egg_z, *_ , egg_center, _ = placement_of_eggs(egg_constants)
-            for ax, (x, y) in zip(axes, [(egg_x, egg_y), (egg_x, egg_z), (egg_y, egg_z)]):
-                ax.add_patch(
-                    patches.Circle(
-                        (x, y),
-                        radius=self.constants['gamete_R'],
-                        facecolor='yellow', alpha=0.8, ec='gray', linewidth=1.0
+            for egg_x, egg_y, egg_z in self.simulation.eggs.centers:
+                for ax, (x, y) in zip(axes, [(egg_x, egg_y), (egg_x, egg_z), (egg_y, egg_z)]):
+                    ax.add_patch(
+                        patches.Circle(
+                            (x, y),
+                            radius=self.constants['gamete_R'],
+                            facecolor='yellow', alpha=0.8, ec='gray', linewidth=1.0
+                        )
                     )
-                )
             self.draw_motion_area(shape, axes, self.constants)
         pbar = tqdm(total=self.simulation.number_of_sperm * (self.simulation.n_simulation - 1) * len(axis_combi),
                     desc="Plotting trajectories", ncols=100, ascii=True)
@@ -1632,6 +1422,7 @@ class SpermPlot:
         plt.close(fig)
         return out_path
     def draw_motion_area(self, shape, axes, constants):
+        import matplotlib.patches as patches
         if shape == 'spot':
             spot_bottom_radius = constants['spot_bottom_R']
             spot_R = constants['spot_R']
@@ -1651,17 +1442,13 @@ class SpermTrajectoryVisualizer:
         self.simulation = simulation
         self.constants = self.simulation.constants
         self.sperm_plot = SpermPlot(self.simulation)
-        (
-            egg_x, egg_y, egg_z,
-            e_x_min, e_y_min, e_z_min,
-            e_x_max, e_y_max, e_z_max,
-            egg_center, egg_position_4d
-        ) = placement_of_eggs(self.constants)
-        self.egg_center = np.array([egg_x, egg_y, egg_z])
+        self.egg_centers = self.simulation.eggs.centers
         self.egg_radius = self.constants['gamete_R']
     def animate_trajectory(self):
         if self.constants.get("make_movie", "no").lower() != "yes":
             return None
+        plt = _pyplot()
+        from matplotlib.animation import FuncAnimation
         shape = self.constants.get("shape", "spot")
         num_sperm = self.simulation.number_of_sperm
         n_sim = self.simulation.n_simulation
@@ -1734,21 +1521,22 @@ class SpermTrajectoryVisualizer:
             fig.suptitle(title_str_3d, fontsize=8, y=0.93)
             egg_u = np.linspace(0, 2 * np.pi, 50)
             egg_v = np.linspace(0, np.pi, 50)
-            ex = (
-                self.egg_center[0]
-                + self.egg_radius * np.outer(np.cos(egg_u), np.sin(egg_v))
-            )
-            ey = (
-                self.egg_center[1]
-                + self.egg_radius * np.outer(np.sin(egg_u), np.sin(egg_v))
-            )
-            ez = (
-                self.egg_center[2]
-                + self.egg_radius * np.outer(
-                    np.ones(np.size(egg_u)), np.cos(egg_v)
+            for egg_center in self.egg_centers:
+                ex = (
+                    egg_center[0]
+                    + self.egg_radius * np.outer(np.cos(egg_u), np.sin(egg_v))
                 )
-            )
-            ax.plot_surface(ex, ey, ez, color='yellow', alpha=0.2)
+                ey = (
+                    egg_center[1]
+                    + self.egg_radius * np.outer(np.sin(egg_u), np.sin(egg_v))
+                )
+                ez = (
+                    egg_center[2]
+                    + self.egg_radius * np.outer(
+                        np.ones(np.size(egg_u)), np.cos(egg_v)
+                    )
+                )
+                ax.plot_surface(ex, ey, ez, color='yellow', alpha=0.2)
             if shape == "spot":
                 spot_R = self.constants.get('spot_R', 5)
                 spot_angle_deg = self.constants.get('spot_angle', 60)
@@ -1807,186 +1595,6 @@ class SpermTrajectoryVisualizer:
             print(f"{output_path}")
             plt.show()
             return output_path
-def setup_database(conn):
-    """
-    Create required tables if they do not exist.
-    (DDL 文を dict にまとめ可読性を向上)
-    """
-    c = conn.cursor()                                # ★ADDED
-
-    SQL_DDL = {                                      # ★ADDED
-        "basic_data": '''
-            CREATE TABLE IF NOT EXISTS basic_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                exp_id          TEXT,
-                version         TEXT,
-                shape           TEXT,
-                volume          REAL,
-                sperm_conc      INTEGER,
-                N_contact       INTEGER,
-                VSL             REAL,
-                stick_sec       INTEGER,
-                sim_min         REAL,
-                deviation       REAL,
-                egg_localization TEXT,
-                image_id        TEXT,
-                mov_id          TEXT,
-                spot_angle      INTEGER,
-                sampl_rate_Hz   INTEGER,
-                seed_number     TEXT
-            )
-        ''',
-        "intersection": '''
-            CREATE TABLE IF NOT EXISTS intersection (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                simulation_id  INTEGER,
-                sperm_index    INTEGER,
-                start_step     INTEGER
-            )
-        ''',
-        "summary": '''
-            CREATE TABLE IF NOT EXISTS summary (
-                simulation_id    INTEGER,
-                shape            TEXT,
-                sperm_conc       INTEGER,
-                volume           REAL,
-                VSL              REAL,
-                deviation        REAL,
-                sim_min          REAL,
-                stick_sec        INTEGER,
-                spot_angle       INTEGER,
-                sampl_rate_Hz    INTEGER,
-                egg_localization TEXT,
-                mean_contact_hr  REAL,
-                SD1              REAL,
-                N_sperm          INTEGER,
-                C_per_N          REAL,
-                SD2              REAL,
-                total_simulations INTEGER
-            )
-        '''
-    }                                                # ★ADDED
-
-    for ddl in SQL_DDL.values():                     # ★ADDED
-        c.execute(ddl)                              # ★ADDED
-
-    conn.commit()                                    # ★ADDED
-def insert_sim_record(conn, exp_id, version, constants, image_id, mov_id, contact_count):
-    """
-    basic_data テーブルに 1 件分のシミュレーション結果を挿入し、
-    挿入した行の simulation_id を返す。
-    既存仕様互換のため、dict も同じ値で処理する。
-    """
-    c = conn.cursor()
-
-    # ★MODIFIED: 可読性向上のためフィールドと値をリスト化
-    fields = [
-        "exp_id", "version", "shape", "volume", "sperm_conc", "N_contact",
-        "VSL", "stick_sec", "sim_min", "deviation", "egg_localization",
-        "image_id", "mov_id", "spot_angle", "sampl_rate_Hz", "seed_number"
-    ]
-
-    # 値の組み立て（spot_angle は spot 形状以外では None）
-    values = [
-        exp_id,
-        version,
-        constants['shape'],
-        constants['volume'],
-        int(constants['sperm_conc']),
-        contact_count,
-        constants['VSL'],
-        int(constants['stick_sec']),
-        constants['sim_min'],
-        constants['deviation'],
-        constants.get('egg_localization', 'bottom_center').strip(),
-        image_id,
-        mov_id,
-        int(constants['spot_angle']) if constants['shape'] == 'spot' else None,
-        int(constants['sampl_rate_Hz']),
-        constants.get('seed_number', 'None'),
-    ]
-
-    placeholders = ",".join("?" * len(fields))
-    sql = f"INSERT INTO basic_data ({','.join(fields)}) VALUES ({placeholders})"
-    c.execute(sql, values)
-    conn.commit()
-
-    # 挿入された行の simulation_id を返す
-    return c.lastrowid
-def insert_intersection_records(conn, simulation_id, merged_events):
-    c = conn.cursor()
-    for (sperm_index, start_step) in merged_events:
-        c.execute('''
-            INSERT INTO intersection (simulation_id, sperm_index, start_step)
-            VALUES (?, ?, ?)
-        ''', (simulation_id, sperm_index, start_step))
-    conn.commit()
-def aggregate_results(conn, exp_id):
-    c = conn.cursor()
-    c.execute('''
-        SELECT id, shape, sperm_conc, volume, VSL, deviation,
-               sim_min, stick_sec, spot_angle, sampl_rate_Hz,
-               egg_localization, N_contact
-          FROM basic_data
-    ''')
-    rows = c.fetchall()
-    import statistics
-    from collections import defaultdict
-    grouping = defaultdict(list)
-    for rec in rows:
-        sim_id            = rec[0]
-        shape_val         = rec[1]
-        sperm_conc_val    = rec[2]
-        volume_val        = float(rec[3])
-        VSL_val           = float(rec[4])
-        deviation_val     = float(rec[5])
-        sim_min           = float(rec[6])
-        stick_sec         = rec[7]
-        spot_angle        = rec[8]
-        sampl_rate_Hz     = rec[9]
-        egg_loc_val       = rec[10]
-        N_contact         = rec[11]
-        N_sperm = int(sperm_conc_val * volume_val / 1000)
-        ratio   = (N_contact / sim_min * 60.0) if sim_min > 0 else 0.0
-        cps     = (N_contact / N_sperm) if N_sperm != 0 else 0.0
-        key = (
-            shape_val, sperm_conc_val, volume_val, VSL_val,
-            deviation_val, sim_min, stick_sec, spot_angle,
-            sampl_rate_Hz, egg_loc_val
-        )
-        grouping[key].append((sim_id, ratio, N_sperm, cps))
-    for key, values in grouping.items():
-        (shape_val, sperm_conc_val, volume_val, VSL_val,
-         deviation_val, sim_min, stick_sec, spot_angle,
-         sampl_rate_Hz, egg_loc_val) = key
-        total_sim         = len(values)
-        ratios            = [v[1] for v in values]
-        Ns                = [v[2] for v in values]
-        cps_list          = [v[3] for v in values]
-        mean_contact_hr   = round(statistics.mean(ratios), 1) if ratios else 0.0
-        SD1_val           = round(statistics.pstdev(ratios), 1) if len(ratios) > 1 else 0.0
-        mean_N_sperm      = int(statistics.mean(Ns)) if Ns else 0
-        C_per_N_val       = round(mean_contact_hr / mean_N_sperm, 1) if mean_N_sperm else 0.0
-        SD2_val           = round(statistics.pstdev(cps_list), 1) if len(cps_list) > 1 else 0.0
-        new_latest_sim_id = max(v[0] for v in values)
-        c.execute('''
-            INSERT OR REPLACE INTO summary (
-                simulation_id, shape, sperm_conc, volume, VSL, deviation,
-                sim_min, stick_sec, spot_angle, sampl_rate_Hz, egg_localization,
-                mean_contact_hr, SD1, N_sperm, C_per_N, SD2, total_simulations
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            new_latest_sim_id, shape_val, sperm_conc_val, volume_val,
-            VSL_val, deviation_val, sim_min, stick_sec, spot_angle,
-            sampl_rate_Hz, egg_loc_val,
-            mean_contact_hr, SD1_val, mean_N_sperm, C_per_N_val,
-            SD2_val, total_sim
-        ))
-    conn.commit()
-def calculate_n_sperm(df):
-    df["N_sperm"] = df["N_sperm"].astype(int)
-    return df
 def load_previous_selection():
     config = configparser.ConfigParser()
     config.read(["user_selection.ini", "config.ini"])
@@ -2016,6 +1624,7 @@ def load_previous_selection():
     deviation_default            = get_str("deviation",                 "0.4")
     stick_sec_default            = get_str("stick_sec",               "2")
     egg_localization_default     = get_str("egg_localization",          "bottom_center")
+    egg_positions_default        = get_str("egg_positions",             "None")
     gamete_r_default             = get_str("gamete_r",                 "0.15")
     initial_direction_default    = get_str("initial_direction",         "random")
     initial_stick_status_default = get_str("initial_stick_status",      "10")
@@ -2044,6 +1653,7 @@ def load_previous_selection():
         "deviation": deviation_default,
         "stick_sec": stick_sec_default,
         "egg_localization": egg_localization_default,
+        "egg_positions": egg_positions_default,
         "gamete_r": gamete_r_default,
         "initial_direction": initial_direction_default,
         "initial_stick_status": initial_stick_status_default,
@@ -2061,7 +1671,7 @@ def save_previous_selection(values):
         config.add_section(userselection_section)
     single_keys = [
         "n_repeat", "seed_number", "sim_min", "sampl_rate_hz", "spot_angle",
-        "vsl", "deviation", "stick_sec", "egg_localization",
+        "vsl", "deviation", "stick_sec", "egg_localization", "egg_positions",
         "gamete_r", "initial_direction", "initial_stick_status", "analysis_type"
     ]
     for key in single_keys:
@@ -2080,6 +1690,7 @@ def show_selection_ui(no_gui=False):
         # GUIを起動せず直前の設定を使用
         return load_previous_selection()
     # --- GUI 起動 ---
+    import tkinter as tk
     root = tk.Tk()
     root.title("シミュレーションのパラメータ選択")
     root.geometry("600x600")
@@ -2222,14 +1833,7 @@ def repeat_simulation(constants, repeat):
     simulations = []
     for r in range(repeat):
         print(f"n--- Simulation run {r+1} / {repeat} for shape={constants['shape']}, vol={constants['volume']}, conc={constants['sperm_conc']} ---")
-        simulation_data = type('simulation_data', (object,), {
-            'trajectory': np.zeros((
-                int(constants['number_of_sperm']),
-                int(constants['n_simulation']),
-                3
-            ))
-        })()
-        simulation = SpermSimulation(constants, None, simulation_data)
+        simulation = SpermSimulation(constants, None, None, run_index=r)
         visualizer = SpermTrajectoryVisualizer(simulation)
         simulation.visualizer = visualizer
         simulation.simulate()
@@ -2238,28 +1842,133 @@ def repeat_simulation(constants, repeat):
         print("1時間あたり", len(merged_events)/constants["sim_min"]*60)
         image_id = None
         mov_id = None
-        if constants['draw_trajectory'] == 'yes':
+        if simulation.trajectory is None:
+            pass                                  # trajectory_store='none' は描画しない
+        elif constants['draw_trajectory'] == 'yes':
             plot = SpermPlot(simulation)
             image_id = plot._draw_graph(shape=constants['shape'])
-        if constants.get('make_movie', 'no').lower() == 'yes':
+        if simulation.trajectory is not None and constants.get('make_movie', 'no').lower() == 'yes':
             mov_filename = visualizer.animate_trajectory()
             mov_id = mov_filename
         simulations.append((simulation, image_id, mov_id, merged_events))
     return simulations
+def build_constants(selected_data, shape, volume, sperm_conc):
+    """
+    GUI 値 + (shape, volume, sperm_conc) から 1 run 分の constants を確定する。
+    """
+    constants = get_constants_from_gui(selected_data, shape, volume, sperm_conc)
+
+    # ---- shape 固有パラメータの追加 ------------------------
+    if shape == 'cube':
+        edge_length = constants['volume'] ** (1 / 3)
+        half_edge = edge_length / 2
+        constants.update({
+            'x_min': -half_edge, 'x_max': half_edge,
+            'y_min': -half_edge, 'y_max': half_edge,
+            'z_min': -half_edge, 'z_max': half_edge,
+            'radius': 0
+        })
+    elif shape == 'drop':
+        drop_R = (constants['volume'] * 3 / (4 * np.pi)) ** (1 / 3)
+        constants.update({
+            'drop_R': drop_R,
+            'radius': drop_R,
+            'z_min': -drop_R, 'z_max': drop_R
+        })
+    elif shape == 'spot':
+        if 'spot_R' not in constants or constants['spot_R'] is None:
+            compute_spot_parameters(constants)
+    elif shape == 'ceros':
+        constants.update({
+            'ceros_x_min': -8.15,  'ceros_x_max':  8.15,
+            'ceros_y_min': -6.20,  'ceros_y_max':  6.20,
+            'ceros_z_min': -0.05,  'ceros_z_max':  0.05,
+            'radius'     : 0
+        })
+
+    # ---- 共通パラメータの追加 ------------------------------
+    constants['number_of_sperm'] = (
+        constants['sperm_conc'] * constants['volume'] / 1000
+    )
+    constants.update({
+        'spot_angle_rad': np.deg2rad(constants['spot_angle']),
+        'egg_volume'    : 4 * np.pi * constants['gamete_R']**3 / 3,
+        'stick_steps'   : constants['stick_sec'] * constants['sampl_rate_Hz'],
+        'inner_angle'   : 2 * np.pi / 70,
+    })
+    constants['n_simulation'] = int(
+        constants['sim_min'] * 60 * constants['sampl_rate_Hz']
+    )
+    return constants
+def run_sweep_job(job, selected_data):
+    """
+    sweep の 1 ジョブ (= 1 run) をワーカプロセスで実行する。
+    DB には書かず、記録に必要な値だけを返す（書き込みは親プロセスが一括で行う）。
+    """
+    constants = build_constants(selected_data, job.shape, job.volume, job.sperm_conc)
+    constants['seed_number'] = job.seed       # RunStreams の root seed
+    constants['run_progress'] = 'no'          # 進捗は sweep 全体で表示
+    (_, image_id, mov_id, merged_events), = repeat_simulation(constants, 1)
+    return constants, image_id, mov_id, merged_events
+def contact_rows(merged_events, sampl_rate_Hz):
+    """merged_events → core.db の contacts 行 (sperm, step, time_s, x, y, z, egg)。座標は持たない"""
+    rate = float(sampl_rate_Hz) or 1.0
+    return [(s, t, t / rate, None, None, None, e) for s, t, e in start_events(merged_events)]
+def store_run(storage, exp_id, version, constants, image_id, mov_id, merged_events):
+    """1 run 分を storage（core.storage.Storage）へ積み、run_id を返す"""
+    run_id = storage.add_run(constants, contact_rows(merged_events, constants['sampl_rate_Hz']),
+                             exp_id=exp_id, version=version)
+    for kind, path in (("graph", image_id), ("movie", mov_id)):
+        if path:
+            storage.add_figure(run_id, kind, path)
+    return run_id
+def run_contact_only_job(storage, exp_id, version, job, selected_data):
+    """
+    contact_only の 1 ジョブを同一プロセスで実行し、接触イベントを
+    発生した時点で storage へ積む（接触数は最後に更新）。
+    """
+    constants = build_constants(selected_data, job.shape, job.volume, job.sperm_conc)
+    constants['seed_number'] = job.seed
+    constants['run_progress'] = 'no'
+    constants['contact_only'] = 'yes'
+    run_id = storage.add_run(constants, (), exp_id=exp_id, version=version)
+    rate = float(constants['sampl_rate_Hz']) or 1.0
+    def on_contact(sperm_index, start_step, egg_index):
+        storage.add_contacts(run_id, [(sperm_index, start_step, start_step / rate,
+                                       None, None, None, egg_index)])
+    simulation = SpermSimulation(constants, None, None, run_index=0, on_contact=on_contact)
+    simulation.simulate()
+    merged_events = simulation.merge_contact_events()
+    storage.set_contact_count(run_id, len(merged_events))
+    return run_id, merged_events
 def main():
     import argparse
+    from functools import partial
+    from core.sweep import make_jobs, run_sweep
+    from core.storage import open_storage
     parser = argparse.ArgumentParser()
     parser.add_argument("--no-gui", action="store_true",
                         help="Tkinter GUIを起動せず前回設定でバッチ実行")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="sweep を並列実行するプロセス数 (既定: 1)")
+    parser.add_argument("--contact-only", action="store_true",
+                        help="軌跡を持たず接触イベントだけを DB へ流す")
+    parser.add_argument("--engine", choices=("loop", "batch"),
+                        help="loop: 1 精子ずつ / batch: 全精子を状態配列で一括更新")
+    parser.add_argument("--egg-positions",
+                        help='卵子中心の CSV (x,y,z) か "[(x,y,z), ...]"。省略時は egg_localization の 1 個')
+    parser.add_argument("--db",
+                        help='結果 DB（既定: results.db）。":memory:" なら保存せず集計だけ表示')
     args, _ = parser.parse_known_args()
 
+    # import 時ではなく CLI 起動時だけ行う（ワーカ・テストの import に副作用を残さない）
+    os.chdir(_SCRIPT_DIR)
+    np.set_printoptions(threshold=np.inf)
+    os.makedirs(DATA_DIR, exist_ok=True)
+
     start_time = time.time()
     version = get_program_version()
 
-    # --- DB 準備 ------------------------------------------------------------
-    db_path = DB_PATH_DEFAULT
-    conn = sqlite3.connect(db_path)
-    setup_database(conn)
     exp_id = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # --- GUI or 前回設定 ----------------------------------------------------
@@ -2269,112 +1978,45 @@ def main():
     volumes_list      = selected_data.get('volumes', [])
     sperm_conc_list   = selected_data.get('sperm_concentrations', [])
     shapes_list       = selected_data.get('shapes', [])
-    spot_angle        = float(selected_data.get('spot_angle', 70))
-    vsl               = float(selected_data.get('vsl', 0.13))
-    deviation         = float(selected_data.get('deviation', 0.4))
-    sampl_rate_hz     = float(selected_data.get('sampl_rate_hz', 2))
-    sim_min           = float(selected_data.get('sim_min', 10))
-    gamete_r          = float(selected_data.get('gamete_r', 0.1))
-    stick_sec         = int(selected_data.get('stick_sec', 2))
-    egg_localization  = selected_data.get('egg_localization', 'bottom_center')
-    initial_direction = selected_data.get('initial_direction', 'right')
-    initial_stick_status = int(selected_data.get('initial_stick_status', 10))
     seed_number       = selected_data.get('seed_number', None)
     n_repeat          = int(selected_data.get('n_repeat', 1))
-    draw_trajectory   = 'yes' if 'graph' in selected_data.get('outputs', []) else 'no'
-    make_movie        = 'yes' if 'movie' in selected_data.get('outputs', []) else 'no'
+    if args.contact_only:
+        selected_data['contact_only'] = 'yes'
+    if args.engine:
+        selected_data['engine'] = args.engine
+    if args.egg_positions:
+        selected_data['egg_positions'] = args.egg_positions
 
-    # 乱数シード
-    if seed_number and seed_number.lower() != IOStatus.NONE:
-        np.random.seed(int(seed_number))
+    # 乱数シード: seed_number を root に、各ジョブへ決定的な seed を割り当てる
+    root_seed = None
+    if seed_number and str(seed_number).lower() != "none":
+        root_seed = int(seed_number)
 
     # ============================================================
-    #                      メインループ
+    #      メインループ: (shape, volume, conc, repeat) を並列実行
     # ============================================================
-    for shape in shapes_list:
-        for volume in volumes_list:
-            for sperm_conc in sperm_conc_list:
-
-                # ---- constants を構築（GUI 値 + shape, volume, conc） ----
-                constants = get_constants_from_gui(
-                    selected_data, shape, volume, sperm_conc
-                )
-
-                # ---- shape 固有パラメータの追加 ------------------------
-                if shape == 'cube':
-                    edge_length = constants['volume'] ** (1 / 3)
-                    half_edge = edge_length / 2
-                    constants.update({
-                        'x_min': -half_edge, 'x_max': half_edge,
-                        'y_min': -half_edge, 'y_max': half_edge,
-                        'z_min': -half_edge, 'z_max': half_edge,
-                        'radius': 0
-                    })
-                elif shape == 'drop':
-                    drop_R = (constants['volume'] * 3 / (4 * np.pi)) ** (1 / 3)
-                    constants.update({
-                        'drop_R': drop_R,
-                        'radius': drop_R,
-                        'z_min': -drop_R, 'z_max': drop_R
-                    })
-                elif shape == 'spot':
-                    if 'spot_R' not in constants or constants['spot_R'] is None:
-                        compute_spot_parameters(constants)
-                elif shape == 'ceros':
-                    constants.update({
-                        'ceros_x_min': -8.15,  'ceros_x_max':  8.15,
-                        'ceros_y_min': -6.20,  'ceros_y_max':  6.20,
-                        'ceros_z_min': -0.05,  'ceros_z_max':  0.05,
-                        'radius'     : 0
-                    })
-
-                # ---- 共通パラメータの追加 ------------------------------
-                constants['number_of_sperm'] = (
-                    constants['sperm_conc'] * constants['volume'] / 1000
-                )
-                constants.update({
-                    'spot_angle_rad': np.deg2rad(constants['spot_angle']),
-                    'egg_volume'    : 4 * np.pi * constants['gamete_R']**3 / 3,
-                    'stick_steps'   : constants['stick_sec'] * constants['sampl_rate_Hz'],
-                    'inner_angle'   : 2 * np.pi / 70,
-                })
-                constants['n_simulation'] = int(
-                    constants['sim_min'] * 60 * constants['sampl_rate_Hz']
-                )
-
-                # ====================================================
-                # ★ ここが  “constants を確定した直後” ★
-                # ====================================================
-                # まだ使わないが、後の置換フェーズで使えるよう生成しておく
-                from spermsim.geometry import create_shape
-                shape_obj = create_shape(constants["shape"], constants)
-                # ----------------------------------------------------
-
-                # ---- シミュレーション実行 ----------------------------
-                from spermsim.simulation import SpermSimulation          # ★ 追加
-                sim_engine = SpermSimulation(constants, shape_obj)       # ★ 追加
-                simulations = sim_engine.run(n_repeat)                   # ★ 置換
-                    # ---------------------------------------------------------------
-
-                # ---- DB へ記録・集計 -------------------------------
-                for i, (sim, image_id, mov_id, merged_events) in enumerate(simulations, start=1):
-                    contact_count_merged = len(merged_events)
-                    simulation_id = insert_sim_record(
-                        conn, exp_id, version, constants,
-                        image_id, mov_id, contact_count_merged
-                    )
-                    insert_intersection_records(conn, simulation_id, merged_events)
+    jobs = make_jobs(shapes_list, volumes_list, sperm_conc_list, n_repeat, root_seed)
+    # ---- DB へ記録（書き込みはこのプロセスだけ・commit はまとめて） ----------
+    with open_storage(args.db) as storage:
+        if selected_data.get('contact_only') == 'yes' and args.workers <= 1:
+            # 同一プロセスなら接触をその場で DB へ流す
+            for job in _progress(jobs, desc="sweep", ncols=100):
+                run_contact_only_job(storage, exp_id, version, job, selected_data)
+        else:
+            runner = run_sweep(partial(run_sweep_job, selected_data=selected_data),
+                               jobs, workers=args.workers)
+            for job, (constants, image_id, mov_id, merged_events) in _progress(
+                    runner, total=len(jobs), desc="sweep", ncols=100):
+                store_run(storage, exp_id, version, constants, image_id, mov_id, merged_events)
 
-    # ---- 集計 ---------------------------------------------------------------
-    aggregate_results(conn, exp_id)
-    df_summary = pd.read_sql_query("SELECT * FROM summary", conn)
-    if not df_summary.empty:
-        df_summary = calculate_n_sperm(df_summary)
-        df_summary.to_sql("summary", conn, if_exists="replace", index=False)
-    else:
-        print("summary テーブルに集計結果がありません。")
+        # ---- 集計（group_summary: この実験の key だけ更新） ---------------------
+        if not storage.aggregate(exp_id):
+            print("group_summary に集計結果がありません。")
+        elif args.db == ":memory:":
+            for row in storage.query("SELECT shape, volume, sperm_conc, mean_contact_hr, SD1, "
+                                     "total_simulations FROM group_summary"):
+                print(*row)
 
-    conn.close()
     print(f"実行時間: {time.time() - start_time:.2f}秒")
 
 
@@ -123,7 +123,7 @@ def get_constants_from_gui(selected_data, shape, volume, sperm_conc):
     outputs = selected_data.get('outputs', [])
     constants['draw_trajectory'] = 'yes' if 'graph' in outputs else 'no'
     constants['make_movie']      = 'yes' if 'movie' in outputs else 'no'
-    if constants['seed_number'] and str(constants['seed_number']).lower() != IOStatus.NONE:
+    if constants['seed_number'] and str(constants['seed_number']).lower() != "none":
         np.random.seed(int(constants['seed_number']))
     constants['reflection_analysis'] = 'yes' if selected_data.get('analysis_type', 'simulation') == 'reflection' else 'no'
     return constants
@@ -959,7 +959,7 @@ class SpermSimulation:
                 IO_status = IO_check_drop(temp_position, self.constants['initial_stick_status'], self.constants)
                 vertex_point = None
             elif shape == "spot":
-                IO_status = IO_check_spot(base_position, temp_position, self.constants, "none")
+                IO_status = IO_check_spot(base_position, temp_position, self.constants, IOStatus.NONE)
                 vertex_point = None
             local_stick = self.constants['initial_stick_status']
             if IO_status in [IOStatus.TEMP_ON_SURFACE, IOStatus.TEMP_ON_EDGE]:
@@ -1128,7 +1128,7 @@ class SpermSimulation:
             elif shape == "spot":
                 prev_stat = self.prev_IO_status[j]
                 if prev_stat is None:
-                    prev_stat = "none"
+                    prev_stat = IOStatus.NONE
                 new_IO_status = IO_check_spot(base_position, temp_position, constants, prev_stat)
                 vertex_point = None
                 if new_IO_status == IOStatus.BORDER:
@@ -1141,7 +1141,7 @@ class SpermSimulation:
                     if new_IO_status == IOStatus.BORDER:
                         sys.exit("rethink logic 3")
             else:
-                new_IO_status = "inside"
+                new_IO_status = IOStatus.INSIDE
                 vertex_point = None
             prev_stat = self.prev_IO_status[j]
             if prev_stat in [IOStatus.TEMP_ON_EDGE, IOStatus.TEMP_ON_SURFACE] and (stick_status > 0):
@@ -2285,7 +2285,7 @@ def main():
     make_movie        = 'yes' if 'movie' in selected_data.get('outputs', []) else 'no'
 
     # 乱数シード
-    if seed_number and seed_number.lower() != IOStatus.NONE:
+    if seed_number and seed_number.lower() != "none":
         np.random.seed(int(seed_number))
 
     # ============================================================
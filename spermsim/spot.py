@@ -0,0 +1,75 @@
+"""spot.py  –  球冠（spot）形状の寸法
+体積 V [μl] と角度 θ [deg] から球半径 R・底面の高さ・底面の半径を求める。
+球冠の体積 V = π h² (3R - h) / 3, h = R (1 - cos θ) を R について整理すると
+
+    V = π R³ (1 - cos θ)² (2 + cos θ) / 3
+
+なので R は 3 乗根で閉じた形に解ける（旧実装は scipy.optimize.fsolve で反復）。
+結果は (volume, spot_angle) ごとに LRU でキャッシュする。sweep の格子が
+分かっていれば preload で先に表を作っておける。
+
+    sp = solve_spot(6.25, 60)           # SpotGeometry(R, bottom_height, bottom_R)
+    constants.update(sp.as_constants())
+    preload(VOLUMES, SPOT_ANGLES)       # GUI の選択肢を前計算（任意）
+"""
+
+from __future__ import annotations
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable
+
+# GUI の選択肢（main.show_selection_ui / load_previous_selection の既定値）
+VOLUMES = (6.25, 12.5, 25, 50, 100, 200, 400, 800, 1600, 3200)
+SPOT_ANGLES = (30, 50, 60, 70, 90)
+
+
+@dataclass(frozen=True, slots=True)
+class SpotGeometry:
+    R: float                # 球半径 (spot_R, radius)
+    bottom_height: float    # 底面の z (spot_bottom_height, z_min)
+    bottom_R: float         # 底面の半径 (spot_bottom_R)
+
+    def as_constants(self) -> Dict[str, float]:
+        """compute_spot_parameters が constants に書き込むキー"""
+        return {
+            'spot_R': self.R,
+            'radius': self.R,
+            'spot_bottom_height': self.bottom_height,
+            'spot_bottom_R': self.bottom_R,
+            'z_min': self.bottom_height,
+            'z_max': self.R,
+        }
+
+
+def cap_radius(volume: float, spot_angle: float) -> float:
+    """体積 volume・角度 spot_angle [deg] の球冠の球半径"""
+    if not 0 < spot_angle <= 180:
+        raise ValueError(f"spot_angle must be in (0, 180] deg, got {spot_angle}")
+    if volume <= 0:
+        raise ValueError(f"volume must be positive, got {volume}")
+    c = math.cos(math.radians(spot_angle))
+    return (3 * volume / (math.pi * (1 - c) ** 2 * (2 + c))) ** (1 / 3)
+
+
+@lru_cache(maxsize=256)
+def _solve(volume: float, spot_angle: float) -> SpotGeometry:
+    R = cap_radius(volume, spot_angle)
+    a = math.radians(spot_angle)
+    return SpotGeometry(R, R * math.cos(a), R * math.sin(a))
+
+
+def solve_spot(volume: float, spot_angle: float) -> SpotGeometry:
+    """(volume, spot_angle) の球冠寸法。60 と 60.0 は同じキャッシュを引く"""
+    return _solve(float(volume), float(spot_angle))
+
+
+def preload(volumes: Iterable[float] = VOLUMES,
+            angles: Iterable[float] = SPOT_ANGLES) -> Dict[tuple, SpotGeometry]:
+    """volumes × angles をまとめて解いてキャッシュに載せ、表として返す"""
+    angles = tuple(angles)
+    return {(float(v), float(a)): solve_spot(v, a) for v in volumes for a in angles}
+
+
+cache_info = _solve.cache_info
+cache_clear = _solve.cache_clear
@@ -0,0 +1,50 @@
+import sqlite3
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _tmp_results_db(tmp_path, monkeypatch):
+    """writer なしの simulate() が既定の results.db（リポジトリ直下）を汚さないように"""
+    monkeypatch.setattr("core.db.DB_PATH", tmp_path / "results.db")
+
+
+# 旧 spermsim/data/Trajectory.db のうち import_trajectory_db / export が読む表だけ
+_TRAJECTORY_DDL = """
+CREATE TABLE basic_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, exp_id TEXT, version TEXT, shape TEXT,
+    volume REAL, sperm_conc INTEGER, N_contact INTEGER, VSL REAL, stick_sec INTEGER,
+    sim_min REAL, deviation REAL, egg_localization TEXT, image_id TEXT, mov_id TEXT,
+    spot_angle INTEGER, sampl_rate_Hz INTEGER, seed_number TEXT
+);
+CREATE TABLE intersection (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, simulation_id INTEGER, sperm_index INTEGER,
+    start_step INTEGER, egg_index INTEGER DEFAULT 0
+);
+"""
+
+
+@pytest.fixture
+def trajectory_db(tmp_path):
+    """
+    旧形式の DB を tmp_path/t.db に作る関数を返す。
+    runs = [(constants, exp_id, mov_id, [(sperm, start_step, egg), ...]), ...]
+    → (path, [simulation_id, ...])
+    """
+    def make(runs):
+        path = tmp_path / "t.db"
+        conn = sqlite3.connect(path)
+        conn.executescript(_TRAJECTORY_DDL)
+        sids = []
+        for constants, exp_id, mov_id, events in runs:
+            row = dict(constants, exp_id=exp_id, version="v", mov_id=mov_id,
+                       N_contact=len(events))
+            if "seed_number" in row:
+                row["seed_number"] = str(row["seed_number"])
+            sid = conn.execute(f"INSERT INTO basic_data ({', '.join(row)}) "
+                               f"VALUES ({', '.join('?' * len(row))})", list(row.values())).lastrowid
+            conn.executemany("INSERT INTO intersection (simulation_id, sperm_index, start_step, "
+                             "egg_index) VALUES (?, ?, ?, ?)", [(sid, *e) for e in events])
+            sids.append(sid)
+        conn.commit(); conn.close()
+        return path, sids
+    return make
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from core.simulation import SpermSimulation, _Collector
+from core.geometry import resolve_step, resolve_step_batch
+
+C = {'step_length':0.03,'radius':0.1,'R':0.1,'drop_angle':np.pi/4,
+     'R_spot':0.08,'theta_spot':np.pi/6}
+
+@pytest.mark.parametrize('shape', ['cube', 'drop', 'spot'])
+def test_batch_step_len(shape):
+    c = dict(C, shape=shape, n_simulation=30, number_of_sperm=20, engine='batch')
+    sim = SpermSimulation(c, writer=_Collector()); sim.simulate()
+    assert sim.trajectory.shape == (20, 30, 3)
+    diffs = np.linalg.norm(np.diff(sim.traj, axis=1), axis=2)
+    assert np.allclose(diffs, c['step_length'], atol=1e-6)
+
+@pytest.mark.parametrize('shape', ['cube', 'drop', 'spot'])
+def test_resolve_batch_matches_scalar(shape):
+    c = dict(C, shape=shape)
+    rng = np.random.default_rng(0)
+    P = rng.uniform(-0.1, 0.1, (200, 3)); P[:, 2] = np.abs(P[:, 2])
+    V = rng.normal(size=(200, 3)); V *= c['step_length'] / np.linalg.norm(V, axis=1)[:, None]
+    got = resolve_step_batch(P, V, c)
+    want = np.array([resolve_step(p, v, c) for p, v in zip(P, V)])
+    assert np.allclose(got, want)
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        SpermSimulation(dict(C, shape='cube'), engine='gpu')
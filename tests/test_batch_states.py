@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from io_status import IOStatus
+from spermsim.geometry import create_shape, classify_cube
+from spermsim import batch as B
+
+CUBE = {'x_min':-1,'x_max':1,'y_min':-1,'y_max':1,'z_min':-1,'z_max':1,'limit':1e-10}
+SPOT = {'spot_R':1.0,'spot_bottom_height':np.cos(np.pi/3),'spot_bottom_R':np.sin(np.pi/3),
+        'spot_angle':60,'limit':1e-10}
+
+def _points(n=3000, seed=0):
+    """一様点 + 面・辺・頂点上に丸めた点"""
+    rng = np.random.default_rng(seed)
+    P = rng.uniform(-1.3, 1.3, (n, 3))
+    snap = rng.random((n, 3)) < 0.3
+    P[snap] = np.sign(P[snap])
+    return P
+
+def test_classify_cube_matches_io_check():
+    s = create_shape('cube', CUBE)
+    P = _points()
+    codes, vertex = s.classify(P)
+    for p, k, v in zip(P, codes, vertex):
+        st, vtx = s.io_check(p)
+        assert B.STATUSES[k] == st
+        if st == IOStatus.VERTEX_OUT:
+            assert np.array_equal(v, vtx)
+
+def test_classify_cube_accepts_plain_limits():
+    P = _points(200, seed=3)
+    codes, vertex = classify_cube(P, (-1, -1, -1), (1, 1, 1), 1e-10)
+    c2, v2 = create_shape('ceros', {f'ceros_{a}_{m}': (-1 if m == 'min' else 1)
+                                    for a in 'xyz' for m in ('min', 'max')}).classify(P)
+    assert codes.dtype == np.int8 and np.array_equal(codes, c2) and np.array_equal(vertex, v2)
+
+def test_classify_drop_and_spot_match_io_check():
+    d = create_shape('drop', {'drop_R':1.0})
+    s = create_shape('spot', SPOT)
+    rng = np.random.default_rng(1)
+    P = _points(seed=2)
+    P[::4, 2] = SPOT['spot_bottom_height']                 # 底面上の点も混ぜる
+    stick = rng.integers(0, 2, len(P))
+    base = rng.uniform(-0.5, 0.5, (len(P), 3)); base[:, 2] = 0.7
+    prev = rng.choice([B.CODE[IOStatus.NONE], B.CODE[IOStatus.POLYGON_MODE]], len(P))
+    dc = B.classify_drop(d, P, stick)
+    sc = B.classify_spot(s, P, base, prev)
+    for k in range(len(P)):
+        assert B.STATUSES[dc[k]] == d.io_check(P[k], stick_status=stick[k])[0]
+        assert B.STATUSES[sc[k]] == s.io_check(P[k], base[k], prev_status=B.STATUSES[prev[k]])[0]
+
+def test_bottom_edge_mode_stays_on_floor():
+    z, R = SPOT['spot_bottom_height'], SPOT['spot_bottom_R']
+    ang = np.linspace(0, 2*np.pi, 16, endpoint=False)
+    base = np.stack([0.95*R*np.cos(ang), 0.95*R*np.sin(ang), np.full(16, z)], axis=1)
+    lv = np.stack([np.cos(ang + 0.2), np.sin(ang + 0.2), np.zeros(16)], axis=1) * 0.1
+    gens = [np.random.default_rng(k) for k in range(16)]
+    temp, new_lv, stick = B.bottom_edge_mode(base, lv, np.full(16, 3), gens,
+                                             z, R, 2*np.pi/70, 1e-10)
+    assert np.allclose(temp[:, 2], z) and (stick == 2).all()
+    assert (np.hypot(temp[:, 0], temp[:, 1]) <= R + 1e-9).all()
+
+def test_tables_are_disjoint():
+    assert not (B.ADVANCES & B.NEEDS_BEND).any()
+    assert not B.ADVANCES[B.CODE[IOStatus.POLYGON_MODE]]
+
+def _run_main(shape, volume, seed, engine):
+    from spermsim.main import SpermSimulation, build_constants
+    c = build_constants({'sim_min': 1, 'gamete_r': 0.3, 'engine': engine}, shape, volume, 3162)
+    c.update(seed_number=seed, run_progress='no')
+    sim = SpermSimulation(c, None, None)
+    sim.simulate()
+    return sim
+
+@pytest.mark.parametrize('volume', [6.25, 25])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('shape', ['cube', 'drop', 'spot', 'ceros'])
+def test_batch_engine_matches_loop(shape, seed, volume):
+    loop = _run_main(shape, volume, seed, 'loop')
+    batch = _run_main(shape, volume, seed, 'batch')
+    assert np.array_equal(loop.merge_contact_events(), batch.merge_contact_events())
+    assert np.array_equal(loop.trajectory, batch.trajectory)
@@ -0,0 +1,42 @@
+import math
+import numpy as np
+import pytest
+from spermsim.cone import (ndtri, ndtri1, sample_cone_angles, cone_vectors,
+                           cone_vector, draw_uniforms)
+
+C = {'deviation': 0.4, 'limit': 1e-10, 'step_length': 0.01}
+
+def test_ndtri_known_values():
+    p = np.array([0.001, 0.02, 0.5, 0.8, 0.975, 0.999999])
+    ref = [-3.090232306, -2.053748911, 0.0, 0.841621234, 1.959963985, 4.753424309]
+    assert np.allclose(ndtri(p), ref, atol=1e-8)
+    assert all(abs(ndtri1(q) - r) < 1e-8 for q, r in zip(p, ref))
+
+def test_angles_truncated_half_normal():
+    U = np.random.default_rng(0).random((100_000, 2))
+    th, ph = sample_cone_angles(U, 0.4, 1e-10).T
+    assert (th > 0).all() and (th < math.pi).all()
+    assert (ph >= -math.pi).all() and (ph < math.pi).all()
+    assert abs(th.mean() - 0.4 * math.sqrt(2 / math.pi)) < 3e-3
+
+def test_scalar_and_batched_agree():
+    rng = np.random.default_rng(1)
+    V = rng.normal(size=(50, 3)); V /= np.linalg.norm(V, axis=1, keepdims=True)
+    W = rng.normal(size=(50, 3))
+    W -= np.einsum('ij,ij->i', W, V)[:, None] * V          # inward ⟂ v
+    proj = rng.random(50) < 0.5
+    U = rng.random((50, 2))
+    D = cone_vectors(V, U, C, W, proj)
+    for k in range(50):
+        assert np.allclose(cone_vector(V[k], U[k], C, W[k], proj[k]), D[k], atol=1e-15)
+    assert np.allclose(np.linalg.norm(D, axis=1), C['step_length'])
+    Wn = W / np.linalg.norm(W, axis=1, keepdims=True)
+    assert np.allclose(np.einsum('ij,ij->i', D[proj], Wn[proj]), 0, atol=1e-15)
+    with pytest.raises(ValueError):
+        cone_vector(V[0], U[0], C, V[0])
+
+def test_fixed_draws_per_vector():
+    gens = [np.random.default_rng(k) for k in range(3)]
+    U = draw_uniforms(gens)
+    assert U.shape == (3, 2)
+    assert np.array_equal(U[2], np.random.default_rng(2).random(2))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from core.storage import MemoryStorage
+from core.sweep import make_jobs
+from spermsim.contacts import SPERM, START, EGG
+from spermsim.main import SpermSimulation, build_constants, run_contact_only_job
+
+SEL = {'sim_min': 2, 'gamete_r': 0.3}
+EGGS = '[(0,0,0), (0.5,0,0.3), (-0.4,0.2,-0.5)]'         # spot は既定の bottom_center 1 個
+
+def _sim(shape, engine, contact_only, on_contact=None, seed=3):
+    sel = dict(SEL, engine=engine, contact_only=contact_only,
+               egg_positions=None if shape == 'spot' else EGGS)
+    c = build_constants(sel, shape, 6.25, 3162)
+    c.update(seed_number=seed, run_progress='no')
+    sim = SpermSimulation(c, None, None, on_contact=on_contact)
+    sim.simulate()
+    return sim
+
+@pytest.mark.parametrize('engine', ['loop', 'batch'])
+@pytest.mark.parametrize('shape', ['cube', 'drop', 'spot'])
+def test_contact_only_matches_full_mode(shape, engine):
+    full = _sim(shape, engine, 'no')
+    events = []
+    light = _sim(shape, engine, 'yes', on_contact=lambda *ev: events.append(list(ev)))
+    assert light.trajectory is None and light.vec_hit is None
+    merged = full.merge_contact_events()
+    assert len(merged) and np.array_equal(light.merge_contact_events(), merged)
+    # on_contact は連続接触 (精子, 卵子) の開始ごとにちょうど 1 回
+    assert sorted(events) == merged[:, [SPERM, START, EGG]].tolist()
+    # contact_only の log は接触ステップではなく連続接触の数だけ持つ
+    assert len(light.contacts) == len(merged) < len(full.contacts)
+
+def test_contact_only_job_writes_contacts():
+    job, = make_jobs(['spot'], [6.25], [3162], 1, root_seed=3)
+    want = _sim('spot', 'loop', 'no', seed=job.seed).merge_contact_events()
+    with MemoryStorage() as st:
+        run_id, merged = run_contact_only_job(st, "e", "v", job, dict(SEL, contact_only='yes'))
+        assert len(want) and np.array_equal(merged, want)
+        assert st.query("SELECT contact_count FROM summary WHERE run_id=?", (run_id,)) == [(len(want),)]
+        assert st.query("SELECT sperm_idx, step, egg_index FROM contacts WHERE run_id=? "
+                        "ORDER BY sperm_idx, step, egg_index", (run_id,)) == \
+            [tuple(r) for r in want[:, [SPERM, START, EGG]].tolist()]
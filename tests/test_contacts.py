@@ -0,0 +1,50 @@
+import numpy as np
+from spermsim.contacts import ContactLog, RunLog, merge_runs, start_events, DURATION
+
+def _reference(events):
+    """旧 merge_contact_events（(精子, 卵子) ごとに走査）に終了ステップを足したもの"""
+    runs = []
+    for s, e in sorted({(s, e) for s, _, e in events}):
+        steps = sorted(t for s2, t, e2 in events if (s2, e2) == (s, e))
+        start = end = steps[0]
+        for t in steps[1:]:
+            if t != end + 1:
+                runs.append((s, start, end, end - start + 1, e)); start = t
+            end = t
+        runs.append((s, start, end, end - start + 1, e))
+    return sorted(runs, key=lambda r: (r[0], r[1], r[4]))
+
+def test_merge_matches_reference():
+    rng = np.random.default_rng(0)
+    steps = np.unique(rng.integers(0, 60, (400, 3)) * [1, 1, 0] + rng.integers(0, 2, (400, 1)) * [0, 0, 1],
+                      axis=0)
+    events = [tuple(r) for r in rng.permutation(steps).tolist()]
+    runs = merge_runs(events)
+    assert runs.dtype == np.int32
+    assert [tuple(r) for r in runs.tolist()] == _reference(events)
+    assert runs[:, DURATION].sum() == len(events)
+
+def test_log_append_extend_and_empty():
+    log = ContactLog()
+    assert merge_runs(log.array).shape == (0, 5)
+    for i in (3, 4, 5, 9):
+        log.append(2, i, 0)
+    log.extend(np.array([0, 0, 1]), np.array([7, 8, 8]), np.array([1, 1, 0]))
+    assert len(log) == 7 and log.array.dtype == np.int32
+    runs = merge_runs(log.array)
+    assert runs.tolist() == [[0, 7, 8, 2, 1], [1, 8, 8, 1, 0], [2, 3, 5, 3, 0], [2, 9, 9, 1, 0]]
+    assert start_events(runs) == [[0, 7, 1], [1, 8, 0], [2, 3, 0], [2, 9, 0]]
+    assert start_events([(1, 2, 0)]) == [(1, 2, 0)]
+
+def test_run_log_matches_merge_runs():
+    rng = np.random.default_rng(1)
+    events = sorted(map(tuple, (rng.integers(0, [5, 80, 2], (600, 3))).tolist()),
+                    key=lambda r: r[1])                  # ステップ順（重複あり）
+    full, log = ContactLog(), RunLog()
+    for ev in events[:300]:
+        full.append(*ev); log.append(*ev)
+    rest = np.array(events[300:])
+    full.extend(*rest.T); log.extend(*rest.T)
+    assert np.array_equal(log.runs(), full.runs()) and log.runs().dtype == np.int32
+    assert len(log) == len(full.runs()) < len(full)
+    assert RunLog().runs().shape == (0, 5)
@@ -0,0 +1,100 @@
+import json
+import queue
+import sqlite3
+from core.db import ResultWriter, save_run_meta, save_summary
+from core.simulation import SpermSimulation
+
+C = {'shape':'cube','radius':0.1,'step_length':0.03,'n_simulation':20,
+     'number_of_sperm':5,'seed_number':1}
+
+def _count(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def test_writer_batches_runs(tmp_path):
+    db = tmp_path / "r.db"
+    with ResultWriter(db, commit_every=3) as w:
+        ids = [w.add_run(dict(C), [(0, 1, 4.0, 0., 0., 0.)] * 2) for _ in range(7)]
+    assert ids == list(range(1, 8))
+    assert _count(db, "runs") == 7 and _count(db, "summary") == 7
+    assert _count(db, "contacts") == 14
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_writer_matches_helpers(tmp_path, monkeypatch):
+    db = tmp_path / "r.db"
+    with ResultWriter(db) as w:
+        sim = SpermSimulation(dict(C), writer=w); sim.simulate()
+    monkeypatch.setattr("core.db.DB_PATH", tmp_path / "h.db")
+    rid = save_run_meta(dict(C)); save_summary(rid, 3)
+    assert _count(tmp_path / "h.db", "summary") == 1
+    assert _count(db, "runs") == 1
+
+def test_serve_queue(tmp_path):
+    q = queue.Queue()
+    for _ in range(4):
+        q.put(("run", dict(C), [(1, 2, 8.0, 0., 0., 0.)]))
+    q.put(("figure", 1, "hist", "hist_run1.png"))
+    q.put(None)
+    with ResultWriter(tmp_path / "r.db") as w:
+        assert w.serve(q) == 5
+    assert _count(tmp_path / "r.db", "contacts") == 4
+    assert _count(tmp_path / "r.db", "figures") == 1
+
+def test_migrate_existing_db(tmp_path):
+    from core.db import DDL, SCHEMA_VERSION, migrate
+    db = tmp_path / "old.db"
+    with sqlite3.connect(db) as conn:                  # 版管理前の DB
+        for ddl in DDL.values(): conn.execute(ddl)
+        conn.execute("INSERT INTO runs(shape,params,created) VALUES(?,?,?)",
+                     ("drop", '{"volume":6.0,"sperm_conc":"1000"}', "x"))
+    conn = sqlite3.connect(db)
+    assert migrate(conn) == 0
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT volume, sperm_conc, deviation FROM runs").fetchone() == (6.0, 1000, None)
+    plan = " ".join(r[-1] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT time_s FROM contacts WHERE run_id=1"))
+    assert "idx_contacts_run" in plan
+    assert migrate(conn) == SCHEMA_VERSION             # 2 回目は何もしない
+
+M = dict(shape="cube", volume=6.25, sperm_conc=3162, VSL=0.13, stick_sec=2, sim_min=10.0,
+         deviation=0.4, egg_localization="bottom_center", spot_angle=60, sampl_rate_Hz=2)
+
+def _runs(w, exp_id, counts, **kw):
+    return [w.add_run(dict(M, **kw), [(0, 1, .5, 0., 0., 0.)] * n, exp_id=exp_id) for n in counts]
+
+def test_aggregate_touches_only_exp_keys(tmp_path):
+    with ResultWriter(tmp_path / "r.db") as w:
+        _runs(w, "old", (1, 3)); _runs(w, "old", (5,), sperm_conc=1000)
+        assert w.aggregate("old") == 2
+        _runs(w, "new", (5,))
+        assert w.aggregate("new") == 1                  # sperm_conc=1000 の key は触らない
+        assert w.aggregate("new") == 1                  # 再実行しても行は増えない
+        # ratio = 接触数 / 10 min * 60 → 6, 18, 30
+        assert w.query("SELECT sperm_conc, mean_contact_hr, SD1, total_simulations "
+                       "FROM group_summary ORDER BY sperm_conc") == \
+            [(1000, 30.0, 0.0, 1), (3162, 18.0, 9.8, 3)]
+
+def test_group_stats_follow_update_and_delete(tmp_path):
+    with ResultWriter(tmp_path / "r.db", commit_every=1) as w:
+        rids = _runs(w, "e", (2, 4))
+        w.set_contact_count(rids[0], 6)                 # commit 済み → UPDATE トリガ
+        w.conn.execute("DELETE FROM summary WHERE run_id=?", (rids[1],))
+        assert w.query("SELECT n, sum_ratio FROM group_stats") == [(1, 36.0)]
+
+def test_group_stats_backfilled_on_migrate(tmp_path):
+    from core.db import MIGRATIONS, migrate
+    db = tmp_path / "v3.db"
+    with sqlite3.connect(db) as conn:                  # group_stats 導入前の DB
+        for v in range(1, 4):
+            conn.executescript(";\n".join(MIGRATIONS[v]))
+        conn.execute("PRAGMA user_version=3")
+        for rid, n in ((1, 2), (2, 4)):
+            conn.execute("INSERT INTO runs(run_id,shape,params,created) VALUES(?,?,?,?)",
+                         (rid, "cube", json.dumps(M), "x"))
+            conn.execute("INSERT INTO summary(run_id,contact_count) VALUES(?,?)", (rid, n))
+    conn = sqlite3.connect(db)
+    assert migrate(conn) == 3
+    assert conn.execute("SELECT n, sum_ratio, latest_run_id FROM group_stats").fetchall() == \
+        [(2, 36.0, 2)]
+    conn.close()
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from spermsim.eggs import EggIndex, parse_egg_positions
+from spermsim.intersect import segment_meets_sphere
+
+def _brute(E, R, P0, P1):
+    return [(k, e) for k in range(len(P0)) for e in range(len(E))
+            if segment_meets_sphere(P0[k], P1[k], E[e], R)]
+
+def _segments(n, step, seed):
+    rng = np.random.default_rng(seed)
+    P0 = rng.uniform(-1, 1, (n, 3))
+    D = rng.normal(size=(n, 3)); D *= step / np.linalg.norm(D, axis=1)[:, None]
+    return P0, P0 + D
+
+def test_parse_egg_positions(tmp_path):
+    assert parse_egg_positions(None) is None and parse_egg_positions(" none ") is None
+    assert parse_egg_positions("[(0, 0, 1), (1, 2, 3)]").shape == (2, 3)
+    f = tmp_path / "eggs.csv"
+    f.write_text("0,0,0\n0.5,0.5,0.5\n")
+    assert np.allclose(parse_egg_positions(str(f)), [[0, 0, 0], [0.5, 0.5, 0.5]])
+    assert parse_egg_positions([1, 2, 3]).shape == (1, 3)
+
+@pytest.mark.parametrize('m', [0, 1, 5, 300])
+def test_query_and_hits_match_brute_force(m):
+    R, step = 0.05, 0.04
+    E = np.random.default_rng(1).uniform(-1, 1, (m, 3))
+    idx = EggIndex(E, R, step)
+    P0, P1 = _segments(3000, step, seed=2)
+    want = _brute(E, R, P0, P1)
+    seg, egg = idx.query(P0, P1)
+    assert list(zip(seg.tolist(), egg.tolist())) == want
+    got = [(k, int(e)) for k in range(len(P0)) for e in idx.hits(P0[k], P1[k])]
+    assert got == want
+    if m > 1:
+        assert want                                         # 実際に当たりがある
+
+def test_long_segments_fall_back_to_brute_force():
+    R = 0.05
+    E = np.random.default_rng(3).uniform(-1, 1, (50, 3))
+    idx = EggIndex(E, R, reach=0.01)
+    P0, P1 = _segments(500, 0.5, seed=4)                    # reach より長い
+    want = _brute(E, R, P0, P1)
+    seg, egg = idx.query(P0, P1)
+    assert want and list(zip(seg.tolist(), egg.tolist())) == want
+    assert [(k, int(e)) for k in range(500) for e in idx.hits(P0[k], P1[k])] == want
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from core.db import ResultWriter
+from core.export import export
+
+def _results_db(path):
+    with ResultWriter(path) as w:
+        for shape, n in (("cube", 3), ("drop", 1)):
+            for _ in range(2):
+                w.add_run({"shape": shape, "volume": 6.25, "sperm_conc": 1000},
+                          [(j, j + 1, 0.5 * j, 0., 0., 0.) for j in range(n)])
+    return path
+
+def test_npz_partitions_and_chunks(tmp_path):
+    db = _results_db(tmp_path / "r.db")
+    counts = export(db, tmp_path / "out", "npz", chunk_rows=4)
+    assert counts == {"runs": 4, "summary": 4, "contacts": 8, "group_summary": 0}
+    parts = sorted((tmp_path / "out" / "contacts" / "shape=cube" / "exp_id=__null__").glob("*.npz"))
+    assert len(parts) == 2                              # 6 行 / chunk 4
+    d = np.load(parts[0])
+    assert d["sperm_idx"].dtype == np.int32 and d["time_s"].dtype == np.float64
+    runs = np.load(tmp_path / "out" / "runs" / "shape=drop" / "exp_id=__null__" / "part-00000.npz")
+    assert runs["volume"].tolist() == [6.25, 6.25] and runs["sperm_conc"].dtype == np.int64
+
+def test_trajectory_db_and_trajectories(tmp_path, trajectory_db):
+    c = dict(shape="cube", volume=6.25, sperm_conc=3162, VSL=0.13, stick_sec=2, sim_min=1.0,
+             deviation=0.4, egg_localization="bottom_center", spot_angle=60, sampl_rate_Hz=2)
+    db, (sid,) = trajectory_db([(c, "exp 1", None, [(0, 3, 0), (1, 5, 1)])])
+    traj = np.arange(2 * 5 * 3, dtype=np.float32).reshape(2, 5, 3)
+    np.save(tmp_path / "traj.npy", traj)
+    counts = export(db, tmp_path / "out", tables=["intersection"],
+                    trajectories={sid: tmp_path / "traj.npy"})
+    assert counts == {"intersection": 2, "trajectories": 10}
+    d = np.load(tmp_path / "out" / "intersection" / "shape=cube" / "exp_id=exp_1" / "part-00000.npz")
+    assert d["egg_index"].tolist() == [0, 1]
+    t = np.load(tmp_path / "out" / "trajectories" / f"run_id={sid}" / "part-00000.npz")
+    assert t["sperm"].tolist() == [0] * 5 + [1] * 5
+    assert np.array_equal(np.stack([t["x"], t["y"], t["z"]], 1), traj.reshape(-1, 3))
+
+def test_parquet_roundtrip(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db = _results_db(tmp_path / "r.db")
+    export(db, tmp_path / "out", "parquet", tables=["contacts"], chunk_rows=2)
+    f = pq.ParquetFile(tmp_path / "out" / "contacts" / "shape=cube" / "exp_id=__null__" / "part-00000.parquet")
+    assert f.metadata.num_rows == 6 and f.metadata.num_row_groups == 3
+    assert str(f.schema_arrow.field("step").type) == "int32"
+
+def test_unknown_table(tmp_path):
+    with pytest.raises(ValueError):
+        export(_results_db(tmp_path / "r.db"), tmp_path / "out", tables=["basic_data"])
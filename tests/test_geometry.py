@@ -26,3 +26,19 @@ def test_random_point_inside_drop():
     p = random_point_cap(c['R'], c['drop_angle'])
     assert IO_check_drop(np.zeros(3), p, c) != IOStatus.OUTSIDE
 
+
+def test_sample_cap_uniform():
+    from core.geometry import sample_cap
+    R, z0 = 1.0, np.cos(np.radians(20))
+    P = sample_cap(200000, R, z0)
+    assert np.all(P[:, 2] >= z0 - 1e-12)
+    assert np.all(np.einsum('ij,ij->i', P, P) <= R*R + 1e-12)
+    # 球冠内一様なら E[z] = ∫z(R²-z²)dz / ∫(R²-z²)dz
+    G = lambda z: R*R*z - z**3/3
+    H = lambda z: R*R*z*z/2 - z**4/4
+    assert np.isclose(P[:, 2].mean(), (H(R)-H(z0)) / (G(R)-G(z0)), atol=2e-4)
+
+def test_sample_ball_radius():
+    from core.geometry import sample_ball
+    r = np.linalg.norm(sample_ball(200000, 2.0), axis=1)
+    assert r.max() <= 2.0 and np.isclose(np.median(r), 2.0 * 0.5**(1/3), atol=5e-3)
@@ -0,0 +1,25 @@
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+def _python(*args, cwd=ROOT):
+    return subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True, text=True)
+
+def test_engine_import_is_numpy_only(tmp_path):
+    code = ("import os, sys; sys.path.insert(0, %r); import spermsim.main; "
+            "print(os.getcwd()); "
+            "print([m for m in ('tkinter', 'matplotlib', 'pandas', 'scipy', 'tqdm') "
+            "if m in sys.modules])" % str(ROOT))
+    r = _python("-c", code, cwd=tmp_path)
+    assert r.returncode == 0, r.stderr
+    cwd, heavy = r.stdout.splitlines()[-2:]
+    assert heavy == "[]"
+    assert pathlib.Path(cwd) == tmp_path                    # import で chdir しない
+    assert list(tmp_path.iterdir()) == []                   # data/ も作らない
+
+def test_module_entry_point_parses_args():
+    r = _python("-m", "spermsim", "--no-gui", "--help")
+    assert r.returncode == 0, r.stderr
+    assert "--no-gui" in r.stdout
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from spermsim.intersect import (segment_meets_sphere, ray_sphere_exit,
+                                segment_circle, align_to_z)
+
+def test_segment_meets_sphere_rows_and_scalar():
+    c = np.array([1.0, 0.0, 0.0])
+    P0 = np.array([[0, 0, 0], [0, 0, 0], [1, 0, 0], [0, 0.5, 0]], float)
+    P1 = np.array([[2, 0, 0], [0, 1, 0], [1, 0.1, 0], [2, 0.5, 0]], float)
+    hit = segment_meets_sphere(P0, P1, c, 0.3)
+    assert hit.tolist() == [True, False, True, False]       # 貫通 / 外 / 内部 / 素通り
+    for k in range(4):
+        assert bool(segment_meets_sphere(P0[k], P1[k], c, 0.3)) == hit[k]
+
+def test_ray_sphere_exit_on_unit_sphere():
+    rng = np.random.default_rng(0)
+    P = rng.uniform(-0.5, 0.5, (100, 3))
+    D = rng.normal(size=(100, 3)); D /= np.linalg.norm(D, axis=1, keepdims=True)
+    t, pt, n, disc = ray_sphere_exit(P, D, 1.0, 1e-10)
+    assert (t > 0).all() and (disc > 0).all()
+    assert np.allclose(np.linalg.norm(pt, axis=1), 1.0)
+    assert np.allclose(n, pt)
+    t0, pt0, _, _ = ray_sphere_exit(P[0], D[0], 1.0, 1e-10)
+    assert np.isclose(t0, t[0]) and np.allclose(pt0, pt[0])
+
+def test_segment_circle_first_crossing():
+    p0 = np.array([[0.0, 0, 0.5], [0.0, 0, 0.5]])
+    p1 = np.array([[2.0, 0, 0.5], [0.5, 0, 0.5]])
+    t, x, y = segment_circle(p0, p1, 1.0)
+    assert np.allclose(t, [0.5, 0.0]) and np.allclose(x, [1.0, 0.0]) and np.allclose(y, 0)
+
+def test_align_to_z_matches_scipy():
+    Rot = pytest.importorskip("scipy.spatial.transform").Rotation
+    rng = np.random.default_rng(1)
+    A = rng.normal(size=(20, 3)); A[:, 2] = np.abs(A[:, 2])
+    A /= np.linalg.norm(A, axis=1, keepdims=True)
+    V = rng.normal(size=(20, 3))
+    got = align_to_z(A, V)
+    for k in range(20):
+        ref = Rot.align_vectors([[0, 0, 1]], [A[k]])[0].apply(V[k])
+        assert np.allclose(got[k], ref, atol=1e-12)
+    assert np.allclose(align_to_z(np.array([0.0, 0, 1]), V[0]), V[0])
+
+@pytest.mark.parametrize('axis', [(0, 0, 1), (0, 0, -1), (1, 0, 0), (0.3, -0.5, -0.8), None])
+def test_align_to_z_is_rotation(axis):
+    if axis is None:
+        A = np.random.default_rng(2).normal(size=(50, 3))
+    else:
+        A = np.array([axis], float)
+    A /= np.linalg.norm(A, axis=1, keepdims=True)
+    for a in A:
+        R = align_to_z(np.repeat(a[None], 3, axis=0), np.eye(3)).T     # 列 = 基底の像
+        assert np.allclose(R @ a, [0, 0, 1], atol=1e-12)
+        assert np.allclose(R @ R.T, np.eye(3), atol=1e-12)
+        assert np.isclose(np.linalg.det(R), 1.0)
+        assert np.allclose(align_to_z(a, a), [0, 0, 1], atol=1e-12)    # (3,) でも同じ
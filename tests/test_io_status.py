@@ -0,0 +1,18 @@
+import numpy as np
+from io_status import (IOStatus, STATUSES, ADVANCES, IS_BOUNDARY, NEEDS_BEND,
+                       CARRY_FROM, CARRY_OVER)
+
+def test_codes_are_dense_indices():
+    assert [int(s) for s in STATUSES] == list(range(len(STATUSES)))
+    assert STATUSES[np.int8(IOStatus.SPHERE_OUT)] is IOStatus.SPHERE_OUT
+    assert str(IOStatus.TEMP_ON_EDGE) == "temp_on_edge"
+
+def test_tables():
+    for t in (ADVANCES, IS_BOUNDARY, NEEDS_BEND, CARRY_FROM, CARRY_OVER):
+        assert t.dtype == bool and t.shape == (len(STATUSES),)
+    assert not (ADVANCES & NEEDS_BEND).any()
+    assert not (ADVANCES | NEEDS_BEND)[[IOStatus.BORDER, IOStatus.POLYGON_MODE]].any()
+    assert IS_BOUNDARY.sum() == 1 and IS_BOUNDARY[IOStatus.BORDER]
+    assert (CARRY_OVER[CARRY_FROM]).all()
+    codes = np.array([IOStatus.INSIDE, IOStatus.VERTEX_OUT], dtype=np.int8)
+    assert ADVANCES[codes].tolist() == [True, False]
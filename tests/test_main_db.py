@@ -0,0 +1,49 @@
+import sqlite3
+from core.db import ResultWriter
+from spermsim.main import contact_rows, store_run
+
+C = dict(shape="cube", volume=6.25, sperm_conc=3162, VSL=0.13, stick_sec=2, sim_min=10.0,
+         deviation=0.4, egg_localization="bottom_center", spot_angle=60,
+         sampl_rate_Hz=2.0, seed_number=0)
+
+def _count(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def test_store_run_batches_commits(tmp_path):
+    db = tmp_path / "r.db"
+    events = [[(0, 3, 0), (1, 7, 0)], [], [(2, 5, 1)]]
+    with ResultWriter(db, commit_every=2) as w:
+        rids = [store_run(w, "e", "v", C, "g.svg", "m.mp4", ev) for ev in events]
+        assert _count(db, "runs") == 2 and _count(db, "contacts") == 2    # 3 run 目は未 commit
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT run_id, sperm_idx, step, time_s, egg_index FROM contacts "
+                            "ORDER BY id").fetchall() == \
+            [(rids[0], 0, 3, 1.5, 0), (rids[0], 1, 7, 3.5, 0), (rids[2], 2, 5, 2.5, 1)]
+        assert conn.execute("SELECT contact_count FROM summary ORDER BY run_id").fetchall() == \
+            [(2,), (0,), (1,)]
+        assert conn.execute("SELECT exp_id, version, VSL, sampl_rate_Hz FROM runs").fetchone() == \
+            ("e", "v", 0.13, 2)
+    assert _count(db, "figures") == 6
+
+def test_streamed_contacts_and_count(tmp_path):
+    db = tmp_path / "r.db"
+    with ResultWriter(db, max_rows=2) as w:
+        rid = w.add_run(C, (), exp_id="e")
+        for k in range(5):
+            w.add_contacts(rid, contact_rows([(k, k + 1, 0)], C["sampl_rate_Hz"]))
+        w.set_contact_count(rid, 5)
+        assert w.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0] == 4  # max_rows ごと
+    assert _count(db, "contacts") == 5
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT contact_count FROM summary").fetchone() == (5,)
+
+def test_group_summary_is_typed_in_sql(tmp_path):
+    with ResultWriter(tmp_path / "r.db") as w:
+        for n in (2, 4):
+            store_run(w, "e", "v", C, None, None, [(j, j + 1, 0) for j in range(n)])
+        assert w.aggregate() == 1
+        assert w.aggregate() == 1                          # 作り直しても行は増えない
+        # ratio = 接触数 / 10 min * 60 → 12, 24
+        assert w.query("SELECT mean_contact_hr, SD1, N_sperm, typeof(N_sperm), total_simulations "
+                       "FROM group_summary") == [(18.0, 6.0, 19, "integer", 2)]
@@ -33,3 +33,13 @@ def test_spot_reflection():
         _chk(s, c['step_length'])
         st = IO_check_spot(s.trajectory[0,0], s.trajectory[0,1], c)
         assert st in ALLOW
+
+def test_resolve_all_matches_scalar():
+    from reflection.runner import resolve_all, _scenarios
+    from core.geometry import resolve_step
+    c = {'R_spot':0.1,'theta_spot':0.52,'step_length':0.02}
+    got = resolve_all('spot', c)
+    for name, p in _scenarios('spot', c):
+        want = resolve_step(np.array(p['start_position']),
+                            np.array(p['reflection_vector']), dict(c, shape='spot'))
+        assert np.allclose(got[name], want)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from core.rng import RunStreams, resolve_seed
+from core.simulation import SpermSimulation, _Collector
+
+def test_streams_independent_of_draw_order():
+    a = RunStreams(3, 5).uniforms(2, block=4)
+    b = RunStreams(3, 5).uniforms(2, block=4)
+    whole = np.stack([a.draw() for _ in range(10)])            # (10, 5, 2)
+    single = np.stack([np.stack([b.draw([i])[0] for i in reversed(range(5))][::-1])
+                       for _ in range(10)])
+    assert np.array_equal(whole, single)
+
+def test_run_index_and_seed():
+    assert RunStreams(1, 2).init.random() == RunStreams(1, 2).init.random()
+    assert RunStreams(1, 2).init.random() != RunStreams(1, 2, run_index=1).init.random()
+    assert resolve_seed('None') >= 0 and resolve_seed('7') == 7
+
+@pytest.mark.parametrize('shape', ['cube', 'drop', 'spot'])
+def test_engines_bit_identical(shape):
+    base = {'shape':shape,'step_length':0.03,'radius':0.1,'R':0.1,'drop_angle':np.pi/4,
+            'R_spot':0.08,'theta_spot':np.pi/6,'n_simulation':40,'number_of_sperm':7,
+            'seed_number':42}
+    trajs = []
+    for eng in ('loop', 'batch'):
+        sim = SpermSimulation(dict(base, engine=eng), writer=_Collector()); sim.simulate()
+        trajs.append(sim.traj)
+    assert np.array_equal(*trajs)
+
+def test_seed_recorded():
+    c = {'shape':'cube','radius':0.05,'step_length':0.02,'n_simulation':3,'number_of_sperm':1}
+    SpermSimulation(c)
+    assert isinstance(c['seed_number'], int)
+
+def test_vertex_bend_without_rng():
+    from spermsim.main import cut_and_bend_vertex
+    c = {'VSL': 0.13, 'sampl_rate_Hz': 2}
+    _, temp, _ = cut_and_bend_vertex(np.ones(3), np.array([0.5, 1.0, 1.0]), 0.6, c)  # rng=None
+    assert np.isclose(np.abs(temp - 1).sum(), 0.1) and np.count_nonzero(temp != 1) == 1
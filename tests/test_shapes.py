@@ -0,0 +1,46 @@
+import dataclasses
+import numpy as np
+import pytest
+from io_status import IOStatus
+from spermsim.geometry import create_shape
+
+CUBE = {'x_min':-1,'x_max':1,'y_min':-1,'y_max':1,'z_min':-1,'z_max':1,'limit':1e-10}
+SPOT = {'spot_R':1.0,'spot_bottom_height':np.cos(np.pi/3),'spot_bottom_R':np.sin(np.pi/3),
+        'spot_angle':60,'limit':1e-10}
+
+def test_cube_io_check():
+    s = create_shape('cube', CUBE)
+    assert s.io_check(np.zeros(3)) == (IOStatus.INSIDE, None)
+    assert s.io_check(np.array([1.0, 0, 0]))[0] == IOStatus.TEMP_ON_SURFACE
+    assert s.io_check(np.array([1.2, 0, 0]))[0] == IOStatus.SURFACE_OUT
+    st, v = s.io_check(np.array([1.0, -1.0, 1.3]))
+    assert st == IOStatus.VERTEX_OUT and np.allclose(v, [1, -1, 1])
+    assert np.allclose(s.first_hit_normal(np.zeros(3), np.array([1.5, 0.2, 0])), [1, 0, 0])
+
+def test_drop_and_spot():
+    d = create_shape('drop', {'drop_R':1.0})
+    assert d.io_check(np.array([0, 0, 1.5]))[0] == IOStatus.SPHERE_OUT
+    assert d.io_check(np.zeros(3), stick_status=1)[0] == IOStatus.TEMP_ON_POLYGON
+    s = create_shape('spot', SPOT)
+    assert s.get_limits()[4:] == (SPOT['spot_bottom_height'], 1.0)
+    base = np.array([0, 0, 0.6])
+    assert s.io_check(np.array([0, 0, 0.4]), base)[0] == IOStatus.BOTTOM_OUT
+    z = SPOT['spot_bottom_height']
+    assert s.io_check(np.array([0.1, 0, z]), base, prev_status=IOStatus.POLYGON_MODE)[0] == IOStatus.POLYGON_MODE
+
+@pytest.mark.parametrize('name,c', [('cube', CUBE), ('drop', {'drop_R':1.0}), ('spot', SPOT)])
+def test_initial_position_inside(name, c):
+    s = create_shape(name, c)
+    P = s.initial_position(500)
+    assert P.shape == (500, 3)
+    base = P + np.array([0, 0, 1e-3])
+    for p, b in zip(P, base):
+        assert s.io_check(p, b)[0] in (IOStatus.INSIDE, IOStatus.SPOT_BOTTOM)
+
+def test_shape_immutable():
+    s = create_shape('cube', CUBE)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        s.limit = 1.0
+    assert not hasattr(s, '__dict__')
+    with pytest.raises(ValueError):
+        create_shape('torus', {})
@@ -0,0 +1,43 @@
+import math
+import numpy as np
+import pytest
+from spermsim import spot
+
+def _cap_volume(R, angle_deg):
+    h = R * (1 - math.cos(math.radians(angle_deg)))
+    return math.pi * h**2 * (3*R - h) / 3
+
+@pytest.mark.parametrize('volume', [6.25, 100, 3200])
+@pytest.mark.parametrize('angle', [10, 30, 60, 90, 135, 180])
+def test_solve_spot_reproduces_volume(volume, angle):
+    sp = spot.solve_spot(volume, angle)
+    assert math.isclose(_cap_volume(sp.R, angle), volume, rel_tol=1e-12)
+    assert math.isclose(math.hypot(sp.bottom_height, sp.bottom_R), sp.R)
+
+def test_hemisphere_and_sphere():
+    assert math.isclose(spot.solve_spot(2*math.pi/3, 90).R, 1.0)
+    assert math.isclose(spot.solve_spot(4*math.pi/3, 180).R, 1.0)
+
+def test_matches_fsolve():
+    fsolve = pytest.importorskip("scipy.optimize").fsolve
+    for volume in spot.VOLUMES:
+        for angle in spot.SPOT_ANGLES:
+            a = np.deg2rad(angle)
+            eq = lambda R: np.pi*(R*(1 - np.cos(a)))**2*(3*R - R*(1 - np.cos(a)))/3 - volume
+            R0 = fsolve(eq, [(volume*3/(4*np.pi))**(1/3)])[0]
+            assert math.isclose(spot.solve_spot(volume, angle).R, R0, rel_tol=1e-9)
+
+def test_cache_and_preload():
+    spot.cache_clear()
+    table = spot.preload([6.25, 12.5], [50, 60])
+    assert len(table) == 4 and spot.cache_info().currsize == 4
+    assert spot.solve_spot(6.25, 60) is table[(6.25, 60.0)]
+    assert spot.cache_info().hits == 1
+    c = {'volume': 6.25}
+    c.update(table[(6.25, 60.0)].as_constants())
+    assert c['radius'] == c['spot_R'] == c['z_max'] and c['z_min'] == c['spot_bottom_height']
+
+@pytest.mark.parametrize('volume, angle', [(1.0, 0), (1.0, 190), (0.0, 60)])
+def test_invalid_inputs(volume, angle):
+    with pytest.raises(ValueError):
+        spot.solve_spot(volume, angle)
@@ -0,0 +1,48 @@
+import pytest
+from core.storage import MemoryStorage, SQLiteStorage, open_storage, import_trajectory_db
+from core.simulation import SpermSimulation
+from spermsim.main import store_run
+
+M = dict(shape="cube", volume=6.25, sperm_conc=3162, VSL=0.13, stick_sec=2, sim_min=10.0,
+         deviation=0.4, egg_localization="bottom_center", spot_angle=60,
+         sampl_rate_Hz=2.0, seed_number=0)
+
+def test_open_storage_picks_backend(tmp_path):
+    assert isinstance(open_storage(":memory:"), MemoryStorage)
+    assert type(open_storage(tmp_path / "r.db")) is SQLiteStorage
+
+@pytest.mark.parametrize("path", [":memory:", "file"])
+def test_both_engines_share_schema(tmp_path, path):
+    with open_storage(tmp_path / "r.db" if path == "file" else path) as st:
+        SpermSimulation({'shape': 'cube', 'radius': 0.1, 'step_length': 0.03,
+                         'n_simulation': 20, 'number_of_sperm': 5, 'seed_number': 1},
+                        writer=st).simulate()
+        for n in (2, 4):
+            rid = store_run(st, "e", "v", M, "g.svg", None, [(j, 2 * j + 1, j % 2) for j in range(n)])
+        assert st.aggregate("e") == 1
+        assert st.query("SELECT exp_id, VSL, sampl_rate_Hz FROM runs WHERE run_id=?",
+                        (rid,)) == [("e", 0.13, 2)]
+        assert st.query("SELECT step, time_s, egg_index FROM contacts WHERE run_id=? "
+                        "ORDER BY id", (rid,))[-1] == (7, 3.5, 1)
+        assert st.query("SELECT kind, path FROM figures WHERE run_id=?", (rid,)) == [("graph", "g.svg")]
+        # ratio = N_contact / 10 min * 60 → 12, 24
+        assert st.query("SELECT mean_contact_hr, SD1, N_sperm, total_simulations "
+                        "FROM group_summary WHERE shape='cube' AND VSL IS NOT NULL") == [(18.0, 6.0, 19, 2)]
+
+def test_streamed_contact_count_updates_stats():
+    with MemoryStorage(commit_every=1) as st:
+        rid = st.add_run(M, (), exp_id="e")
+        st.add_contacts(rid, [(0, 3, 1.5, None, None, None, 0)] * 3)
+        st.set_contact_count(rid, 3)                       # commit 済み → UPDATE トリガ
+        assert st.query("SELECT n, sum_ratio FROM group_stats") == [(1, 18.0)]
+        assert st.query("SELECT contact_count FROM summary") == [(3,)]
+        assert st.query("SELECT COUNT(*) FROM contacts") == [(3,)]
+
+def test_import_trajectory_db(trajectory_db):
+    db, _ = trajectory_db([(M, "e", "m.mp4", [(j, j + 1, 0) for j in range(n)]) for n in (2, 4)])
+    with MemoryStorage() as st:
+        assert import_trajectory_db(db, st) == 2
+        assert st.aggregate() == 1
+        assert st.query("SELECT COUNT(*) FROM contacts") == [(6,)]
+        assert st.query("SELECT COUNT(*) FROM figures WHERE kind='movie'") == [(2,)]
+        assert st.query("SELECT mean_contact_hr, total_simulations FROM group_summary") == [(18.0, 2)]
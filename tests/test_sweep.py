@@ -0,0 +1,54 @@
+import numpy as np
+from core.sweep import make_jobs, run_sweep
+
+def _draw(job):
+    return np.random.default_rng(job.seed).random()
+
+def test_make_jobs_grid_and_seeds():
+    jobs = make_jobs(['cube', 'drop'], [6.25, 12.5], [1000], 3, root_seed=7)
+    assert len(jobs) == 12
+    assert [j.index for j in jobs] == list(range(12))
+    assert len({j.seed for j in jobs}) == 12
+    again = make_jobs(['cube', 'drop'], [6.25, 12.5], [1000], 3, root_seed=7)
+    assert [j.seed for j in jobs] == [j.seed for j in again]
+
+def test_parallel_matches_serial():
+    jobs = make_jobs(['cube', 'spot'], [6.25], [1000, 3162], 2, root_seed=0)
+    serial = dict((j.index, r) for j, r in run_sweep(_draw, jobs, workers=1))
+    parallel = dict((j.index, r) for j, r in run_sweep(_draw, jobs, workers=2))
+    assert serial == parallel
+
+def test_cancel_skips_remaining_jobs():
+    import threading
+    jobs = make_jobs(['cube'], [6.25], [1000], 4, root_seed=0)
+    cancel = threading.Event()
+    got = []
+    for job, r in run_sweep(_draw, jobs, workers=1, cancel=cancel):
+        got.append(job.index)
+        cancel.set()
+    assert got == [0]
+    assert list(run_sweep(_draw, jobs, workers=2, cancel=cancel)) == []
+
+def test_simulate_run_parallel_repeats_match_serial():
+    from functools import partial
+    from core.simulation import simulate_run
+    c = {'shape': 'cube', 'step_length': 0.05, 'n_simulation': 60, 'deviation': 0.4,
+         'number_of_sperm': 5, 'radius': 0.3, 'seed_number': 11}
+    fn = partial(simulate_run, c)
+    serial = dict(run_sweep(fn, range(3), workers=1))
+    parallel = dict(run_sweep(fn, range(3), workers=3))
+    assert serial == parallel
+    assert serial[0][1] != serial[1][1]                     # repeat ごとに別系列
+
+def _touch(out, job):
+    import time
+    time.sleep(0.2)
+    (out / f"{job.index}.done").touch()
+    return job.index
+
+def test_break_cancels_remaining_jobs(tmp_path):
+    from functools import partial
+    jobs = make_jobs(['cube'], [6.25], [1000], 12, root_seed=0)
+    for job, r in run_sweep(partial(_touch, tmp_path), jobs, workers=2):
+        break
+    assert 1 <= len(list(tmp_path.glob("*.done"))) < len(jobs)
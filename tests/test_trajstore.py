@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from core.simulation import SpermSimulation
+from core.trajstore import open_store, read_zlib
+
+C = {'shape':'drop','R':0.1,'drop_angle':np.pi/4,'step_length':0.03,
+     'n_simulation':300,'number_of_sperm':6,'seed_number':5}
+
+def test_zlib_roundtrip_no_drift(tmp_path):
+    P = np.cumsum(np.random.default_rng(0).normal(size=(1000, 4, 3)), axis=0) + 1e3
+    st = open_store('zlib', 4, 1000, tmp_path / 't.traj', chunk=128)
+    for t, row in enumerate(P):
+        st.write(t, row)
+    st.close()
+    got = read_zlib(tmp_path / 't.traj')
+    assert got.shape == (4, 1000, 3)
+    assert np.abs(got - P.transpose(1, 0, 2)).max() < 1e-3   # float32 1 ステップ分
+
+@pytest.mark.parametrize('store', ['memmap', 'zlib', 'none'])
+def test_store_matches_memory(tmp_path, store):
+    ref = SpermSimulation(dict(C)); ref.simulate()
+    path = tmp_path / f'traj_{{run}}.{store}'
+    sim = SpermSimulation(dict(C, trajectory_store=store, trajectory_path=str(path)))
+    sim.simulate()
+    assert np.array_equal(sim.pos, ref.traj[:, -1])
+    if store == 'memmap':
+        arr = np.load(tmp_path / 'traj_0.memmap', mmap_mode='r')
+        assert arr.dtype == np.float32 and np.allclose(arr, ref.traj, atol=1e-6)
+    elif store == 'zlib':
+        assert np.allclose(read_zlib(tmp_path / 'traj_0.zlib'), ref.traj, atol=1e-6)
+    else:
+        assert sim.traj is None
+
+def test_unknown_store():
+    with pytest.raises(ValueError):
+        SpermSimulation(dict(C, trajectory_store='hdf5'))
+
+@pytest.mark.parametrize('store', ['memmap', 'zlib'])
+def test_temp_store_leaves_no_file(tmp_path, monkeypatch, store):
+    tmp = tmp_path / 'tmp'; tmp.mkdir()
+    monkeypatch.setattr('tempfile.tempdir', str(tmp))
+    sim = SpermSimulation(dict(C, trajectory_store=store))
+    sim.simulate()
+    assert list(tmp.iterdir()) == []
+    if store == 'memmap':                       # close 後も array は読める
+        ref = SpermSimulation(dict(C)); ref.simulate()
+        assert np.allclose(sim.traj, ref.traj, atol=1e-6)
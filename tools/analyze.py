@@ -5,20 +5,26 @@ CLI で結果を集計・可視化するユーティリティ
   python tools/analyze.py --list
   python tools/analyze.py --group-by volume,sperm_conc
   python tools/analyze.py --hist 12      # run_id=12 の接触時刻ヒスト
+  python tools/analyze.py --summary "2025-05-04 23:36:27"   # group_summary（exp_id 省略で全件）
+  python tools/analyze.py --import spermsim/data/Trajectory.db   # 旧 DB を取り込む
+  python tools/analyze.py --db other.db --list
 """
 from __future__ import annotations
 import argparse, sqlite3, json, pathlib, sys
 import numpy as np
 import matplotlib.pyplot as plt
 
-DB_PATH = pathlib.Path(__file__).resolve().parent.parent / "results.db"
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from core.db import DB_PATH, GROUP_KEY, TYPED_COLUMNS, _conn
+from core.storage import open_storage, import_trajectory_db
 
 # ----------------------------------------------------------------------
-def _conn():
-    return sqlite3.connect(DB_PATH)
+def _col(c: str) -> str:
+    """型付き列があればそれを、無ければ JSON から取り出す"""
+    return c if c == "shape" or c in TYPED_COLUMNS else f"json_extract(params,'$.{c}')"
 
-def list_runs(limit:int=20):
-    cur=_conn().cursor()
+def list_runs(limit:int=20, db=None):
+    cur=_conn(db).cursor()
     cur.execute("SELECT run_id,shape,created FROM runs ORDER BY run_id DESC LIMIT ?",(limit,))
     rows=cur.fetchall()
     print(" run_id │ shape │ created")
@@ -26,8 +32,8 @@ def list_runs(limit:int=20):
     for r in rows:
         print(f"{r[0]:>6} │ {r[1]:<5} │ {r[2]}")
 
-def group_stats(cols: list[str]):
-    sel = ", ".join([f"json_extract(params,'$.{c}')" for c in cols])
+def group_stats(cols: list[str], db=None):
+    sel = ", ".join(_col(c) for c in cols)
     # 修正 ↓  列番号を文字列にして join
     group = ", ".join(str(i + 1) for i in range(len(cols)))
 
@@ -44,7 +50,7 @@ def group_stats(cols: list[str]):
      GROUP BY {group}
      ORDER BY {group};
     """
-    cur = _conn().cursor()
+    cur = _conn(db).cursor()
     cur.execute(q)
     rows = cur.fetchall()
 
@@ -53,8 +59,8 @@ def group_stats(cols: list[str]):
     for r in rows:
         print(" | ".join(map(str, r)))
 
-def hist_run(run_id:int, bins:int=20):
-    cur=_conn().cursor()
+def hist_run(run_id:int, bins:int=20, db=None):
+    cur=_conn(db).cursor()
     cur.execute("SELECT time_s FROM contacts WHERE run_id=? ORDER BY time_s;",(run_id,))
     times=[t[0] for t in cur.fetchall()]
     if not times:
@@ -67,23 +73,51 @@ def hist_run(run_id:int, bins:int=20):
     out=pathlib.Path(f"hist_run{run_id}.png"); plt.savefig(out,dpi=120)
     print("Saved histogram →",out)
 
+def show_summary(exp_id=None, db=None):
+    """exp_id の key（None なら全 key）を集計し直して group_summary を表示"""
+    with open_storage(db) as st:
+        st.aggregate(exp_id)
+        cols = ["shape", "volume", "sperm_conc", "mean_contact_hr", "SD1",
+                "N_sperm", "C_per_N", "SD2", "total_simulations"]
+        rows = st.query(f"SELECT {', '.join(cols)} FROM group_summary "
+                        f"ORDER BY {', '.join(GROUP_KEY)}")
+    header = " | ".join(cols)
+    print(header); print("-" * len(header))
+    for r in rows:
+        print(" | ".join(map(str, r)))
+
+def import_legacy(src, db=None):
+    with open_storage(db) as st:
+        n = import_trajectory_db(src, st)
+        st.aggregate()
+    print(f"Imported {n} runs from {src}")
+
 # ----------------------------------------------------------------------
 def main(argv=None):
     p=argparse.ArgumentParser()
+    p.add_argument("--db",help=f"結果 DB（既定: {DB_PATH.name}）")
     p.add_argument("--list",action="store_true",help="最新 20 件を一覧")
     p.add_argument("--group-by",metavar="COLS",
                    help="カンマ区切り列で平均±SD(contact_count) を計算")
     p.add_argument("--hist",type=int,metavar="RUN_ID",
                    help="run_id の接触時刻ヒストグラムを PNG 保存")
+    p.add_argument("--summary",nargs="?",const="",metavar="EXP_ID",
+                   help="group_summary を表示（EXP_ID の key だけ再集計、省略で全件）")
+    p.add_argument("--import",dest="legacy",metavar="TRAJECTORY_DB",
+                   help="旧 spermsim/data/Trajectory.db の run を取り込む")
     args=p.parse_args(argv)
 
     if args.list:
-        list_runs(); return
+        list_runs(db=args.db); return
     if args.group_by:
         cols=args.group_by.split(",")
-        group_stats(cols); return
+        group_stats(cols, db=args.db); return
     if args.hist is not None:
-        hist_run(args.hist); return
+        hist_run(args.hist, db=args.db); return
+    if args.summary is not None:
+        show_summary(args.summary or None, db=args.db); return
+    if args.legacy:
+        import_legacy(args.legacy, db=args.db); return
     p.print_help()
 
 if __name__=="__main__":
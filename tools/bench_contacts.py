@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+接触ステップの記録とまとめ（merge_contact_events）のベンチマーク
+-------------------------------------------------
+  python tools/bench_contacts.py
+  python tools/bench_contacts.py --n 100000,1000000,5000000 --sperm 2000
+
+合成した接触ステップ（精子ごとに平均 --dwell ステップ続く接触）を、次の 2 通りで
+記録してまとめる時間を比べる。
+
+  legacy : タプルの list に append → sorted → defaultdict で (精子, 卵子) ごとに走査
+  array  : spermsim.contacts.ContactLog（int32）に append → merge_runs
+"""
+from __future__ import annotations
+import argparse, pathlib, sys, time
+from collections import defaultdict
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from spermsim.contacts import ContactLog, merge_runs
+
+
+def make_contacts(n: int, n_sperm: int, dwell: float, seed: int = 0):
+    """run 長が幾何分布の接触ステップ (精子, ステップ, 卵子) を約 n 行（重複なし・記録順）"""
+    rng = np.random.default_rng(seed)
+    lens = rng.geometric(1 / dwell, n)
+    lens = lens[:np.searchsorted(np.cumsum(lens), n) + 1]
+    sperm = rng.integers(0, n_sperm, len(lens))
+    start = rng.integers(1, 10 * n, len(lens))
+    rep = np.repeat(np.arange(len(lens)), lens)[:n]
+    step = start[rep] + (np.arange(len(rep)) - np.repeat(np.cumsum(lens) - lens, lens)[:n])
+    ev = np.unique(np.column_stack((sperm[rep], step, np.zeros(len(rep), dtype=int))), axis=0)
+    return ev[np.argsort(ev[:, 1], kind="stable")].tolist()
+
+
+def legacy(contacts):
+    records = []
+    for j, i, egg in contacts:
+        records.append((j, i, egg))
+    events_by_pair = defaultdict(list)
+    for sperm_index, step, egg in sorted(records):
+        events_by_pair[(sperm_index, egg)].append(step)
+    merged = []
+    for (sperm_index, egg), steps in events_by_pair.items():
+        start_step = end_step = steps[0]
+        for step in steps[1:]:
+            if step == end_step + 1:
+                end_step = step
+            else:
+                merged.append((sperm_index, start_step, egg))
+                start_step = end_step = step
+        merged.append((sperm_index, start_step, egg))
+    return sorted(merged)
+
+
+def array(contacts):
+    log = ContactLog()
+    for j, i, egg in contacts:
+        log.append(j, i, egg)
+    return merge_runs(log.array)
+
+
+def _time(fn, contacts):
+    t0 = time.perf_counter(); out = fn(contacts)
+    return time.perf_counter() - t0, len(out)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", default="100000,1000000", help="接触ステップ数（カンマ区切り）")
+    p.add_argument("--sperm", type=int, default=1000, help="精子数")
+    p.add_argument("--dwell", type=float, default=4.0, help="平均連続ステップ数")
+    args = p.parse_args(argv)
+
+    print(f"sperm = {args.sperm}, mean dwell = {args.dwell} steps")
+    print("      rows │ legacy [s] │  array [s] │ speedup │ (merge only [s])")
+    print("─"*68)
+    for n in map(int, args.n.split(",")):
+        contacts = make_contacts(n, args.sperm, args.dwell)
+        t_old, m_old = _time(legacy, contacts)
+        t_new, m_new = _time(array, contacts)
+        assert m_old == m_new
+        log = ContactLog(); log.extend(*np.array(contacts, dtype=np.int32).T)
+        t_merge, _ = _time(merge_runs, log.array)
+        print(f"{n:>10d} │ {t_old:>10.2f} │ {t_new:>10.2f} │ {t_old/t_new:>6.1f}x │ {t_merge:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
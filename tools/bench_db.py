@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+main.py の結果書き込みのベンチマーク
+-------------------------------------------------
+  python tools/bench_db.py
+  python tools/bench_db.py --rows 100000,1000000 --runs 200
+
+合成した接触イベント（--rows 行を --runs 個の run に等分）を一時ファイルの
+SQLite に書き、次の 3 通りを比べる。
+
+  legacy : 旧 Trajectory.db の書き方（basic_data を 1 行 INSERT、接触 1 件ごとに
+           intersection へ execute、run ごとに commit）
+  row    : results.db のスキーマに legacy と同じ書き方（1 件ごとに execute、run ごとに commit）
+  writer : core.db.ResultWriter + spermsim.main.store_run（results.db、executemany、
+           commit は --commit-every run ごと）
+
+legacy と row の差はスキーマ（contacts は time_s / 座標 / egg_index と run_id 索引を持つ）、
+row と writer の差が書き方（executemany とまとめた commit）の分。
+"""
+from __future__ import annotations
+import argparse, pathlib, sqlite3, sys, tempfile, time
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from core.db import ResultWriter, _SQL_CONTACT
+from spermsim.main import contact_rows, store_run
+
+CONSTANTS = dict(shape="cube", volume=6.25, sperm_conc=3162, VSL=0.13, stick_sec=2,
+                 sim_min=10.0, deviation=0.4, egg_localization="bottom_center",
+                 spot_angle=60, sampl_rate_Hz=2.0, seed_number=0)
+
+# 旧 Trajectory.db のうち書き込みに使う 2 表
+LEGACY_DDL = """
+CREATE TABLE basic_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, exp_id TEXT, version TEXT, shape TEXT,
+    volume REAL, sperm_conc INTEGER, N_contact INTEGER, VSL REAL, stick_sec INTEGER,
+    sim_min REAL, deviation REAL, egg_localization TEXT, image_id TEXT, mov_id TEXT,
+    spot_angle INTEGER, sampl_rate_Hz INTEGER, seed_number TEXT
+);
+CREATE TABLE intersection (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, simulation_id INTEGER, sperm_index INTEGER,
+    start_step INTEGER, egg_index INTEGER DEFAULT 0
+);
+"""
+_LEGACY_COLS = ("shape", "volume", "sperm_conc", "VSL", "stick_sec", "sim_min", "deviation",
+                "egg_localization", "spot_angle", "sampl_rate_Hz", "seed_number")
+
+
+def make_events(n_rows: int, n_runs: int, seed: int = 0):
+    """run ごとの [(sperm, start_step, egg), ...]（Python int のタプル）"""
+    rng = np.random.default_rng(seed)
+    per_run = np.diff(np.linspace(0, n_rows, n_runs + 1).astype(int))
+    return [list(zip(*(a.tolist() for a in (rng.integers(0, 20, k),
+                                            np.sort(rng.integers(1, 1200, k)),
+                                            np.zeros(k, dtype=int)))))
+            for k in per_run]
+
+
+def write_legacy(path, runs):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_DDL)
+    sql = (f"INSERT INTO basic_data (exp_id, version, N_contact, {', '.join(_LEGACY_COLS)}) "
+           f"VALUES ({', '.join('?' * (len(_LEGACY_COLS) + 3))})")
+    for events in runs:
+        c = conn.cursor()
+        c.execute(sql, ("bench", "bench", len(events), *(CONSTANTS[k] for k in _LEGACY_COLS)))
+        sid = c.lastrowid
+        conn.commit()
+        for (sperm_index, start_step, egg_index) in events:
+            c.execute('''
+                INSERT INTO intersection (simulation_id, sperm_index, start_step, egg_index)
+                VALUES (?, ?, ?, ?)
+            ''', (sid, sperm_index, start_step, egg_index))
+        conn.commit()
+    n = conn.execute("SELECT COUNT(*) FROM intersection").fetchone()[0]
+    conn.close()
+    return n
+
+
+def write_row(path, runs):
+    with ResultWriter(path) as w:
+        for events in runs:
+            run_id = w.add_run(CONSTANTS, (), exp_id="bench", version="bench")
+            w.set_contact_count(run_id, len(events))
+            w.flush()
+            for row in contact_rows(events, CONSTANTS["sampl_rate_Hz"]):
+                w.conn.execute(_SQL_CONTACT, (run_id, *row))
+            w.conn.commit()
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+
+def write_writer(path, runs, commit_every):
+    with ResultWriter(path, commit_every=commit_every) as w:
+        for events in runs:
+            store_run(w, "bench", "bench", CONSTANTS, None, None, events)
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+
+def _time(fn, runs, *args) -> float:
+    with tempfile.TemporaryDirectory() as d:
+        t0 = time.perf_counter()
+        n = fn(pathlib.Path(d) / "bench.db", runs, *args)
+        dt = time.perf_counter() - t0
+    assert n == sum(map(len, runs))
+    return dt
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", default="100000,1000000", help="接触の行数（カンマ区切り）")
+    p.add_argument("--runs", type=int, default=100, help="run 数")
+    p.add_argument("--commit-every", type=int, default=100)
+    args = p.parse_args(argv)
+
+    print(f"runs = {args.runs}, commit_every = {args.commit_every}")
+    print("    rows │ legacy [s] │ row [s] │ writer [s] │ row/writer │ writer [rows/s]")
+    print("─"*77)
+    for n_rows in map(int, args.rows.split(",")):
+        runs = make_events(n_rows, args.runs)
+        t_old = _time(write_legacy, runs)
+        t_row = _time(write_row, runs)
+        t_new = _time(write_writer, runs, args.commit_every)
+        print(f"{n_rows:>8d} │ {t_old:>10.2f} │ {t_row:>7.2f} │ {t_new:>10.2f} │ "
+              f"{t_row/t_new:>9.1f}x │ {n_rows/t_new:>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
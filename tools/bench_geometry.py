@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+run ごとの幾何量（RunGeometry）のマイクロベンチマーク
+-------------------------------------------------
+  python tools/bench_geometry.py
+  python tools/bench_geometry.py --shapes cube,spot --conc 4000 --sim-min 2
+
+1) get_limits / placement_of_eggs / compute_spot_parameters（spermsim.spot の
+   キャッシュ経由）の 1 回あたりの時間と RunGeometry の属性読み出しを比べる。
+2) simulate() 中にそれらが何回呼ばれたか（1 ステップあたり）を数える。
+   RunGeometry は SpermSimulation の生成時に 1 回だけ作るので、0 になるはず。
+"""
+from __future__ import annotations
+import argparse, contextlib, importlib, io, pathlib, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WATCHED = ("get_limits", "placement_of_eggs", "compute_spot_parameters")
+
+
+def load_main():
+    """spermsim.main モジュール（spermsim.main 属性は main() 関数の別名なので import_module で取る）"""
+    return importlib.import_module("spermsim.main")
+
+
+def _per_call(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def _count_calls(m, names):
+    """main のモジュール関数を呼び出し回数つきの版に差し替える"""
+    counts = dict.fromkeys(names, 0)
+    for name in names:
+        orig = getattr(m, name)
+
+        def wrapped(*a, _orig=orig, _name=name, **kw):
+            counts[_name] += 1
+            return _orig(*a, **kw)
+        setattr(m, name, wrapped)
+    return counts
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--shapes", default="cube,drop,spot,ceros")
+    p.add_argument("--conc", type=int, default=2000, help="精子濃度 [/mL]")
+    p.add_argument("--sim-min", type=float, default=1.0)
+    p.add_argument("--n", type=int, default=2000, help="1 回あたり時間の測定回数")
+    args = p.parse_args(argv)
+
+    m = load_main()
+    sel = {"sim_min": args.sim_min, "seed_number": 0}
+    print(" shape │ get_limits [us] │ placement_of_eggs [us] │ spot solve [us] │ geom.limits [us]")
+    print("─"*90)
+    sims = {}
+    for shape in args.shapes.split(","):
+        c = m.build_constants(sel, shape, 6.25, args.conc)
+        c["run_progress"] = "no"
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = m.SpermSimulation(c, None, None)
+        sims[shape] = sim
+        t_lim = _per_call(lambda: m.get_limits(c), args.n)
+        t_egg = _per_call(lambda: m.placement_of_eggs(c), args.n)
+        t_fs = _per_call(lambda: m.compute_spot_parameters(dict(c)), max(args.n // 10, 1))
+        t_geom = _per_call(lambda: sim.geom.limits, args.n)
+        print(f"{shape:>6} │ {t_lim*1e6:>15.2f} │ {t_egg*1e6:>22.2f} │ "
+              f"{t_fs*1e6:>16.2f} │ {t_geom*1e6:>16.3f}")
+
+    counts = _count_calls(m, WATCHED)
+    print()
+    print(" shape │ steps   │ " + " │ ".join(f"{n} /step" for n in WATCHED) + " │ time [s]")
+    print("─"*110)
+    for shape, sim in sims.items():
+        for n in WATCHED:
+            counts[n] = 0
+        t0 = time.perf_counter()
+        sim.simulate()
+        dt = time.perf_counter() - t0
+        steps = sim.number_of_sperm * sim.n_simulation
+        print(f"{shape:>6} │ {steps:>7d} │ " +
+              " │ ".join(f"{counts[n] / steps:>{len(n) + 6}.3f}" for n in WATCHED) +
+              f" │ {dt:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
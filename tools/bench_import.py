@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+起動（import）時間のベンチマーク
+-------------------------------------------------
+  python tools/bench_import.py
+  python tools/bench_import.py --repeat 20 --top 15
+
+新しいプロセスで次を --repeat 回ずつ実行し、壁時計時間の中央値を比べる。
+
+  numpy                    : 下限の目安
+  eager (old import set)   : 旧 main.py が module level で読んでいた
+                             tkinter / matplotlib / pandas / scipy / tqdm
+  import spermsim.main     : シミュレーション本体（NumPy だけ）
+  python -m spermsim --no-gui --help : CLI の起動から引数解析まで
+
+sweep のワーカはプロセスごとに spermsim.main を import するので、この差が
+ワーカ数 × 起動回数だけ効く。最後に -X importtime の累積上位を表示する。
+"""
+from __future__ import annotations
+import argparse, pathlib, statistics, subprocess, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+HEAVY = ("tkinter", "matplotlib", "pandas", "scipy", "tqdm")
+EAGER = ("import tkinter, matplotlib; matplotlib.use('Agg'); import matplotlib.pyplot, "
+         "matplotlib.animation, matplotlib.patches, pandas, scipy.optimize, "
+         "scipy.spatial.transform, tqdm, numpy")
+
+CASES = [
+    ("numpy", ["-c", "import numpy"]),
+    ("eager (old import set)", ["-c", EAGER]),
+    ("import spermsim.main", ["-c", "import spermsim.main"]),
+    ("python -m spermsim --no-gui --help", ["-m", "spermsim", "--no-gui", "--help"]),
+]
+
+
+def _run(args) -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def loaded_heavy_modules():
+    """import spermsim.main の後に読み込まれている重いモジュール"""
+    code = ("import sys, spermsim.main; "
+            f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout.strip()
+    return out.split(",") if out else []
+
+
+def importtime_top(n: int):
+    """-X importtime の累積時間 [us] 上位 n 件"""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import spermsim.main"],
+                         cwd=ROOT, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cum_us), name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--repeat", type=int, default=10, help="1 ケースあたりの起動回数")
+    p.add_argument("--top", type=int, default=10, help="-X importtime の表示件数")
+    args = p.parse_args(argv)
+
+    print(f"repeat = {args.repeat}")
+    print(f" {'case':<36} │ median [ms] │   min [ms]")
+    print("─"*66)
+    for name, cmd in CASES:
+        _run(cmd)                                       # ディスクキャッシュを温める
+        ts = [_run(cmd) for _ in range(args.repeat)]
+        print(f" {name:<36} │ {statistics.median(ts)*1e3:>11.1f} │ {min(ts)*1e3:>10.1f}")
+
+    heavy = loaded_heavy_modules()
+    print(f"\nheavy modules after `import spermsim.main`: {', '.join(heavy) or 'none'}")
+    print(f"\n-X importtime (cumulative, top {args.top})")
+    for cum, name in importtime_top(args.top):
+        print(f" {cum/1e3:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
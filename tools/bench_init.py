@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+初期位置生成のベンチマーク（球冠の角度ごと）
+-------------------------------------------------
+  python tools/bench_init.py
+  python tools/bench_init.py --n 20000 --angles 10,30,60,90
+
+旧実装（球内棄却 → さらに球冠高さで棄却）と core.geometry.sample_cap
+（逆 CDF・棄却なし）の 1 点あたり生成時間を比較する。浅い球冠では旧実装の
+採択率が (1-cosθ)² 程度まで落ちるため、旧実装は --legacy-n 点だけ測る。
+"""
+from __future__ import annotations
+import argparse, math, pathlib, sys, time
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from core.geometry import sample_cap
+
+def legacy_point_cap(R: float, theta: float) -> np.ndarray:
+    """旧 random_point_cap（_rand_in_sphere の入れ子棄却）"""
+    zc = R*math.cos(theta)
+    while True:
+        while True:
+            p = np.random.uniform(-R, R, 3)
+            if p @ p <= R*R:
+                break
+        if p[2] >= 0 and (p[2]-zc) >= -1e-9:
+            return p
+
+def _time(fn, *args) -> float:
+    t0 = time.perf_counter(); fn(*args)
+    return time.perf_counter() - t0
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, default=2000, help="生成点数")
+    p.add_argument("--legacy-n", type=int, default=50, help="旧実装の生成点数")
+    p.add_argument("--angles", default="10,20,30,45,60,90",
+                   help="球冠角 [deg] のカンマ区切り")
+    args = p.parse_args(argv)
+
+    R = 1.0
+    print(f"legacy n = {args.legacy_n}, sample_cap n = {args.n}")
+    print(" angle │ legacy [us/pt] │ sample_cap [us/pt] │ speedup")
+    print("─"*56)
+    for deg in map(float, args.angles.split(",")):
+        th = math.radians(deg)
+        t_old = _time(lambda: [legacy_point_cap(R, th)
+                               for _ in range(args.legacy_n)]) / args.legacy_n
+        t_new = _time(sample_cap, args.n, R, R*math.cos(th)) / args.n
+        print(f"{deg:>6.1f} │ {t_old*1e6:>14.1f} │ {t_new*1e6:>18.3f} │ {t_old/t_new:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+結果 DB を Parquet / NPZ へ書き出す
+-------------------------------------------------
+  python tools/export.py --out export/                          # results.db → NPZ
+  python tools/export.py --db spermsim/data/Trajectory.db --format parquet --out export/
+  python tools/export.py --tables contacts --chunk-rows 500000 --out export/
+  python tools/export.py --traj 12=traj_12.npy --out export/    # 軌跡も書く
+
+出力は out/<表>/shape=<shape>/[exp_id=<exp_id>/]part-NNNNN.<format>。
+pandas.read_parquet("export/contacts") / pyarrow.dataset でそのまま読める。
+"""
+from __future__ import annotations
+import argparse, pathlib, sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from core.db import DB_PATH
+from core.export import FORMATS, export
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--db", default=str(DB_PATH), help="results.db か Trajectory.db")
+    p.add_argument("--out", required=True, help="出力ディレクトリ")
+    p.add_argument("--format", choices=FORMATS, default="npz")
+    p.add_argument("--tables", help="カンマ区切り（既定: 全表）")
+    p.add_argument("--chunk-rows", type=int, default=100_000,
+                   help="1 回に読む行数 = parquet の row group / npz の 1 ファイル")
+    p.add_argument("--traj", action="append", default=[], metavar="RUN_ID=PATH",
+                   help="軌跡ファイル（memmap の .npy か zlib）。複数指定可")
+    args = p.parse_args(argv)
+
+    trajectories = {}
+    for item in args.traj:
+        run_id, path = item.split("=", 1)
+        trajectories[int(run_id)] = path
+    counts = export(args.db, args.out, args.format,
+                    args.tables.split(",") if args.tables else None,
+                    args.chunk_rows, trajectories)
+    for name, n in counts.items():
+        print(f"{name:<14} {n:>12,d} rows")
+
+
+if __name__ == "__main__":
+    main()